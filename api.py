@@ -1,28 +1,57 @@
 #!/usr/bin/env python3
 
 import sys
+import time
+import threading
 from collections import OrderedDict
-
-import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 
 from ogamy import codes
+from ogamy import fleet
+from ogamy import parsers
+from ogamy.cache import PageCache
+from ogamy.instrument import Hooks
+from ogamy.transport import Transport
 
 class OGamer:
 
-    def __init__(self, uni, username, password, country="United Kingdom"):
-
-        self.session = requests.session()
+    # where the lobby and the game pages live. can be pointed somewhere else, like standin.py
+    lobby_url = "https://{}.ogame.gameforge.com"
+    game_url = "https://{}/game/index.php"
+
+    def __init__(self, uni, username, password, country="United Kingdom", cache=None,
+                 parser="html.parser", session=None, store=None, hooks=None, debug=False):
+
+        # give a Transport with a shared TokenBucket to limit many accounts together
+        self.session = Transport() if session is None else session
+        self.parser = parser # one of parsers.backends
+        # pages downloaded recently, so that fetches using the same page don't download it again
+        self.cache = PageCache() if cache is None else cache
+        self.planet_ids = OrderedDict()
+        self.current_planet = None # the one the server has selected, from the last page we got
+        self.login_lock = threading.Lock() # so threads that got logged out only log in once
+        self.logins = 0
+        self.tokens = {} # (page, planet) -> token the server gave us that wasn't used yet
+        self.debug = debug # dump pages and tokens while working, to see what the server sent
+        # called around every request, parse and extraction (see instrument.py). these do nothing
+        self.hooks = Hooks() if hooks is None else hooks
+        # a persist.SessionStore lets us start without any requests. if the saved login doesn't
+        # work anymore get_soup will notice it on the first fetch and log in again
+        self.store = store
 
         self.country_code = self.get_country(country)
         self.server = self.get_server(uni)
         self.username = username
         self.password = password
 
-        self.login()
+        if not self.load_cookies(): self.login()
 
         # setup planet codes needed for url building later
-        self.planet_ids = self.fetch_planet_ids()
+        self.planet_ids = self.recall("planet_ids")
+        if self.planet_ids is None:
+            self.planet_ids = self.fetch_planet_ids()
+            self.remember("planet_ids", self.planet_ids)
+        else: self.planet_ids = OrderedDict(self.planet_ids)
 
     def login(self):
         """Logs player into account."""
@@ -30,21 +59,31 @@ class OGamer:
                       "uni": self.server,
                       "login": self.username,
                       "pass": self.password}
-        url = "https://%s.ogame.gameforge.com/main/login" % self.country_code
-        result = self.session.post(url, data=login_form)
+        url = self.lobby_url.format(self.country_code) + "/main/login"
+        self.request("POST", "login", data=login_form, url=url)
+        self.logins += 1
+        self.save_cookies()
+
+    def relogin(self, logins_before, page=None):
+        """Log in again, unless another thread already did while we were waiting for a page."""
+        with self.login_lock:
+            if self.logins == logins_before:
+                self.hooks.on_relogin(page)
+                self.login()
 
     def logout(self):
         """Logs out of account."""
-        url = "https://%s/game/index.php?page=logout" % self.server
         #"https://s103-pt.ogame.gameforge.com/game/index.php?page=logout"
-        self.session.get(url)
+        self.request("GET", "logout")
+        if self.store is not None: self.store.forget("cookies", self.account())
 
     def logged_in(self, use_page=None):
         """Check if player is logged in."""
         # allow page soup to be passed as argument to make get_soup calling this function faster
-        if use_page is None: soup = self.get_soup("overview")
+        if use_page is None: soup = self.get_soup("overview", cache=False)
         else: soup = use_page
 
+        if isinstance(soup, bytes): return parsers.player_name(soup) == self.username # raw page
         found = soup.find("meta", {"name": "ogame-player-name"})
         if found is None: return False
         if str(found["content"]) == self.username: return True
@@ -53,15 +92,7 @@ class OGamer:
 
     def fetch_points(self):
         """Get point and general position of player in rankings."""
-        soup = self.get_soup("highscore")
-
-        # find correct line in rankings table
-        line = soup.find("tr", {"class": "myrank"})
-
-        rank = int(line.find("td", {"class": "position"}).contents[0].strip())
-        points = int(line.find("td", {"class": "score"}).contents[0].strip().replace(".", ""))
-
-        return OrderedDict([("ranking", rank), ("points", points)])
+        return self.extract("points", parsers.points, self.get_soup("highscore", only="points"))
 
     def fetch_build_queue(self, planet=None):
         """Get the building, technology and ship/defence queue."""
@@ -69,47 +100,24 @@ class OGamer:
 
     def fetch_resources(self, planet=None):
         """Build a dictonary of resources."""
-        soup = self.get_soup("overview", planet=planet)
-
-        resources = [] # list of key/value pairs for ordered dict
-        for res in ["metal", "crystal", "deuterium", "energy"]:
-            found = soup.find("span", {"id": "resources_{}".format(res)})
-            value = int(found.string.strip().replace(".", ""))
-            resources.append((res, value))
-
-        return OrderedDict(resources)
+        soup = self.get_soup("overview", planet=planet, only="resources")
+        return self.extract("resources", parsers.resources, soup)
 
     def fetch_planet_ids(self):
         """Builds a dict with the names of the planets and their ids."""
         # TODO: big planet names dont work.
         # TODO: need to fetch from other part of the page
-        soup = self.get_soup("overview")
-
-        planet_list = [] # for creating the planet dict afterwards
-        name_tags = soup.find_all("span", {"class": "planet-name"})
-        for name in name_tags:
-            id_tag = name.parent.parent
-            planet_id = int(str(id_tag["id"]).replace("planet-", ""))
-
-            planet_list.append((name.string, planet_id))
-
-        return OrderedDict(planet_list)
+        return self.extract("planet_ids", parsers.planet_ids, self.get_soup("overview", only="planets"))
 
     def fetch_planet_info(self, planet=None):
         """Get information for a specific planet like tempurature, position and fields."""
-        soup = self.get_soup("overview", planet=planet)
+        soup = self.get_soup("overview", planet=planet, only="planets")
 
         # grab planet id from the built dictionary
         if planet is None: planet_id = self.planet_ids[next(iter(self.planet_ids))] # first value of dict
         else: planet_id = self.planet_ids[planet]
 
-        planet = soup.find("div", {"id": "planet-{}".format(planet_id)})
-        info = planet.find("a")["title"]
-        info = [x.split(">")[-1] for x in info.split("<")] # separate text from the tags
-        info = [x for x in info if x != ""] # remove empty strings
-
-        return OrderedDict(zip(["position", "diameter", "slots", "temperature"],
-                   [info[0].split()[-1], info[1].split()[0], info[1].split()[-1], info[2]]))
+        return self.extract("planet_info", parsers.planet_info, soup, planet_id)
 
     def fetch_mines(self, planet=None):
         """Search what the levels of the mines are on the planet."""
@@ -136,24 +144,39 @@ class OGamer:
 
     def fetch_levels(self, page, planet, code_dict):
         """Generic function to get the level of something on a page."""
-        soup = self.get_soup(page, planet)
-        rev_codes = {v: k for k, v in code_dict.items()} # reverse the dict
-        dict_items = [] # for creating OrderedDict at the end
-
-        found = soup.find_all("a") # get all the a tags of the page
-        for thing in found:
-            try: code = int(thing["ref"])
-            except KeyError: continue # we only care about the link tags with a level
-            if code not in rev_codes: continue # discard other levels that might be on the page
-            try: # need this to not catch some stuff i don't fully understand
-                if "details" not in thing["id"]: continue
-            except KeyError: continue
-
-            level_text = thing.find("span", {"class": "level"}).text.strip()
-            level = int(level_text.split()[-1])
-            dict_items.append((rev_codes[code], level))
-
-        return OrderedDict(dict_items)
+        return self.extract("levels", parsers.levels, self.get_soup(page, planet, only="levels"), code_dict)
+
+    def fetch_empire(self, workers=4):
+        """Get everything about the account at once: points, technologies and, for every planet,
+        what the other fetch functions return. Each page is downloaded and parsed only once,
+        using a few threads to download them at the same time."""
+        planet_pages = ["overview", "resources", "station", "shipyard", "defense"]
+        pages = [("highscore", None), ("research", None)]
+        pages += [(page, planet_id) for planet_id in self.planet_ids.values() for page in planet_pages]
+
+        # the first request is done alone, so if we need to log in the threads don't all try to
+        first = pages.pop(0)
+        soups = {first: self.get_soup(*first)}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            soups.update(zip(pages, pool.map(lambda page: self.get_soup(*page), pages)))
+
+        planets = OrderedDict()
+        for name, planet_id in self.planet_ids.items():
+            overview = soups[("overview", planet_id)]
+            levels = lambda page, codes: self.extract("levels", parsers.levels, soups[(page, planet_id)], codes)
+            planets[name] = OrderedDict([
+                ("resources", self.extract("resources", parsers.resources, overview)),
+                ("planet_info", self.extract("planet_info", parsers.planet_info, overview, planet_id)),
+                ("mines", levels("resources", codes.mines)),
+                ("storage", levels("resources", codes.storage)),
+                ("buildings", levels("station", codes.buildings)),
+                ("ships", levels("shipyard", codes.ships)),
+                ("defenses", levels("defense", codes.defences))])
+
+        return OrderedDict([("points", self.extract("points", parsers.points, soups[("highscore", None)])),
+                            ("technologies", self.extract("levels", parsers.levels, soups[("research", None)],
+                                                          codes.techs)),
+                            ("planets", planets)])
 
     ########### build functions ##############
 
@@ -178,99 +201,112 @@ class OGamer:
         menge = "" if number == 1 else str(number)
         self.send_build_post("shipyard", planet, codes.ships[ship], form={"menge": menge})
 
+    def build_many(self, orders):
+        """Queue a lot of builds with as few requests as possible.
+        orders is a list of (what, name, planet) where what is mine, storage, station, research
+        or ships, like the build functions. ships can have the number as a fourth item.
+        The builds of a planet are sent one after another, in the order given, so the token
+        left in the answer of one build can be used by the next one on the same page.
+        Returns the answers in the same order as orders."""
+        kinds = {"mine": ("resources", codes.mines), "storage": ("resources", codes.storage),
+                 "station": ("station", codes.buildings), "research": ("research", codes.techs),
+                 "ships": ("shipyard", codes.ships)}
+
+        posts = [] # (page, planet key, position in orders, arguments for send_build_post)
+        for i, order in enumerate(orders):
+            what, name, planet = order[:3]
+            page, code_dict = kinds[what]
+            form = {}
+            if what == "ships":
+                number = order[3] if len(order) > 3 else 1
+                form["menge"] = "" if number == 1 else str(number)
+            args = (page, planet, code_dict[name], form, what != "research")
+            posts.append((page, str(self.planet_key(planet)), i, args))
+
+        # planets in the order they first show up, the builds of each in the order given
+        first = {}
+        for page, planet, i, args in posts: first.setdefault(planet, i)
+        answers = [None] * len(orders)
+        for page, planet, i, args in sorted(posts, key=lambda post: (first[post[1]], post[2])):
+            answers[i] = self.send_build_post(*args)
+        return answers
+
     def send_fleet(self, ships, res, dest, mission, speed=10, planet=None):
-        """only works for one specific type of mission."""
-        """it seems we need to send a post to fleet3 with some info (acs, ships, speed, dest, type, union and mission)
-            and then the needed token will be in the response of that post.
-            then just send the form like we already have below to the movement page with everything.
-        """
-        # get fleet1: needs planet=planet
-        # post fleet2: just the hidden fields (from fleet1) and ships
-        # post fleet3: hidden field but overwrite speed, coords and type
-        # post movement: hidden fields and resources and mission
-        fleet1 = self.get_soup("fleet1", planet=planet)
-
-        form = {
-            "galaxy": dest[0], "system": dest[1], "position": dest[2],
-            "type": "1", # planet/debris/moon
-            "mission": codes.missions[mission],
-            "speed": str(speed) # this one was easy
-        }
-        # now we add the ships
-        for ship in ships: form["am{}".format(codes.ships[ship])] = ships[ship]
-
-        # second page
-        fleet2 = self.session.post(self.page_url("fleet2", planet=planet), data=form).content
-
-        # third page
-        fleet3 = self.session.post(self.page_url("fleet3", planet=planet), data=form).content
-        form.update({
-            "acsValues": "-", # no clue
-        })
-        # maybe i need to do 3 separate requests for each of the pages
-        form = {"holdingtime": "1", # dont know what this is yet
-                "expeditiontime": "1", # also dont know what this is yet
-                "token": self.get_token("fleet3", in_post=False, planet=planet),
-                "galaxy": dest[0], "system": dest[1], "position": dest[2],
-                "type": "1", # planet/debris/moon
-                "mission": codes.missions[mission],
-                "union2": "0", # dont know this one either
-                "holdingOrExpTime": "0", # nope
-                "speed": str(speed), # this one was easy
-                "acsValues": "-", # no clue
-                "prioMetal": "1", # nope
-                "prioCrystal": "2", # nope
-                "prioDeuterium": "3"} # aaaaand nope
-        # now we add the ships
-        for ship in ships: form["am{}".format(codes.ships[ship])] = ships[ship]
-        # next we add the resources to take
-        for r in res: form[r] = res[r]
-
-        # now that the fleet cake is done we just give to the server
-        url = self.page_url("movement", planet)
-        self.session.post(url, data=form)
-
-    def send_build_post(self, page, planet, code, form={}, get_token=True, build=True):
+        """Send ships (and resources) from planet to dest, a (galaxy, system, position) tuple."""
+        return fleet.send(self, fleet.FleetOrder(ships, dest, mission, res, speed, planet))
+
+    def send_fleets(self, orders, workers=4):
+        """Send a list of fleet.FleetOrder, different planets at the same time (see fleet.py)."""
+        return fleet.dispatch(self, orders, workers)
+
+    def send_build_post(self, page, planet, code, form=None, get_token=True, build=True):
         """Grab a token and send a post request to a certain page with the provided form."""
         # add addional needed info to the form before sending it
-        if get_token: form["token"] = self.get_token(page, planet)
+        form = {} if form is None else dict(form)
         if build: form["modus"] = "1" # prob refers if this constructing or destructing
         form["type"] = code
 
-        url = self.page_url(page, planet)
-        if not self.logged_in(): self.login()
-        res = self.session.post(url, data=form)
-
-        return res.content
+        # use the token from the last answer for this page if we have one. if not, get_token
+        # downloads the page, and get_soup makes sure we're logged in while doing it
+        key = (page, self.planet_key(planet))
+        if get_token: form["token"] = self.tokens.pop(key, None) or self.get_token(page, planet)
+
+        logins = self.logins
+        content = self.request("POST", page, planet, data=form)
+        if not self.logged_in(use_page=content): # the session was gone, nothing got built
+            self.relogin(logins, page)
+            if get_token: form["token"] = self.get_token(page, planet)
+            content = self.request("POST", page, planet, data=form)
+        elif get_token and parsers.token_rejected(content): # the token was too old, try a fresh one
+            form["token"] = self.get_token(page, planet)
+            content = self.request("POST", page, planet, data=form)
+            if parsers.token_rejected(content): self.crash("Build of", code, "on", page, "was rejected", exit=False)
+
+        # building spends resources on this planet and changes the levels shown on the page
+        self.forget(planet)
+        if page == "research": self.cache.invalidate(page="research") # techs are the same for all planets
+
+        # the answer is the page itself, with the new levels and a new token for the next build.
+        # without a planet the answer says which one it was
+        key = (page, self.planet_key(planet))
+        if self.logged_in(use_page=content):
+            if key[1] is not None: self.cache.put(page, key[1], content)
+            if get_token:
+                try: self.tokens[key] = parsers.token(self.parse(content, page, "form"))
+                except (AttributeError, TypeError): pass # no build form on the page
+        self.trace("built", code, "on", page, planet)
+
+        return content
 
     def rename(self, name, planet=None):
         """Rename a planet."""
         # TODO: make this work
-        url = self.page_url("planetRename", planet=planet)
         form = {"newPlanetName": "+".join(name.split())}
-        self.session.post(url, data=form)
+        self.request("POST", "planetRename", planet, data=form)
 
+        self.cache.invalidate() # the planet name shows up on every page
         self.planet_ids = self.fetch_planet_ids() # needs updating
+        self.remember("planet_ids", self.planet_ids)
 
     def get_token(self, page, in_post=True, planet=None):
         """Search for the token for the POST form."""
-        soup = self.get_soup(page, planet)
-        with open("log", "w") as f: print(soup, file=f)
-        if in_post: soup = soup.find("form", {"method": "POST"})
-        #print("\n\n\n\n\npost:", post)
-
-        token = soup.find("input", {"name": "token"})["value"]
-        print("\n\n\n\n\n\ntoken:", token)
+        only = "form" if in_post else "inputs"
+        self.hooks.on_token(page)
+        soup = self.get_soup(page, planet, cache=False, only=only) # tokens are only good for one use
+        if self.debug:
+            with open("log", "w") as f: print(soup, file=f)
+
+        token = parsers.token(soup, in_post)
+        self.trace("token:", token)
         return token
 
     def get_hidden(self, soup):
         """Retrive all the hidden fields from soup as a dictionary."""
-        hidden = soup.find_all("input", {"type": "hidden"})
-        return {field["name"]: field["value"] for field in hidden}
+        return parsers.hidden(soup)
 
     def page_url(self, page, planet=None):
         """Build correct URL for a given page/planet."""
-        url = "https://{}/game/index.php?page={}".format(self.server, page)
+        url = self.game_url.format(self.server) + "?page={}".format(page)
         if not planet is None: # to go to a specific planet
             if isinstance(planet, int): # using the planet code
                 url += "&cp={}".format(planet)
@@ -279,31 +315,75 @@ class OGamer:
 
         return url
 
-    def get_soup(self, page, planet=None):
-        """Make BeautifulSoup object for this specific page."""
-        url = self.page_url(page, planet)
-        result = self.session.get(url)
-        soup = BeautifulSoup(result.content, "html.parser")
-
-        if not self.logged_in(use_page=soup):
-            self.login()
-            # i could do this recursively but i'm afraid of getting stuck because it couldn't
-            # log in for some reason not related to this program. and this is prob faster
-            result = self.session.get(url)
-            soup = BeautifulSoup(result.content, "html.parser")
-
+    def planet_key(self, planet):
+        """Use the planet id for the cache key, so names and ids share the same entry. With no
+        planet the server uses whatever planet was selected last, so that one (None if we
+        don't know yet)."""
+        if planet is None: return self.current_planet
+        if isinstance(planet, str) and planet in self.planet_ids: return self.planet_ids[planet]
+        return planet
+
+    def forget(self, planet):
+        """Remove the cached pages for a planet after something on it changed."""
+        key = self.planet_key(planet)
+        if key is None: return self.cache.invalidate() # could have been any planet
+        self.cache.invalidate(planet=key)
+
+    def get_soup(self, page, planet=None, cache=True, only=None):
+        """Make BeautifulSoup object for this specific page.
+        If only is given just that part of the page is parsed (see parsers.strainers)."""
+        key = self.planet_key(planet)
+        content = self.cache.get(page, key) if cache and key is not None else None
+        if content is None:
+            logins = self.logins
+            content = self.request("GET", page, planet)
+
+            if not self.logged_in(use_page=content):
+                self.relogin(logins, page)
+                # i could do this recursively but i'm afraid of getting stuck because it couldn't
+                # log in for some reason not related to this program. and this is prob faster
+                content = self.request("GET", page, planet)
+
+            # without a planet it's the page of whatever was selected when the server got there
+            if planet is None: key = parsers.planet_id(content)
+            # still the lobby if logging in didn't work, that isn't the page to keep
+            if key is not None and self.logged_in(use_page=content): self.cache.put(page, key, content)
+
+        return self.parse(content, page, only)
+
+    def request(self, method, page, planet=None, data=None, url=None):
+        """Send a request for a page and return what came back, telling the hooks about it."""
+        if url is None: url = self.page_url(page, planet)
+        self.hooks.on_request(page, planet, method)
+        start = time.perf_counter()
+        content = self.session.request(method, url, data=data).content
+        selected = parsers.planet_id(content)
+        if selected is not None: self.current_planet = selected
+        self.hooks.on_response(page, planet, method, start, time.perf_counter() - start, len(content))
+        return content
+
+    def parse(self, content, page, only=None):
+        """parsers.make_soup, timed for the hooks."""
+        start = time.perf_counter()
+        soup = parsers.make_soup(content, self.parser, only)
+        self.hooks.on_parse(page, only, start, time.perf_counter() - start)
         return soup
 
+    def extract(self, what, function, *args):
+        """Call one of the parsers extractors, timed for the hooks."""
+        start = time.perf_counter()
+        found = function(*args)
+        self.hooks.on_extract(what, start, time.perf_counter() - start)
+        return found
+
     def get_server(self, universe):
         if universe == "Capella": return "s103"
         """Fetch server url for a given universe."""
-        result = self.session.get("https://{}.ogame.gameforge.com".format(self.country_code))
-        soup = BeautifulSoup(result.content, "html.parser")
-        found = soup.find("select", {"id": "serverLogin"})
-
-        servers = {}
-        for sv in found.find_all("option"):
-            servers[sv.string.strip()] = sv["value"]
+        servers = None if self.store is None else self.store.get("servers", self.country_code)
+        if servers is None:
+            content = self.request("GET", "lobby", url=self.lobby_url.format(self.country_code))
+            servers = parsers.servers(self.parse(content, "lobby", "servers"))
+            if self.store is not None: self.store.put("servers", self.country_code, servers)
 
         # check if server exists
         if not universe in servers.keys():
@@ -316,16 +396,11 @@ class OGamer:
         if country == "United Kingdom": return "en"
         if country == "Portugal": return "pt"
 
-        result = self.session.get("https://en.ogame.gameforge.com")
-        soup = BeautifulSoup(result.content, "html.parser")
-
-        code_list = soup.find("ul", {"id": "mmoList1"})
-        countries = {}
-        for tag in code_list.find_all("li"):
-            link = tag.find("a")["href"]
-            name = tag.string.strip() # name of the country
-            code = link.split(".")[0].replace("//", "")
-            countries[name] = code # save to the dict
+        countries = None if self.store is None else self.store.get("countries", "all")
+        if countries is None:
+            content = self.request("GET", "lobby", url=self.lobby_url.format("en"))
+            countries = parsers.countries(self.parse(content, "lobby", "countries"))
+            if self.store is not None: self.store.put("countries", "all", countries)
 
         # check if input was ok
         if not country in countries.keys():
@@ -335,6 +410,37 @@ class OGamer:
 
         return countries[country]
 
+    ########### saved session ##############
+
+    def account(self):
+        """Key for this account in the session store."""
+        return "{}/{}/{}".format(self.country_code, self.server, self.username)
+
+    def recall(self, section):
+        """Something saved for this account, None if there's nothing (or no store)."""
+        if self.store is None: return None
+        return self.store.get(section, self.account())
+
+    def remember(self, section, value):
+        if self.store is not None: self.store.put(section, self.account(), value)
+
+    def save_cookies(self):
+        """Save the login cookies so the next start doesn't have to log in."""
+        cookies = [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+                    "secure": c.secure, "expires": c.expires} for c in self.session.cookies]
+        self.remember("cookies", cookies)
+
+    def load_cookies(self):
+        """Put the saved cookies back in the session. False if there weren't any."""
+        cookies = self.recall("cookies")
+        if not cookies: return False
+        for cookie in cookies: self.session.cookies.set(**cookie)
+        return True
+
+    def trace(self, *args):
+        """Print what's going on, only when debug is on."""
+        if self.debug: print("ogamy:", *args, file=sys.stderr)
+
     def crash(self, *args, error="OGameError", exit=True):
         """Print an error message and exits program."""
         print("{}:".format(error), *args)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""asyncio version of OGamer, so pages for different planets can be downloaded at the same time.
+
+    game = await AsyncOGamer.create("Capella", "user", "password")
+    res = await asyncio.gather(*(game.fetch_resources(p) for p in game.planet_ids))
+    await game.close()
+"""
+import asyncio
+from collections import OrderedDict
+
+import aiohttp
+from yarl import URL
+
+from ogamy import codes
+from ogamy import parsers
+from ogamy.api import OGamer
+from ogamy.cache import PageCache
+
+class AsyncOGamer:
+
+    lobby_url = OGamer.lobby_url
+    game_url = OGamer.game_url
+
+    def __init__(self, username, password, server, country_code, concurrency=8, cache=None,
+                 parser="html.parser"):
+        """Doesn't log in or touch the network. Use create() (or from_ogamer()) for that."""
+        self.username = username
+        self.password = password
+        self.server = server
+        self.country_code = country_code
+        self.parser = parser # one of parsers.backends
+        self.cache = PageCache() if cache is None else cache
+        self.planet_ids = OrderedDict()
+        self.tokens = {} # (page, planet) -> token the server gave us that wasn't used yet
+
+        self.limit = asyncio.Semaphore(concurrency) # max number of requests at the same time
+        self.login_lock = asyncio.Lock()
+        self.logins = 0 # so requests started before a login don't log in again
+        # unsafe lets the cookie jar keep cookies for ip addresses, like a local stand-in server
+        self.session = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    @classmethod
+    async def create(cls, uni, username, password, country="United Kingdom", **kwargs):
+        """Look up the server, log in and fetch the planets. Same arguments as OGamer."""
+        game = cls(username, password, None, None, **kwargs)
+        game.country_code = await game.get_country(country)
+        game.server = await game.get_server(uni)
+        await game.login()
+        game.planet_ids = await game.fetch_planet_ids()
+        return game
+
+    @classmethod
+    def from_ogamer(cls, ogamer, **kwargs):
+        """Reuse the login (cookies) and planets of a synchronous OGamer, no requests needed.
+        Must be called with the event loop running."""
+        game = cls(ogamer.username, ogamer.password, ogamer.server, ogamer.country_code,
+                   parser=ogamer.parser, **kwargs)
+        for cookie in ogamer.session.cookies:
+            url = URL("http://" + cookie.domain.lstrip("."))
+            game.session.cookie_jar.update_cookies({cookie.name: cookie.value}, response_url=url)
+        game.planet_ids = OrderedDict(ogamer.planet_ids)
+        return game
+
+    async def close(self):
+        await self.session.close()
+
+    async def __aenter__(self): return self
+
+    async def __aexit__(self, *args): await self.close()
+
+    async def request(self, method, url, data=None):
+        """Send a request, never more than the concurrency limit at the same time."""
+        async with self.limit:
+            async with self.session.request(method, url, data=data) as response:
+                return await response.read()
+
+    async def login(self):
+        """Logs player into account."""
+        login_form = {"kid": "",
+                      "uni": self.server,
+                      "login": self.username,
+                      "pass": self.password}
+        url = self.lobby_url.format(self.country_code) + "/main/login"
+        await self.request("POST", url, data=login_form)
+        self.logins += 1
+
+    async def logout(self):
+        """Logs out of account."""
+        await self.request("GET", self.game_url.format(self.server) + "?page=logout")
+
+    async def relogin(self, logins_before):
+        """Log in again, unless someone else already did while we were waiting for the page."""
+        async with self.login_lock:
+            if self.logins == logins_before: await self.login()
+
+    ########### fetch functions ##############
+
+    async def fetch_points(self):
+        """Get point and general position of player in rankings."""
+        return parsers.points(await self.get_soup("highscore", only="points"))
+
+    async def fetch_resources(self, planet=None):
+        """Build a dictonary of resources."""
+        return parsers.resources(await self.get_soup("overview", planet=planet, only="resources"))
+
+    async def fetch_planet_ids(self):
+        """Builds a dict with the names of the planets and their ids."""
+        return parsers.planet_ids(await self.get_soup("overview", only="planets"))
+
+    async def fetch_planet_info(self, planet=None):
+        """Get information for a specific planet like tempurature, position and fields."""
+        soup = await self.get_soup("overview", planet=planet, only="planets")
+
+        # grab planet id from the built dictionary
+        if planet is None: planet_id = self.planet_ids[next(iter(self.planet_ids))] # first value of dict
+        else: planet_id = self.planet_ids[planet]
+
+        return parsers.planet_info(soup, planet_id)
+
+    async def fetch_mines(self, planet=None):
+        """Search what the levels of the mines are on the planet."""
+        return await self.fetch_levels("resources", planet, codes.mines)
+
+    async def fetch_storage(self, planet=None):
+        """Search the levels of the storage for resources."""
+        return await self.fetch_levels("resources", planet, codes.storage)
+
+    async def fetch_buildings(self, planet=None):
+        """Get the level for each of the stations in buildings page."""
+        return await self.fetch_levels("station", planet, codes.buildings)
+
+    async def fetch_technologies(self):
+        """Get technology levels, using the same keys from codes dict."""
+        return await self.fetch_levels("research", None, codes.techs)
+
+    async def fetch_ships(self, planet=None):
+        """Get the number of each ship docked at a given planet."""
+        return await self.fetch_levels("shipyard", planet, codes.ships)
+
+    async def fetch_defenses(self, planet=None):
+        return await self.fetch_levels("defense", planet, codes.defences)
+
+    async def fetch_levels(self, page, planet, code_dict):
+        """Generic function to get the level of something on a page."""
+        return parsers.levels(await self.get_soup(page, planet, only="levels"), code_dict)
+
+    ########### build functions ##############
+
+    async def build_mine(self, mine, planet=None):
+        """Upgrade, if possible, the specified mine or solar plant."""
+        await self.send_build_post("resources", planet, codes.mines[mine])
+
+    async def build_storage(self, mine, planet=None):
+        """Upgrade if possible, the storage for a type of mine."""
+        await self.send_build_post("resources", planet, codes.storage[mine])
+
+    async def build_station(self, building, planet=None):
+        """Upgrade building if possible."""
+        await self.send_build_post("station", planet, codes.buildings[building])
+
+    async def build_research(self, tech, planet=None):
+        """Start upgrading research. Defaults to main planet."""
+        await self.send_build_post("research", planet, codes.techs[tech], get_token=False)
+
+    async def build_ships(self, ship, number=1, planet=None):
+        """Build a given number of a given ship on a given planet."""
+        menge = "" if number == 1 else str(number)
+        await self.send_build_post("shipyard", planet, codes.ships[ship], form={"menge": menge})
+
+    async def send_build_post(self, page, planet, code, form=None, get_token=True, build=True):
+        """Grab a token and send a post request to a certain page with the provided form."""
+        form = {} if form is None else dict(form)
+        if build: form["modus"] = "1" # prob refers if this constructing or destructing
+        form["type"] = code
+
+        # use the token from the last answer for this page if we have one, like OGamer does
+        key = (page, self.planet_key(planet))
+        if get_token: form["token"] = self.tokens.pop(key, None) or await self.get_token(page, planet)
+
+        url = self.page_url(page, planet)
+        logins = self.logins
+        content = await self.request("POST", url, data=form)
+        if parsers.player_name(content) != self.username: # the session was gone, nothing got built
+            await self.relogin(logins)
+            if get_token: form["token"] = await self.get_token(page, planet)
+            content = await self.request("POST", url, data=form)
+        elif get_token and parsers.token_rejected(content): # the token was too old, try a fresh one
+            form["token"] = await self.get_token(page, planet)
+            content = await self.request("POST", url, data=form)
+            if parsers.token_rejected(content): self.crash("Build of", code, "on", page, "was rejected", exit=False)
+
+        # building spends resources on this planet and changes the levels shown on the page
+        self.forget(planet)
+        if page == "research": self.cache.invalidate(page="research") # techs are the same for all planets
+
+        # the answer is the page itself, with the new levels and a new token for the next build.
+        # without a planet it's whatever was selected, so it's only kept under the planet it says
+        if planet is None: key = (page, parsers.planet_id(content))
+        if parsers.player_name(content) == self.username and key[1] is not None:
+            self.cache.put(page, key[1], content)
+            if get_token:
+                try: self.tokens[key] = parsers.token(parsers.make_soup(content, self.parser, "form"))
+                except (AttributeError, TypeError): pass # no build form on the page
+
+        return content
+
+    async def get_token(self, page, planet=None):
+        """Search for the token for the POST form."""
+        # get_soup logs in again if needed. tokens are only good for one use, so no cache
+        return parsers.token(await self.get_soup(page, planet, cache=False, only="form"))
+
+    ########### helpers ##############
+
+    def page_url(self, page, planet=None):
+        """Build correct URL for a given page/planet."""
+        url = self.game_url.format(self.server) + "?page={}".format(page)
+        if not planet is None: # to go to a specific planet
+            if isinstance(planet, int): # using the planet code
+                url += "&cp={}".format(planet)
+            elif isinstance(planet, str): # using planet name instead
+                url += "&cp={}".format(self.planet_ids[planet])
+
+        return url
+
+    def planet_key(self, planet):
+        """Use the planet id for the cache key, so names and ids share the same entry."""
+        if isinstance(planet, str) and planet in self.planet_ids: return self.planet_ids[planet]
+        return planet
+
+    def forget(self, planet):
+        """Remove the cached pages for a planet after something on it changed."""
+        key = self.planet_key(planet)
+        if key is None: return self.cache.invalidate() # could be any planet
+        self.cache.invalidate(planet=key)
+
+    async def get_soup(self, page, planet=None, cache=True, only=None):
+        """Make BeautifulSoup object for this specific page, logging in again if needed."""
+        key = self.planet_key(planet)
+        # without a planet the server uses the selected one, and with fetches running at the same
+        # time that could be any of them. those are only kept under the planet the page says
+        content = self.cache.get(page, key) if cache and key is not None else None
+        if content is None:
+            url = self.page_url(page, planet)
+            logins = self.logins
+            content = await self.request("GET", url)
+
+            if parsers.player_name(content) != self.username:
+                await self.relogin(logins)
+                content = await self.request("GET", url)
+
+            if planet is None: key = parsers.planet_id(content)
+            if key is not None: self.cache.put(page, key, content)
+
+        return parsers.make_soup(content, self.parser, only)
+
+    crash = OGamer.crash
+
+    async def get_server(self, universe):
+        """Fetch server url for a given universe."""
+        if universe == "Capella": return "s103"
+        content = await self.request("GET", self.lobby_url.format(self.country_code))
+        servers = parsers.servers(parsers.make_soup(content, self.parser, "servers"))
+
+        # check if server exists
+        if not universe in servers.keys():
+            self.crash("Universe", universe, "was not found.")
+
+        return servers[universe]
+
+    async def get_country(self, country):
+        """Get country specific URL."""
+        if country == "United Kingdom": return "en"
+        if country == "Portugal": return "pt"
+
+        content = await self.request("GET", self.lobby_url.format("en"))
+        countries = parsers.countries(parsers.make_soup(content, self.parser, "countries"))
+
+        # check if input was ok
+        if not country in countries.keys():
+            self.crash("Country", country, "was not found on the list.")
+        if len(countries[country]) != 2:
+            self.crash("Can't fetch code for country", country)
+
+        return countries[country]
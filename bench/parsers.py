@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Compare the parser backends on saved pages, parsing the whole page vs only what is needed.
+
+usage: python -m ogamy.bench.parsers [pages dir] [repeats]
+"""
+import os
+import sys
+import time
+
+from ogamy import codes
+from ogamy import parsers
+
+fixtures = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+# what gets pulled out of each saved page: (strainer, extractor)
+extractions = {
+    "overview": [("resources", parsers.resources), ("planets", parsers.planet_ids)],
+    "resources": [("levels", lambda soup: parsers.levels(soup, codes.mines))],
+    "station": [("levels", lambda soup: parsers.levels(soup, codes.buildings))],
+    "research": [("levels", lambda soup: parsers.levels(soup, codes.techs))],
+    "shipyard": [("levels", lambda soup: parsers.levels(soup, codes.ships))],
+    "defense": [("levels", lambda soup: parsers.levels(soup, codes.defences))],
+    "highscore": [("points", parsers.points)],
+    "fleet3": [("inputs", lambda soup: parsers.token(soup, in_post=False))],
+}
+
+def timeit(function, repeats):
+    """Best time (in ms) out of some runs of function."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def available_backends():
+    """The backends that can actually be used here (lxml might not be installed)."""
+    found = []
+    for backend in parsers.backends:
+        try: parsers.make_soup(b"<html></html>", backend)
+        except Exception: continue # bs4.FeatureNotFound
+        found.append(backend)
+    return found
+
+def run(directory=fixtures, repeats=20):
+    backends = available_backends()
+    results = {} # (page, backend, mode) -> ms
+
+    for page, extractors in extractions.items():
+        path = os.path.join(directory, page + ".html")
+        if not os.path.exists(path): continue
+        with open(path, "rb") as f: content = f.read()
+
+        for backend in backends:
+            def full(): # what get_soup used to do: parse everything and search the whole tree
+                soup = parsers.make_soup(content, backend)
+                for only, extract in extractors: extract(soup)
+            def targeted(): # only parse the part of the page each extractor needs
+                for only, extract in extractors: extract(parsers.make_soup(content, backend, only))
+
+            results[(page, backend, "full")] = timeit(full, repeats)
+            results[(page, backend, "targeted")] = timeit(targeted, repeats)
+
+    return backends, results
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else fixtures
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    backends, results = run(directory, repeats)
+
+    columns = ["{} {}".format(b, m) for b in backends for m in ["full", "targeted"]]
+    print("{:<12}".format("page") + "".join("{:>22}".format(c) for c in columns))
+    totals = [0.0] * len(columns)
+    for page in extractions:
+        times = [results.get((page, b, m)) for b in backends for m in ["full", "targeted"]]
+        if None in times: continue
+        totals = [t + x for t, x in zip(totals, times)]
+        print("{:<12}".format(page) + "".join("{:>20.2f}ms".format(t) for t in times))
+    print("{:<12}".format("total") + "".join("{:>20.2f}ms".format(t) for t in totals))
+
+if __name__ == "__main__": main()
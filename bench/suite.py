@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Time every public OGamer method against the stand-in server (see standin.py).
+
+For each method it reports the wall time, the time spent parsing, the bytes sent both ways and
+the number of requests. Results are saved as json so two versions can be compared:
+
+    python -m ogamy.bench.suite --out before.json
+    python -m ogamy.bench.suite --out after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+from ogamy import codes
+from ogamy import parsers
+from ogamy.api import OGamer
+from ogamy.standin import StandIn, point
+
+# name -> what to run. every one starts without anything cached
+cases = [
+    ("login", lambda game: game.login()),
+    ("logged_in", lambda game: game.logged_in()),
+    ("get_soup", lambda game: game.get_soup("overview")),
+    ("get_token", lambda game: game.get_token("resources")),
+    ("get_hidden", lambda game: game.get_hidden(game.get_soup("fleet1"))),
+    ("fetch_points", lambda game: game.fetch_points()),
+    ("fetch_resources", lambda game: game.fetch_resources()),
+    ("fetch_planet_ids", lambda game: game.fetch_planet_ids()),
+    ("fetch_planet_info", lambda game: game.fetch_planet_info()),
+    ("fetch_levels", lambda game: game.fetch_levels("resources", None, codes.mines)),
+    ("fetch_mines", lambda game: game.fetch_mines()),
+    ("fetch_storage", lambda game: game.fetch_storage()),
+    ("fetch_buildings", lambda game: game.fetch_buildings()),
+    ("fetch_technologies", lambda game: game.fetch_technologies()),
+    ("fetch_ships", lambda game: game.fetch_ships()),
+    ("fetch_defenses", lambda game: game.fetch_defenses()),
+    ("fetch_empire", lambda game: game.fetch_empire()),
+    ("build_mine", lambda game: game.build_mine("metal")),
+    ("build_storage", lambda game: game.build_storage("metal")),
+    ("build_station", lambda game: game.build_station("robot")),
+    ("build_research", lambda game: game.build_research("energy")),
+    ("build_ships", lambda game: game.build_ships("lcargo", 10)),
+    ("build_many", lambda game: game.build_many([("mine", "metal", p) for p in game.planet_ids] +
+                                                [("mine", "crystal", p) for p in game.planet_ids])),
+    ("send_fleet", lambda game: game.send_fleet({"lcargo": 10}, {"metal": 1000}, (1, 105, 7), "transport")),
+    ("rename", lambda game: game.rename(next(iter(game.planet_ids)))),
+    ("logout", lambda game: game.logout()),
+]
+
+class ParseTimer:
+    """Adds up the time spent in parsers.make_soup."""
+
+    def __init__(self):
+        self.total = 0.0
+        self.original = parsers.make_soup
+
+    def __enter__(self):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try: return self.original(*args, **kwargs)
+            finally: self.total += time.perf_counter() - start
+        parsers.make_soup = timed
+        return self
+
+    def __exit__(self, *args):
+        parsers.make_soup = self.original
+
+def version():
+    """Which version of the code is being measured."""
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        described = subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=here,
+                                            stderr=subprocess.DEVNULL)
+        return described.decode().strip()
+    except (OSError, subprocess.CalledProcessError): return "unknown"
+
+def run(repeats=5, delay=0.0, parser="html.parser", only=None):
+    server = StandIn(delay=delay)
+    point(OGamer, server.run_in_thread())
+    game = OGamer("Capella", server.username, server.password, parser=parser)
+
+    results = {}
+    for name, case in cases:
+        if only and name not in only: continue
+        walls, parses, before, after = [], [], None, None
+        for _ in range(repeats):
+            if not game.logged_in(): game.login() # logout in the last run leaves us logged out
+            game.cache.invalidate() # cold, so every run does the same requests
+            game.tokens.clear()
+            before = server.stats()
+            with ParseTimer() as parse:
+                start = time.perf_counter()
+                case(game)
+                walls.append(time.perf_counter() - start)
+            parses.append(parse.total)
+            after = server.stats()
+
+        results[name] = {"wall_ms": statistics.median(walls) * 1000,
+                         "parse_ms": statistics.median(parses) * 1000,
+                         "requests": after["requests"] - before["requests"],
+                         "bytes_in": after["bytes_sent"] - before["bytes_sent"],
+                         "bytes_out": after["bytes_received"] - before["bytes_received"]}
+
+    return {"version": version(), "python": platform.python_version(), "parser": parser,
+            "delay": delay, "repeats": repeats, "time": time.time(), "results": results}
+
+def compare(new, old, threshold=0.2):
+    """Print what got slower (or made more requests) than in old. Returns the regressions."""
+    regressions = []
+    for name, now in new["results"].items():
+        before = old["results"].get(name)
+        if before is None: continue
+        if now["requests"] > before["requests"]:
+            regressions.append((name, "requests", before["requests"], now["requests"]))
+        for metric in ["wall_ms", "parse_ms", "bytes_in"]:
+            if before[metric] > 0 and now[metric] > before[metric] * (1 + threshold):
+                regressions.append((name, metric, before[metric], now[metric]))
+
+    for name, metric, before, now in regressions:
+        print("REGRESSION {:<20} {:<10} {:>12.2f} -> {:<12.2f}".format(name, metric, before, now))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds the stand-in waits per request")
+    parser.add_argument("--parser", default="html.parser", choices=parsers.backends)
+    parser.add_argument("--only", nargs="*", help="just these methods")
+    parser.add_argument("--out", help="save the results to this json file")
+    parser.add_argument("--compare", help="json file from an older run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="how much slower counts as a regression")
+    args = parser.parse_args()
+
+    report = run(args.repeats, args.delay, args.parser, args.only)
+    print("{:<20}{:>12}{:>12}{:>10}{:>12}{:>12}".format("method", "wall ms", "parse ms", "requests", "bytes in", "bytes out"))
+    for name, r in report["results"].items():
+        print("{:<20}{:>12.2f}{:>12.2f}{:>10}{:>12}{:>12}".format(
+            name, r["wall_ms"], r["parse_ms"], r["requests"], r["bytes_in"], r["bytes_out"]))
+
+    if args.out:
+        with open(args.out, "w") as f: json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f: old = json.load(f)
+        if compare(report, old, args.threshold): sys.exit(1)
+
+if __name__ == "__main__": main()
@@ -0,0 +1,84 @@
+import time
+import threading
+from collections import OrderedDict
+
+# how long (in seconds) a page can be served from the cache.
+# pages with a ttl of 0 are never cached (the fleet pages change every time we send something)
+page_ttl = {"overview": 10,
+            "resources": 30,
+            "station": 60,
+            "research": 120,
+            "shipyard": 30,
+            "defense": 30,
+            "highscore": 300,
+            "fleet1": 0,
+            "fleet2": 0,
+            "fleet3": 0,
+            "movement": 0}
+
+any_planet = object() # for invalidate, None is a planet key too (the last selected planet)
+
+class PageCache:
+    """LRU cache of downloaded pages, keyed by (page, planet), where each page has its own ttl."""
+
+    def __init__(self, ttl=None, default_ttl=30, max_entries=64):
+        self.ttl = dict(page_ttl)
+        if ttl is not None: self.ttl.update(ttl)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+
+        self.entries = OrderedDict() # key -> (time it was stored, value), oldest first
+        self.lock = threading.Lock() # the same OGamer can be used from more than one thread
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, page, planet=None):
+        """Return the cached value or None if it's not there or too old."""
+        key = (page, planet)
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+
+            stored, value = self.entries[key]
+            if time.monotonic() - stored > self.ttl.get(page, self.default_ttl):
+                del self.entries[key] # expired
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key) # mark as most recently used
+            self.hits += 1
+            return value
+
+    def put(self, page, planet, value):
+        """Save value in the cache, evicting the least recently used entries if full."""
+        if self.ttl.get(page, self.default_ttl) <= 0: return # this page is never cached
+
+        key = (page, planet)
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+
+    def age(self, page, planet=None):
+        """Seconds since the entry was stored, None if it's not there or too old."""
+        with self.lock:
+            if (page, planet) not in self.entries: return None
+            stored, _ = self.entries[(page, planet)]
+            age = time.monotonic() - stored
+            return None if age > self.ttl.get(page, self.default_ttl) else age
+
+    def invalidate(self, page=None, planet=any_planet):
+        """Drop entries matching page and/or planet. With no arguments everything is dropped."""
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if page is not None and key[0] != page: continue
+                if planet is not any_planet and key[1] != planet: continue
+                del self.entries[key]
+
+    def stats(self):
+        """Hit/miss counters, to see how many requests the cache is saving."""
+        total = self.hits + self.misses
+        return OrderedDict([("hits", self.hits), ("misses", self.misses),
+                            ("hit_rate", self.hits / total if total else 0.0),
+                            ("entries", len(self.entries))])
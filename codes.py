@@ -85,3 +85,10 @@ missions = {"expedition": 15,
            "attack": 1,
            "acs_attack": 2,
            "moon_destruction": 9}
+
+# tabs of the 'Messages' page
+messages = {"espionage": 20,
+            "combat": 21,
+            "expeditions": 22,
+            "transport": 23,
+            "other": 24}
@@ -0,0 +1,235 @@
+"""Simulating battles, to know if an attack is worth it before sending it.
+
+Every unit is one row of numpy arrays (its type, hull and shield), so big battles are fast.
+Each round every unit shoots at a random enemy. Units with rapidfire against their target
+get to shoot again, which is done in waves: all the extra shots of a wave at the same time,
+then the extra shots those earned, and so on. Damage goes to the shield first (shots under 1%
+of the shield bounce off), then to the hull. Units under 70% of their hull after a wave can
+explode, so a unit hit in many waves rolls many times like in the game (the shots of one wave
+on the same unit count as one). At the end of the round the dead ones are removed and shields
+come back. At most 6 rounds.
+
+    attackers = {"lcargo": 50, "battleship": 20}
+    defenders = {"rocket": 100, "llaser": 50, "lfighter": 10}
+    result = simulate(attackers, defenders, game.fetch_technologies(), trials=1000)
+    summary(result)
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ogamy import codes
+
+# metal, crystal, deuterium, shield, weapon. the hull is a tenth of metal + crystal
+unit_stats = {
+    "lfighter": (3000, 1000, 0, 10, 50),
+    "hfighter": (6000, 4000, 0, 25, 150),
+    "cruiser": (20000, 7000, 2000, 50, 400),
+    "battleship": (45000, 15000, 0, 200, 1000),
+    "battlecruiser": (30000, 40000, 15000, 400, 700),
+    "bomber": (50000, 25000, 15000, 500, 1000),
+    "destroyer": (60000, 50000, 15000, 500, 2000),
+    "deathstar": (5000000, 4000000, 1000000, 50000, 200000),
+    "scargo": (2000, 2000, 0, 10, 5),
+    "lcargo": (6000, 6000, 0, 25, 5),
+    "colony": (10000, 20000, 10000, 100, 50),
+    "recycler": (10000, 6000, 2000, 10, 1),
+    "probe": (0, 1000, 0, 0, 0),
+    "satellite": (0, 2000, 500, 1, 1),
+    "rocket": (2000, 0, 0, 20, 80),
+    "llaser": (1500, 500, 0, 25, 100),
+    "hlaser": (6000, 2000, 0, 100, 250),
+    "gauss": (20000, 15000, 2000, 200, 1100),
+    "ion": (2000, 6000, 0, 500, 150),
+    "sshield": (10000, 10000, 0, 2000, 1),
+    "lshield": (50000, 50000, 0, 10000, 1),
+}
+
+# shooter -> {target: rapidfire}. a rapidfire of r means another shot with chance (r - 1) / r
+rapidfire = {
+    "lfighter": {"probe": 5, "satellite": 5},
+    "hfighter": {"probe": 5, "satellite": 5, "scargo": 3},
+    "cruiser": {"probe": 5, "satellite": 5, "lfighter": 6, "rocket": 10},
+    "battleship": {"probe": 5, "satellite": 5},
+    "battlecruiser": {"probe": 5, "satellite": 5, "scargo": 3, "lcargo": 3, "hfighter": 4,
+                      "cruiser": 4, "battleship": 7},
+    "bomber": {"probe": 5, "satellite": 5, "rocket": 20, "llaser": 20, "hlaser": 10, "ion": 10},
+    "destroyer": {"probe": 5, "satellite": 5, "battlecruiser": 2, "llaser": 10},
+    "deathstar": {"probe": 1250, "satellite": 1250, "lfighter": 200, "hfighter": 100, "cruiser": 33,
+                  "battleship": 30, "battlecruiser": 15, "bomber": 25, "destroyer": 5, "scargo": 250,
+                  "lcargo": 250, "colony": 250, "recycler": 250, "rocket": 200, "llaser": 200,
+                  "hlaser": 100, "gauss": 50, "ion": 100},
+    "scargo": {"probe": 5, "satellite": 5},
+    "lcargo": {"probe": 5, "satellite": 5},
+    "colony": {"probe": 5, "satellite": 5},
+    "recycler": {"probe": 5, "satellite": 5},
+}
+
+# everything that fights. missiles never take part in a battle
+units = list(codes.ships) + [name for name in codes.defences if name not in ["antimissile", "intermissile"]]
+index = {name: i for i, name in enumerate(units)}
+is_defence = np.array([name in codes.defences for name in units])
+
+cost = np.array([unit_stats[name][:3] for name in units], dtype=float) # (units, 3)
+base_shield = np.array([unit_stats[name][3] for name in units], dtype=float)
+base_weapon = np.array([unit_stats[name][4] for name in units], dtype=float)
+base_hull = (cost[:, 0] + cost[:, 1]) / 10
+
+# chance of another shot, for every (shooter, target) pair
+again = np.zeros((len(units), len(units)))
+for shooter, targets in rapidfire.items():
+    for target, rf in targets.items(): again[index[shooter], index[target]] = 1 - 1 / rf
+
+rounds = 6
+
+def stats(techs=None):
+    """Hull, shield and weapon of each unit type with weapons, shield and armour technology."""
+    techs = techs or {}
+    return (base_hull * (1 + 0.1 * techs.get("armour", 0)),
+            base_shield * (1 + 0.1 * techs.get("shield", 0)),
+            base_weapon * (1 + 0.1 * techs.get("weapons", 0)))
+
+def counts(fleet):
+    """{name: number} to an array of numbers per unit type."""
+    found = np.zeros(len(units), dtype=np.int64)
+    for name, number in fleet.items():
+        if name in index: found[index[name]] = number
+    return found
+
+class Side:
+    """The units of one side of a battle, one element per unit."""
+
+    def __init__(self, numbers, techs=None):
+        self.hull_max, self.shield_max, self.weapon = stats(techs)
+        self.types = np.repeat(np.arange(len(units), dtype=np.int16), numbers)
+        self.hull = self.hull_max[self.types].astype(np.float32)
+        self.shield = self.shield_max[self.types].astype(np.float32)
+
+    def __len__(self): return len(self.types)
+
+    def shoot(self, enemy, rng):
+        """Every unit fires at enemy, plus the rapidfire shots, one wave at a time. Each wave
+        is done to enemy before the next one. Units that die still shoot until the round ends,
+        it's only their hull that changes."""
+        shooters = np.arange(len(self))
+        while len(shooters):
+            targets = rng.integers(0, len(enemy), size=len(shooters))
+            shot = self.weapon[self.types[shooters]]
+            target_types = enemy.types[targets]
+            # shots weaker than 1% of the shield don't do anything
+            hits = shot >= 0.01 * enemy.shield_max[target_types]
+            enemy.take(targets[hits], shot[hits], rng)
+            # the ones with rapidfire against what they hit shoot again in the next wave
+            lucky = rng.random(len(shooters)) < again[self.types[shooters], target_types]
+            shooters = shooters[lucky]
+
+    def take(self, targets, shots, rng):
+        """Apply one wave of shots (the unit each one hit and its damage). Units whose hull is
+        under 70% after it can explode, and shots at a unit already destroyed are lost."""
+        if not len(targets): return
+        if len(targets) > 1:
+            hit, which = np.unique(targets, return_inverse=True)
+            damage = np.bincount(which, weights=shots, minlength=len(hit))
+        else: hit, damage = targets, shots # the long tails of rapidfire are one shot per wave
+        absorbed = np.minimum(self.shield[hit], damage)
+        self.shield[hit] -= absorbed
+        hull = np.maximum(self.hull[hit] - (damage - absorbed), 0)
+
+        ratio = hull / self.hull_max[self.types[hit]]
+        hull[(ratio < 0.7) & (rng.random(len(hit)) >= ratio)] = 0 # exploded
+        self.hull[hit] = hull
+
+    def end_round(self):
+        """Remove the dead and bring the shields back."""
+        alive = self.hull > 0
+        self.types, self.hull = self.types[alive], self.hull[alive]
+        self.shield = self.shield_max[self.types].astype(np.float32)
+
+    def left(self):
+        return np.bincount(self.types, minlength=len(units))
+
+def battle(attackers, defenders, attacker_techs=None, defender_techs=None, rng=None):
+    """One battle. attackers and defenders are arrays from counts. Returns what is left of
+    each side (as counts) and how many rounds it took."""
+    rng = np.random.default_rng() if rng is None else rng
+    attack, defend = Side(attackers, attacker_techs), Side(defenders, defender_techs)
+
+    for done in range(1, rounds + 1):
+        if not len(attack) or not len(defend): return attack.left(), defend.left(), done - 1
+        # both sides shoot with what they had at the start of the round
+        attack.shoot(defend, rng)
+        defend.shoot(attack, rng)
+        attack.end_round()
+        defend.end_round()
+
+    return attack.left(), defend.left(), rounds
+
+def _trials(args):
+    """A few battles, for the process pool."""
+    attackers, defenders, attacker_techs, defender_techs, trials, seed = args
+    rng = np.random.default_rng(seed)
+    found = [battle(attackers, defenders, attacker_techs, defender_techs, rng) for _ in range(trials)]
+    return (np.array([f[0] for f in found]).reshape(trials, len(units)),
+            np.array([f[1] for f in found]).reshape(trials, len(units)),
+            np.array([f[2] for f in found]))
+
+def outcome(attack_left, defend_left):
+    """Who won each battle, from what is left of each side (trials, units). Only the side that
+    still has something wins, if both or neither do it's a draw."""
+    attack_dead = attack_left.sum(axis=1) == 0
+    defend_dead = defend_left.sum(axis=1) == 0
+    return np.select([attack_dead == defend_dead, defend_dead], ["draw", "attacker"], "defender")
+
+def simulate(attackers, defenders, attacker_techs=None, defender_techs=None, trials=100, workers=None,
+             seed=None, debris_ratio=0.3, defence_debris=0.0, rebuild=0.7):
+    """Run the battle trials times, spread over a process pool, and return for every trial:
+    what is left of each side (by unit name), the resources each side lost, the debris field
+    (metal, crystal) and who won. Destroyed defences are rebuilt with chance rebuild."""
+    attackers, defenders = counts(attackers), counts(defenders)
+    workers = workers or 1
+    chunks = [trials // workers + (i < trials % workers) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    jobs = [(attackers, defenders, attacker_techs, defender_techs, n, s) for n, s in zip(chunks, seeds) if n]
+
+    if workers == 1: parts = list(map(_trials, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool: parts = list(pool.map(_trials, jobs))
+    attack_left = np.concatenate([p[0] for p in parts])
+    defend_left = np.concatenate([p[1] for p in parts])
+    took = np.concatenate([p[2] for p in parts])
+
+    attack_lost = attackers - attack_left # (trials, units)
+    defend_lost = defenders - defend_left
+    rng = np.random.default_rng(seeds[0].spawn(1)[0])
+    rebuilt = np.where(is_defence, rng.binomial(defend_lost, rebuild), 0)
+
+    ships_lost = np.where(is_defence, 0, attack_lost + defend_lost)
+    defences_lost = np.where(is_defence, attack_lost + defend_lost, 0)
+    debris = (ships_lost @ cost[:, :2]) * debris_ratio + (defences_lost @ cost[:, :2]) * defence_debris
+
+    winner = outcome(attack_left, defend_left)
+
+    return OrderedDict([("attackers_left", attack_left),
+                        ("defenders_left", defend_left),
+                        ("defences_rebuilt", rebuilt),
+                        ("attackers_lost", attack_lost @ cost), # (trials, 3) metal, crystal, deuterium
+                        ("defenders_lost", (defend_lost - rebuilt) @ cost),
+                        ("debris", debris), # (trials, 2) metal, crystal
+                        ("rounds", took),
+                        ("winner", winner)])
+
+def summary(result):
+    """Averages and win rates of what simulate returns."""
+    winner = result["winner"]
+    left = lambda side: OrderedDict((name, float(x)) for name, x in zip(units, result[side].mean(axis=0)) if x > 0)
+    return OrderedDict([("attacker_wins", float(np.mean(winner == "attacker"))),
+                        ("defender_wins", float(np.mean(winner == "defender"))),
+                        ("draws", float(np.mean(winner == "draw"))),
+                        ("rounds", float(result["rounds"].mean())),
+                        ("attackers_left", left("attackers_left")),
+                        ("defenders_left", left("defenders_left")),
+                        ("attackers_lost", result["attackers_lost"].mean(axis=0)),
+                        ("defenders_lost", result["defenders_lost"].mean(axis=0)),
+                        ("debris", result["debris"].mean(axis=0)),
+                        ("debris_p10_p90", np.percentile(result["debris"].sum(axis=1), [10, 90]))])
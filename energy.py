@@ -0,0 +1,85 @@
+"""Working out how to power the mines, for many planets (or plans) at once.
+
+    levels = [(24, 21, 17), (30, 26, 20)] # (metal, crystal, deuterium) mine levels
+    needed_solar(levels) # -> array([26, 31])
+    cheapest_mix(levels, max_temp=23, energy_tech=8)
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from ogamy import tools
+
+satellite_cost = np.array([0, 2000, 500]) # metal, crystal, deuterium for one solar satellite
+
+def split_levels(levels):
+    """(n, 3) array of (metal, crystal, deuterium) levels into three arrays."""
+    levels = np.asarray(levels)
+    return levels[..., 0], levels[..., 1], levels[..., 2]
+
+def needed_energy(levels):
+    """Energy needed by each (metal, crystal, deuterium) triple."""
+    return tools.energy_use(*split_levels(levels))
+
+def needed_solar(levels, max_level=100):
+    """Solar plant level needed by each (metal, crystal, deuterium) triple, with only solar."""
+    return tools.solve_level(tools.solar_energy, needed_energy(levels), low=1, max_level=max_level)
+
+def needed_fusion(levels, energy_tech=0, max_level=100):
+    """Fusion reactor level needed by each triple, with only fusion."""
+    produce = lambda level: tools.fusion_energy(level, energy_tech)
+    return tools.solve_level(produce, needed_energy(levels), low=1, max_level=max_level)
+
+def needed_satellites(levels, max_temp=0):
+    """Number of solar satellites needed by each triple, with only satellites."""
+    return -(-needed_energy(levels) // tools.satellite_energy(max_temp)) # rounded up
+
+def cheapest_mix(levels, max_temp=0, energy_tech=0, solar=0, fusion=0, satellites=0,
+                 weights=(1, 1, 1), fusion_hours=0, max_solar=40, max_fusion=30):
+    """Cheapest way to power each (metal, crystal, deuterium) triple with a mix of solar plant,
+    fusion reactor and solar satellites.
+
+    solar, fusion and satellites are what the planet already has, only what needs to be built
+    on top of that is paid for. The cost is metal, crystal and deuterium times weights (to use
+    trade ratios, for example (3, 2, 1) in deuterium), plus the deuterium the reactor burns in
+    fusion_hours. Returns arrays with one value per triple."""
+    levels = np.atleast_2d(levels)
+    need = needed_energy(levels).astype(float) # (n,)
+    deut_levels = levels[:, 2]
+    weights = np.asarray(weights, dtype=float)
+
+    solar_levels = np.arange(solar, max(solar, max_solar) + 1) # options to try (s,)
+    fusion_levels = np.arange(fusion, max(fusion, max_fusion) + 1) # (f,)
+
+    def price(building, current, options):
+        paid = tools.cumulative_cost(building, current, options)
+        return weights[0] * paid["metal"] + weights[1] * paid["crystal"] + weights[2] * paid["deuterium"]
+
+    # energy and cost of every (solar, fusion) pair, as (s, f) grids
+    energy = tools.solar_energy(solar_levels)[:, None] + tools.fusion_energy(fusion_levels, energy_tech)[None, :]
+    burned = tools.fusion_deuterium(fusion_levels) * fusion_hours * weights[2]
+    cost = price("solar", solar, solar_levels)[:, None] + (price("fusion", fusion, fusion_levels) + burned)[None, :]
+
+    # the reactor needs energy technology 3 and deuterium synthesizer 5 to be built
+    can_fuse = (deut_levels >= 5) & (energy_tech >= 3) # (n,)
+    new_fusion = (fusion_levels > fusion)[None, None, :] # (1, 1, f)
+    blocked = new_fusion & ~can_fuse[:, None, None] # (n, 1, f)
+
+    # whatever is still missing is made up with satellites
+    missing = np.maximum(need[:, None, None] - energy[None, :, :], 0) # (n, s, f)
+    sats = -(-missing // tools.satellite_energy(max_temp)) # rounded up
+    new_sats = np.maximum(sats - satellites, 0)
+    total = cost[None, :, :] + new_sats * float(satellite_cost @ weights)
+    total = np.where(blocked, np.inf, total)
+
+    # best option for each triple
+    best = total.reshape(len(levels), -1).argmin(axis=1)
+    s, f = np.unravel_index(best, cost.shape)
+    rows = np.arange(len(levels))
+
+    return OrderedDict([("solar", solar_levels[s]),
+                        ("fusion", fusion_levels[f]),
+                        ("satellites", np.maximum(sats[rows, s, f], satellites).astype(int)),
+                        ("cost", total[rows, s, f]),
+                        ("energy", need),
+                        ("fusion_deuterium", tools.fusion_deuterium(fusion_levels[f]))])
@@ -0,0 +1,262 @@
+"""Reading espionage reports and keeping what they found, to pick the best farms.
+
+Every report is one row of a numpy structured array: where and when, the resources, how much
+of them can be taken, and (from the whole report) the ships, defences and technologies seen.
+Reports are only read once, the store knows their ids. The latest report of each planet is
+kept in an index, so the targets can be ranked by loot per second of flight at any time:
+
+    store = ReportStore("reports.npy")
+    reader = ReportReader(game, store, workers=4)
+    reader.read() # new reports only, stops at the first page it already knows
+    speed = flight.fleet_speed({"lcargo": 1}, game.fetch_technologies())
+    store.rank((1, 101, 8), speed, n=20) # no fleet or defence seen
+    combat.simulate(attackers, store.units(report_id), techs, store.techs(report_id))
+"""
+import os
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ogamy import codes, flight, parsers
+from ogamy.galaxy import status_flags
+
+ship_names = list(codes.ships)
+defence_names = list(codes.defences)
+tech_names = list(codes.techs)
+# the report shows units by their code, in the class of the picture (tech202, defense401, research109)
+by_code = {"ships": {code: i for i, code in enumerate(codes.ships.values())},
+           "defense": {code: i for i, code in enumerate(codes.defences.values())},
+           "research": {code: i for i, code in enumerate(codes.techs.values())}}
+fields = {"ships": "ships", "defense": "defences", "research": "techs"}
+
+# -1 everywhere means the probes didn't see it
+report_dtype = np.dtype([("id", "i8"),
+                         ("time", "f8"), # when the probes got there
+                         ("galaxy", "i2"),
+                         ("system", "i2"),
+                         ("position", "i2"),
+                         ("moon", "?"),
+                         ("player", "S20"),
+                         ("status", "u1"), # flags of galaxy.py
+                         ("metal", "i8"),
+                         ("crystal", "i8"),
+                         ("deuterium", "i8"),
+                         ("loot", "f4"), # fraction of the resources an attack takes
+                         ("fleet", "i8"), # value of the fleet and defence from the list
+                         ("defense", "i8"),
+                         ("details", "?"), # if the whole report was read
+                         ("ships", "i4", (len(ship_names),)),
+                         ("defences", "i4", (len(defence_names),)),
+                         ("techs", "i2", (len(tech_names),))])
+
+coords_pattern = re.compile(r"\[(\d+):(\d+):(\d+)\]")
+
+def parse_number(text):
+    """Last number in text, -1 if there is none (like "no data")."""
+    found = re.findall(r"\d[\d.]*", text)
+    return int(found[-1].replace(".", "")) if found else -1
+
+def empty(n=1):
+    rows = np.zeros(n, dtype=report_dtype)
+    for field in ["fleet", "defense", "ships", "defences", "techs"]: rows[field] = -1
+    return rows
+
+def parse_list(content, backend="html.parser"):
+    """The summaries of a page of espionage reports, and how many pages there are."""
+    soup = parsers.make_soup(content, backend)
+    messages = soup.find_all("li", {"class": "msg"})
+    rows = empty(len(messages))
+
+    for row, msg in zip(rows, messages):
+        row["id"] = int(msg["data-msg-id"])
+        title = msg.find("span", {"class": "msg_title"})
+        row["galaxy"], row["system"], row["position"] = map(int, coords_pattern.search(title.text).groups())
+        icon = title.find("figure")
+        row["moon"] = icon is not None and "moon" in icon.get("class", [])
+        row["time"] = time.mktime(time.strptime(msg.find("span", {"class": "msg_date"}).text.strip(),
+                                                "%d.%m.%Y %H:%M:%S"))
+
+        for span in msg.find_all("span", class_=True):
+            for name in span["class"]:
+                if name.startswith("status_abbr_"):
+                    row["status"] |= status_flags.get(name.replace("status_abbr_", ""), 0)
+                    row["player"] = span.text.strip().encode()[:20]
+
+        for res in msg.find_all("span", {"class": "resspan"}):
+            name = res.text.split(":")[0].strip().lower()
+            if name in ["metal", "crystal", "deuterium"]: row[name] = parse_number(res.text)
+
+        for span in msg.find_all("span", {"class": "ctn"}):
+            text = span.text.strip()
+            if text.startswith("Loot:"): row["loot"] = parse_number(text) / 100
+            elif text.startswith("Fleets:"): row["fleet"] = parse_number(text)
+            elif text.startswith("Defense:"): row["defense"] = parse_number(text)
+
+    page = soup.find("li", {"class": "curPage"})
+    pages = int(page.text.split("/")[-1]) if page is not None else 1
+    return rows, pages
+
+def parse_detail(content, row, backend="html.parser"):
+    """Put the ships, defences and technologies of a whole report into its row."""
+    soup = parsers.make_soup(content, backend)
+    for ul in soup.find_all("ul", attrs={"data-type": True}):
+        kind = ul["data-type"]
+        if kind not in fields or "detail_list_fail" in ul.get("class", []): continue # not seen
+        found = np.zeros(len(by_code[kind]), dtype=row[fields[kind]].dtype)
+        for li in ul.find_all("li", {"class": "detail_list_el"}):
+            picture = li.find("img", class_=True)
+            code = int(re.sub(r"\D", "", " ".join(picture["class"])))
+            if code in by_code[kind]: found[by_code[kind][code]] = parse_number(li.find("span", {"class": "fright"}).text)
+        row[fields[kind]] = found
+    row["details"] = True
+    return row
+
+class ReportStore:
+    """Every report read, by id, and the latest one of each planet."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.reports = np.load(path) if path and os.path.exists(path) else empty(0)
+        self.rows = {int(i): n for n, i in enumerate(self.reports["id"])} # id -> row
+        self.index = None # built again when needed after something changes
+
+    def __len__(self): return len(self.reports)
+
+    def __contains__(self, report_id): return int(report_id) in self.rows
+
+    def add(self, rows):
+        """Keep the reports not seen before. Returns how many were new."""
+        new = [row for row in rows if int(row["id"]) not in self.rows]
+        ids = [int(row["id"]) for row in new]
+        if len(set(ids)) < len(ids): # the same report twice in rows
+            new = list(OrderedDict(zip(ids, new)).values())
+        if not new: return 0
+        for n, row in enumerate(new): self.rows[int(row["id"])] = len(self.reports) + n
+        self.reports = np.concatenate([self.reports, np.array(new, dtype=report_dtype)])
+        self.index = None
+        return len(new)
+
+    def save(self):
+        """Write the reports to path, without leaving half a file if it gets interrupted."""
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as f: np.save(f, self.reports)
+        os.replace(temp, self.path)
+
+    def get(self, report_id):
+        return self.reports[self.rows[int(report_id)]]
+
+    def units(self, report_id):
+        """What a report saw that fights, {name: number} like combat.simulate takes."""
+        report = self.get(report_id)
+        found = OrderedDict(zip(ship_names, report["ships"].tolist()))
+        found.update(zip(defence_names, report["defences"].tolist()))
+        return OrderedDict((name, n) for name, n in found.items() if n > 0)
+
+    def techs(self, report_id):
+        report = self.get(report_id)
+        return OrderedDict((name, level) for name, level in zip(tech_names, report["techs"].tolist()) if level >= 0)
+
+    ########### index ##############
+
+    def reindex(self):
+        """Only the newest report of each planet (or moon) counts."""
+        reports = self.reports
+        key = ((reports["galaxy"].astype(np.int64) * 1000 + reports["system"]) * 100
+               + reports["position"]) * 2 + reports["moon"]
+        order = np.lexsort((-reports["time"], key))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = key[order][1:] != key[order][:-1]
+        latest = reports[order[first]]
+
+        resources = latest["metal"] + latest["crystal"] + latest["deuterium"]
+        self.index = {"reports": latest,
+                      "coords": np.stack([latest["galaxy"], latest["system"], latest["position"]], axis=1),
+                      "expected": resources * latest["loot"].astype(float)}
+
+    def rank(self, start, speed, n=10, max_fleet=0, max_defense=0, percent=10, uni_speed=1, flags=0,
+             max_age=None, **universe):
+        """The n planets with the most expected loot per second of a round trip from start, for
+        a fleet with speed (see flight.fleet_speed). Only the ones whose fleet and defence values
+        are at most max_fleet and max_defense (None for any, not seen counts as too much), that
+        have the status flags and were spied less than max_age seconds ago. universe has the
+        arguments of flight.distance."""
+        if self.index is None: self.reindex()
+        reports, coords, expected = self.index["reports"], self.index["coords"], self.index["expected"]
+
+        keep = (reports["status"] & flags) == flags
+        if max_fleet is not None: keep &= (reports["fleet"] >= 0) & (reports["fleet"] <= max_fleet)
+        if max_defense is not None: keep &= (reports["defense"] >= 0) & (reports["defense"] <= max_defense)
+        if max_age is not None: keep &= reports["time"] >= time.time() - max_age
+        found = np.nonzero(keep)[0]
+
+        dist = flight.distance([start], coords[found], **universe)[0] if len(found) else np.zeros(0)
+        seconds = 2 * flight.duration(dist, speed, percent, uni_speed) # there and back
+        per_second = expected[found] / seconds
+
+        best = np.argsort(-per_second, kind="stable")[:n]
+        return OrderedDict([("coords", coords[found][best]),
+                            ("loot", expected[found][best]),
+                            ("duration", seconds[best]),
+                            ("per_second", per_second[best]),
+                            ("reports", reports[found][best])])
+
+class ReportReader:
+
+    def __init__(self, game, store, workers=4):
+        self.game = game # OGamer, its session takes care of the rate limit
+        self.store = store
+        self.workers = workers
+
+    def fetch(self, url, data=None):
+        logins = self.game.logins
+        method = "GET" if data is None else "POST"
+        content = self.game.request(method, "messages", data=data, url=url)
+        if parsers.logged_out(content):
+            self.game.relogin(logins, "messages")
+            content = self.game.request(method, "messages", data=data, url=url)
+        return content
+
+    def fetch_page(self, page):
+        """Summaries of one page of espionage reports, newest first, and how many pages there are."""
+        form = {"messageId": -1, "tabid": codes.messages["espionage"], "action": 107,
+                "pagination": page, "ajax": 1}
+        url = self.game.page_url("messages") + "&tab={}&ajax=1".format(codes.messages["espionage"])
+        return parse_list(self.fetch(url, form), self.game.parser)
+
+    def fetch_detail(self, row):
+        url = self.game.page_url("messages") + "&messageId={}&tabid={}&ajax=1".format(
+            row["id"], codes.messages["espionage"])
+        return parse_detail(self.fetch(url), row.copy(), self.game.parser)
+
+    def read(self, pages=None, details=True, everything=False):
+        """Read the new reports into the store, up to pages pages (all of them if None). The
+        pages are read a few at a time, and unless everything is set it stops after the first
+        few that have a report already in the store (the older ones were read before). With
+        details the whole report is read too, for the ones not seen before. Returns how many
+        reports were new."""
+        first, last = self.fetch_page(1)
+        if pages is not None: last = min(last, pages)
+        summaries = [first]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            todo = list(range(2, last + 1))
+            batch = [first]
+            while todo and (everything or not any(row["id"] in self.store for rows in batch for row in rows)):
+                numbers, todo = todo[:self.workers], todo[self.workers:]
+                batch = [rows for rows, _ in pool.map(self.fetch_page, numbers)]
+                summaries.extend(batch)
+
+            seen = set()
+            new = []
+            for row in np.concatenate(summaries):
+                if row["id"] not in self.store and int(row["id"]) not in seen:
+                    seen.add(int(row["id"]))
+                    new.append(row)
+            if details: new = list(pool.map(self.fetch_detail, new))
+
+        found = self.store.add(new)
+        if self.store.path: self.store.save()
+        return found
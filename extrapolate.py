@@ -0,0 +1,186 @@
+"""Working out a planet's resources from its mines, instead of asking the server every time.
+
+A ResourceModel starts from resources seen on the server and adds what the mines make since then
+(with the energy shortage, the fusion reactor burning deuterium, and mines stopping when the
+storage is full). It also knows how wrong it could be by now. A Tracker keeps a model per planet
+and only fetches the resources again when that error gets bigger than the tolerance.
+
+    tracker = Tracker(game, tolerance=2000)
+    tracker.resources("Homeworld") # from the server the first time, then mostly from the model
+    tracker.full_at("Homeworld") # when each storage fills up
+    tracker.forget("Homeworld") # after building or sending fleets from it
+"""
+import time
+from collections import OrderedDict
+
+from ogamy import tools
+
+mines = ["metal", "crystal", "deuterium"]
+
+class ResourceModel:
+    """Resources of one planet over time. mines, storage, planet_info, technologies and ships
+    are what the fetch functions (or fetch_empire) return, when is when resources were read
+    (time.time() seconds). drift is how wrong the production rates can be, as a fraction."""
+
+    def __init__(self, resources, mines_lvl, storage, planet_info=None, technologies=None, ships=None,
+                 uni_speed=1, when=None, drift=0.02):
+        technologies = technologies or {}
+        max_temp = tools.temperature(planet_info["temperature"])[1] if planet_info else 0
+        plasma = technologies.get("plasma", 0)
+        satellites = (ships or {}).get("satellite", 0)
+
+        self.start = OrderedDict((mine, float(resources[mine])) for mine in mines)
+        self.when = time.time() if when is None else when
+        self.drift = drift
+        self.caps = OrderedDict((mine, float(tools.storage_capacity(storage.get(mine, 0)))) for mine in mines)
+
+        # energy: what the mines need against what the plants and satellites make
+        levels = [mines_lvl.get(mine, 0) for mine in mines]
+        needed = float(tools.energy_use(*levels) - tools.energy_use(0, 0, 0))
+        fusion = mines_lvl.get("fusion", 0)
+        made = float(tools.solar_energy(mines_lvl.get("solar", 0))
+                     + tools.fusion_energy(fusion, technologies.get("energy", 0))
+                     + satellites * tools.satellite_energy(max_temp))
+        self.energy = made - needed
+        self.factor = 1.0 if needed <= made else made / needed # mines slow down without energy
+
+        # per second
+        self.rates = OrderedDict()
+        for mine, level in zip(mines, levels):
+            per_hour = tools.base_production[mine] * uni_speed
+            per_hour += float(tools.production(mine, level, max_temp, uni_speed, plasma)) * self.factor
+            if mine == "deuterium": per_hour -= float(tools.fusion_deuterium(fusion)) * uni_speed
+            self.rates[mine] = per_hour / 3600
+
+    @classmethod
+    def from_empire(cls, empire, planet, when=None, **kwargs):
+        """Model of a planet from OGamer.fetch_empire()."""
+        pages = empire["planets"][planet]
+        return cls(pages["resources"], pages["mines"], pages["storage"], pages["planet_info"],
+                   empire["technologies"], pages["ships"], when=when, **kwargs)
+
+    def amount(self, mine, when):
+        """How much of one resource there is at when. Production stops at the storage cap, but
+        more than that can be there (brought by fleets)."""
+        start, rate, cap = self.start[mine], self.rates[mine], self.caps[mine]
+        seconds = max(when - self.when, 0)
+        if rate <= 0: return max(start + rate * seconds, 0) # only the reactor burning deuterium
+        if start >= cap: return start
+        return min(start + rate * seconds, cap)
+
+    def project(self, when=None):
+        """Resources at when (now if None), like fetch_resources returns them."""
+        when = time.time() if when is None else when
+        found = OrderedDict((mine, int(self.amount(mine, when))) for mine in mines)
+        found["energy"] = int(self.energy)
+        return found
+
+    def full_at(self):
+        """When each storage fills up (time.time() seconds). The time the model started if it's
+        already full, None if it never fills up (nothing being made)."""
+        found = OrderedDict()
+        for mine in mines:
+            start, rate, cap = self.start[mine], self.rates[mine], self.caps[mine]
+            if start >= cap: found[mine] = self.when
+            elif rate <= 0: found[mine] = None
+            else: found[mine] = self.when + (cap - start) / rate
+        return found
+
+    def error(self, when=None):
+        """How far off the projection at when could be, for each resource. The server shows
+        rounded down numbers, so it's never less than 1."""
+        when = time.time() if when is None else when
+        seconds = max(when - self.when, 0)
+        return OrderedDict((mine, 1 + self.drift * abs(self.rates[mine]) * seconds) for mine in mines)
+
+    def observed_drift(self, resources, when):
+        """The drift that would explain how far off the model was from resources seen at when."""
+        seconds = when - self.when
+        drift = 0.0
+        for mine in mines:
+            made = abs(self.rates[mine]) * seconds
+            if made <= 0: continue
+            off = abs(float(resources[mine]) - self.amount(mine, when)) - 1
+            drift = max(drift, off / made)
+        return drift
+
+class Tracker:
+    """Resources of every planet of a game, fetched only when the model can't be trusted anymore.
+    tolerance is how many units of a resource the answer can be off by. The levels (mines,
+    storage, ...) are fetched again after levels_ttl seconds, or after forget()."""
+
+    def __init__(self, game, tolerance=1000, uni_speed=1, levels_ttl=3600, min_drift=0.001):
+        self.game = game
+        self.tolerance = tolerance
+        self.uni_speed = uni_speed
+        self.levels_ttl = levels_ttl
+        self.min_drift = min_drift
+        self.models = {} # planet -> ResourceModel
+        self.levels = {} # planet -> (when, what the model needs besides resources)
+        self.technologies = None
+        self.fetches = 0 # how many times the resources were fetched
+        self.projections = 0 # and how many times they came from the model
+
+    def planet_name(self, planet):
+        """Planets are kept by name (fetch_planet_info only knows them by name), but ids and None
+        (the selected planet) work too, like in the rest of OGamer. None is turned into the
+        selected planet here, so the resources and the levels are both read from that one
+        (fetch_planet_info without a planet would use the first planet)."""
+        if planet is None and self.game.planet_key(None) is None:
+            self.game.get_soup("overview", cache=False) # tells us which one is selected
+        key = self.game.planet_key(planet)
+        for name, planet_id in self.game.planet_ids.items():
+            if planet_id == key: return name
+        return planet
+
+    def planet_levels(self, planet):
+        now = time.time()
+        if planet in self.levels and now - self.levels[planet][0] < self.levels_ttl: return self.levels[planet][1]
+        if self.technologies is None: self.technologies = self.game.fetch_technologies()
+        found = {"mines_lvl": self.game.fetch_mines(planet), "storage": self.game.fetch_storage(planet),
+                 "planet_info": self.game.fetch_planet_info(planet), "ships": self.game.fetch_ships(planet),
+                 "technologies": self.technologies}
+        self.levels[planet] = (now, found)
+        return found
+
+    def sync(self, planet):
+        """Fetch the resources and start a new model from them."""
+        resources = self.game.fetch_resources(planet)
+        now = time.time()
+        self.fetches += 1
+
+        # learn how good the rates are from how far off the old model was
+        old = self.models.get(planet)
+        drift = self.min_drift if old is None else old.drift
+        if old is not None and now > old.when:
+            drift = max(self.min_drift, min(old.observed_drift(resources, now), 1.0), drift / 2)
+
+        self.models[planet] = ResourceModel(resources, uni_speed=self.uni_speed, when=now, drift=drift,
+                                            **self.planet_levels(planet))
+        return self.models[planet]
+
+    def model(self, planet=None):
+        """Model for the planet, synced with the server if it's too far off."""
+        planet = self.planet_name(planet)
+        model = self.models.get(planet)
+        if model is None or max(model.error().values()) > self.tolerance:
+            return self.sync(planet)
+        self.projections += 1
+        return model
+
+    def resources(self, planet=None, when=None):
+        """Like fetch_resources, but from the model while it's good enough."""
+        return self.model(planet).project(when)
+
+    def full_at(self, planet=None):
+        return self.model(planet).full_at()
+
+    def forget(self, planet=None):
+        """Something changed the planet (a build, a fleet), start over from the server."""
+        if planet is not None: planet = self.planet_name(planet)
+        self.models.pop(planet, None)
+        self.levels.pop(planet, None)
+        if planet is None: # could have been any planet
+            self.models.clear()
+            self.levels.clear()
+            self.technologies = None
@@ -0,0 +1,117 @@
+"""Sending many fleets at once.
+
+Every fleet goes through fleet1, fleet2, fleet3 and movement. Each page's answer already has the
+hidden fields (and, in fleet3, the token) the next one needs, so nothing is downloaded twice.
+Fleets from different planets are sent at the same time, fleets from the same planet one after
+the other (the fleet pages of a planet follow each other, and the ships of one fleet change what
+is left for the next).
+
+    orders = [FleetOrder({"lcargo": 10}, (1, 105, 7), "transport", {"metal": 5000}, planet="Colony"),
+              FleetOrder({"lcargo": 5}, (2, 250, 12), "deployment", planet="Homeworld")]
+    dispatch(game, orders) # the movement page answers, in the same order
+"""
+import copy
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from ogamy import codes
+from ogamy import parsers
+
+class FleetOrder:
+    """One fleet to send. ships and res map names (like in codes) to amounts, dest is
+    (galaxy, system, position) and kind is 1 for a planet, 2 for a debris field and 3 for a moon."""
+
+    def __init__(self, ships, dest, mission, res=None, speed=10, planet=None, kind=1):
+        self.ships = ships
+        self.dest = dest
+        self.mission = mission
+        self.res = res or {}
+        self.speed = speed # 1 to 10, tens of percent
+        self.planet = planet
+        self.kind = kind
+
+    def form(self):
+        """What we choose on the fleet pages, on top of the hidden fields the server gives."""
+        form = {"galaxy": self.dest[0], "system": self.dest[1], "position": self.dest[2],
+                "type": str(self.kind), # planet/debris/moon
+                "mission": codes.missions[self.mission],
+                "speed": str(self.speed)}
+        # now we add the ships
+        for ship, number in self.ships.items(): form["am{}".format(codes.ships[ship])] = number
+        return form
+
+def next_form(game, content, page, order):
+    """The hidden fields of a fleet page's answer, with the order's choices on top."""
+    form = parsers.hidden(game.parse(content, page, "form"))
+    form.update(order.form())
+    return form
+
+def send(game, order):
+    """Send one fleet: fleet1 GET and fleet2, fleet3 and movement POSTs. Returns the answer
+    of the movement page, None if it couldn't be sent. If we get thrown out or the token is
+    refused it starts again from fleet1, once."""
+    for attempt in range(2):
+        logins = game.logins
+        content = game.request("GET", "fleet1", order.planet)
+        # each page's answer has the hidden fields for the next one
+        for page, previous in [("fleet2", "fleet1"), ("fleet3", "fleet2")]:
+            if not game.logged_in(use_page=content): break
+            content = game.request("POST", page, order.planet, data=next_form(game, content, previous, order))
+
+        if not game.logged_in(use_page=content):
+            game.relogin(logins, "fleet1") # thrown out halfway, log in and start again from fleet1
+            continue
+
+        # fleet3 has the token for sending the fleet, no need to download it again
+        form = next_form(game, content, "fleet3", order)
+        form.update({"holdingtime": "1", # dont know what this is yet
+                     "expeditiontime": "1", # also dont know what this is yet
+                     "union2": "0", # dont know this one either
+                     "holdingOrExpTime": "0", # nope
+                     "acsValues": "-", # no clue
+                     "prioMetal": "1", # nope
+                     "prioCrystal": "2", # nope
+                     "prioDeuterium": "3"}) # aaaaand nope
+        # next we add the resources to take
+        form.update(order.res)
+
+        # now that the fleet cake is done we just give to the server
+        content = game.request("POST", "movement", order.planet, data=form)
+        if not game.logged_in(use_page=content): # the session was gone, the fleet didn't leave
+            game.relogin(logins, "movement")
+            continue
+        if parsers.token_rejected(content): continue # the token was too old, fleet3 gives a new one
+
+        game.forget(order.planet) # ships and resources left the planet
+        game.trace("sent fleet from", order.planet, "to", order.dest)
+        return content
+
+    game.crash("Could not send fleet to", order.dest, "after trying again.", exit=False)
+    return None
+
+def dispatch(game, orders, workers=4):
+    """Send a list of FleetOrders. Planets go at the same time (up to workers of them) and the
+    orders of each planet in the order given. Returns the movement answers in the same order
+    as orders (None for fleets that couldn't be sent)."""
+    # without a planet the server uses the selected one, and a thread sending from another
+    # planet changes that. so those leave from the planet selected now, said out loud
+    if any(order.planet is None for order in orders):
+        if game.planet_key(None) is None: game.get_soup("overview", cache=False) # tells us which
+        selected = game.planet_key(None)
+        orders = [order if order.planet is not None else copy.copy(order) for order in orders]
+        for order in orders:
+            if order.planet is None: order.planet = selected
+
+    by_planet = OrderedDict()
+    for i, order in enumerate(orders):
+        by_planet.setdefault(game.planet_key(order.planet), []).append(i)
+
+    answers = [None] * len(orders)
+    def send_all(indexes):
+        for i in indexes: answers[i] = send(game, orders[i])
+
+    if len(by_planet) == 1: send_all(next(iter(by_planet.values()))) # no need for threads
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(send_all, by_planet.values())) # raises what they raised
+    return answers
@@ -0,0 +1,103 @@
+"""How long fleets take to fly and how much deuterium they burn.
+
+Works on whole batches: every start against every destination, for the 10 speeds send_fleet
+takes, in one go.
+
+    techs = game.fetch_technologies()
+    planets = [(1, 101, 8), (1, 103, 4), (2, 250, 12)]
+    targets = galaxy_store.coords(...) # or any (n, 3) array of coordinates
+    found = journey({"lcargo": 20}, techs, planets, targets)
+    found["duration"][0, :, 9] # seconds from the first planet to every target at 100%
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+# base speed, drive and deuterium used, for ships that fly
+ship_drives = {
+    "lfighter": (12500, "combustion", 20),
+    "hfighter": (10000, "impulse", 75),
+    "cruiser": (15000, "impulse", 300),
+    "battleship": (10000, "hyperdrive", 500),
+    "battlecruiser": (10000, "hyperdrive", 250),
+    "bomber": (4000, "impulse", 700),
+    "destroyer": (5000, "hyperdrive", 1000),
+    "deathstar": (100, "hyperdrive", 1),
+    "scargo": (5000, "combustion", 10),
+    "lcargo": (7500, "combustion", 50),
+    "colony": (2500, "impulse", 1000),
+    "recycler": (2000, "combustion", 300),
+    "probe": (100000000, "combustion", 1),
+}
+# ships that get a better drive once the technology is high enough, best one first
+better_drives = {
+    "scargo": [("impulse", 5, 10000, 20)],
+    "bomber": [("hyperdrive", 8, 5000, 1000)],
+    "recycler": [("hyperdrive", 15, 6000, 900), ("impulse", 17, 4000, 600)],
+}
+# how much faster each level of a drive technology makes a ship
+drive_bonus = {"combustion": 0.1, "impulse": 0.2, "hyperdrive": 0.3}
+
+speeds = np.arange(1, 11) # what send_fleet takes, tens of percent
+
+def drive(ship, techs=None):
+    """Speed and deuterium use of a ship with the drive technologies in techs."""
+    techs = techs or {}
+    speed, tech, consumption = ship_drives[ship]
+    for better, level, better_speed, better_consumption in better_drives.get(ship, []):
+        if techs.get(better, 0) >= level:
+            speed, tech, consumption = better_speed, better, better_consumption
+            break
+    return speed * (1 + drive_bonus[tech] * techs.get(tech, 0)), consumption
+
+def fleet_speed(ships, techs=None):
+    """A fleet flies as fast as its slowest ship."""
+    flying = [ship for ship, number in ships.items() if number > 0]
+    if any(ship not in ship_drives for ship in flying): raise ValueError("solar satellites can't fly")
+    return min(drive(ship, techs)[0] for ship in flying)
+
+def distance(starts, dests, galaxies=9, systems=499, donut_galaxy=True, donut_system=True):
+    """Distance between every start and every destination, (n, 3) and (m, 3) arrays of
+    coordinates, as an (n, m) array. In a donut universe the first and last galaxies (or
+    systems) are next to each other."""
+    starts = np.atleast_2d(np.asarray(starts))[:, None, :]
+    dests = np.atleast_2d(np.asarray(dests))[None, :, :]
+    diff = np.abs(starts - dests)
+
+    galaxy, system, position = diff[..., 0], diff[..., 1], diff[..., 2]
+    if donut_galaxy: galaxy = np.minimum(galaxy, galaxies - galaxy)
+    if donut_system: system = np.minimum(system, systems - system)
+
+    return np.where(galaxy > 0, 20000 * galaxy,
+           np.where(system > 0, 2700 + 95 * system,
+           np.where(position > 0, 1000 + 5 * position, 5))) # same position, like planet to moon
+
+def duration(dist, speed, percent=speeds, uni_speed=1):
+    """Seconds to fly dist at percent tens of percent of speed. With more than one percent
+    the speeds are the last axis."""
+    dist = np.asarray(dist, dtype=float)
+    percent = np.asarray(percent, dtype=float)
+    if percent.ndim: dist = dist[..., None]
+    return np.round((3500 / (percent / 10) * np.sqrt(dist * 10 / speed) + 10) / uni_speed)
+
+def fuel(ships, techs, dist, seconds, uni_speed=1, fuel_factor=1):
+    """Deuterium used by ships to fly dist in seconds (same shapes, like from duration)."""
+    dist = np.asarray(dist, dtype=float)
+    if dist.ndim < np.ndim(seconds): dist = dist[..., None]
+    total = 0
+    for ship, number in ships.items():
+        if number <= 0: continue
+        speed, consumption = drive(ship, techs)
+        ship_speed = 35000 / np.maximum(seconds * uni_speed - 10, 1) * np.sqrt(dist * 10 / speed)
+        total = total + consumption * fuel_factor * number * dist / 35000 * (ship_speed / 10 + 1)**2
+    return np.round(total) + 1
+
+def journey(ships, techs, starts, dests, uni_speed=1, fuel_factor=1, **universe):
+    """Distance, duration and deuterium for ships from every start to every destination.
+    duration and fuel are (starts, dests, 10), one for each speed. universe has the
+    arguments of distance (galaxies, systems, donut_galaxy, donut_system)."""
+    dist = distance(starts, dests, **universe)
+    seconds = duration(dist, fleet_speed(ships, techs), speeds, uni_speed)
+    return OrderedDict([("distance", dist),
+                        ("duration", seconds),
+                        ("fuel", fuel(ships, techs, dist, seconds, uni_speed, fuel_factor))])
@@ -0,0 +1,217 @@
+"""Reading the galaxy view and keeping every slot of the universe on disk.
+
+Every slot is one row of a numpy structured array of shape (galaxies, systems, 15), saved as a
+memory mapped .npy file, so the whole universe takes a few MB and loads instantly.
+
+    store = GalaxyStore("universe")
+    scanner = GalaxyScanner(game, store, workers=4)
+    scanner.scan(max_age=24 * 3600) # run it again to resume, done systems are skipped
+    store.inactive()
+"""
+import os
+import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from ogamy import parsers
+
+positions = 15
+
+slot_dtype = np.dtype([("planet_id", "i4"),
+                       ("player_id", "i4"),
+                       ("player", "S20"),
+                       ("planet", "S20"),
+                       ("alliance", "S8"),
+                       ("status", "u1"), # flags below
+                       ("moon", "?"),
+                       ("debris_metal", "i4"),
+                       ("debris_crystal", "i4")])
+
+system_dtype = np.dtype([("scanned", "f8"), # when it was last read, 0 if never
+                         ("hash", "u8")]) # to know if anything changed since then
+
+# bits of the status field
+INACTIVE = 1
+LONGINACTIVE = 2
+VACATION = 4
+BANNED = 8
+NOOB = 16
+STRONG = 32
+OUTLAW = 64
+HONORABLE = 128
+status_flags = {"inactive": INACTIVE, "longinactive": LONGINACTIVE | INACTIVE, "vacation": VACATION,
+                "banned": BANNED, "noob": NOOB, "strong": STRONG, "outlaw": OUTLAW,
+                "honorableTarget": HONORABLE}
+
+def encode(text, field):
+    """Text as it's kept in one of the fixed width fields of slot_dtype, cut to its size. Names
+    are looked up with this too, so a long one still matches what was kept of it."""
+    return text.encode()[:slot_dtype[field].itemsize]
+
+def decode(value):
+    """Text back from one of the fixed width fields (which can cut a character in half)."""
+    return value.decode(errors="ignore")
+
+def parse_number(text):
+    return int(text.split()[-1].replace(".", ""))
+
+def parse_system(content, backend="html.parser"):
+    """The 15 slots of a solar system from the galaxyContent answer."""
+    table = json.loads(content)["galaxy"]
+    soup = parsers.make_soup(table, backend)
+    rows = np.zeros(positions, dtype=slot_dtype)
+
+    for tr in soup.find_all("tr", {"class": "row"}):
+        planet = tr.find("td", {"class": "microplanet"})
+        if planet is None or not planet.get("data-planet-id"): continue # empty slot
+        slot = rows[int(tr.find("td", {"class": "position"}).text.strip()) - 1]
+
+        slot["planet_id"] = int(planet["data-planet-id"])
+        slot["planet"] = encode(tr.find("td", {"class": "planetname"}).text.strip(), "planet")
+        slot["moon"] = tr.find("td", {"class": "moon"}).has_attr("data-moon-id")
+        for debris in tr.find_all("li", {"class": "debris-content"}):
+            if "Metal" in debris.text: slot["debris_metal"] = parse_number(debris.text)
+            elif "Crystal" in debris.text: slot["debris_crystal"] = parse_number(debris.text)
+
+        player = tr.find("td", {"class": "playername"})
+        link = player.find("a", rel=True)
+        if link is not None:
+            slot["player_id"] = int(link["rel"][0].replace("player", ""))
+            slot["player"] = encode(link.text.strip(), "player")
+        status = 0
+        for span in player.find_all("span", class_=True):
+            for name in span["class"]:
+                status |= status_flags.get(name.replace("status_abbr_", ""), 0)
+        slot["status"] = status
+
+        ally = tr.find("td", {"class": "allytag"})
+        if ally is not None: slot["alliance"] = encode(ally.text.strip(), "alliance")
+
+    return rows
+
+class GalaxyStore:
+
+    def __init__(self, path, galaxies=9, systems=499):
+        os.makedirs(path, exist_ok=True)
+        self.slots = self.open(os.path.join(path, "slots.npy"), slot_dtype, (galaxies, systems, positions))
+        self.systems = self.open(os.path.join(path, "systems.npy"), system_dtype, (galaxies, systems))
+        self.index = None # built again when needed after something changes
+
+    def open(self, path, dtype, shape):
+        mode = "r+" if os.path.exists(path) else "w+"
+        return np.lib.format.open_memmap(path, mode=mode, dtype=dtype, shape=shape)
+
+    def update(self, galaxy, system, rows):
+        """Save a scanned system. Only written if something is different. Returns if it changed."""
+        digest = int.from_bytes(hashlib.blake2b(rows.tobytes(), digest_size=8).digest(), "little")
+        info = self.systems[galaxy - 1, system - 1]
+        changed = info["hash"] != digest or info["scanned"] == 0
+        if changed:
+            self.slots[galaxy - 1, system - 1] = rows
+            info["hash"] = digest
+            self.index = None
+        info["scanned"] = time.time()
+        return changed
+
+    def flush(self):
+        self.slots.flush()
+        self.systems.flush()
+
+    def pending(self, max_age=None, galaxies=None):
+        """(galaxy, system) pairs never scanned, or scanned more than max_age seconds ago."""
+        scanned = self.systems["scanned"]
+        old = scanned == 0
+        if max_age is not None: old |= scanned < time.time() - max_age
+        found = [(g + 1, s + 1) for g, s in zip(*np.nonzero(old))]
+        if galaxies is not None: found = [(g, s) for g, s in found if g in galaxies]
+        return found
+
+    ########### indexes ##############
+
+    def reindex(self):
+        """Group the occupied slots by player and by alliance."""
+        flat = self.slots.reshape(-1)
+        occupied = np.nonzero(flat["planet_id"])[0]
+        self.index = {"occupied": occupied, "status": np.asarray(flat["status"][occupied])}
+        for field in ["player", "alliance"]:
+            keys = np.asarray(flat[field][occupied])
+            order = np.argsort(keys, kind="stable")
+            names, starts = np.unique(keys[order], return_index=True)
+            self.index[field] = dict(zip(names.tolist(), np.split(occupied[order], starts[1:])))
+
+    def coords(self, flat):
+        """Flat slot numbers to an (n, 3) array of (galaxy, system, position)."""
+        return np.stack(np.unravel_index(flat, self.slots.shape), axis=1) + 1
+
+    def by_player(self, name):
+        if self.index is None: self.reindex()
+        return self.coords(self.index["player"].get(encode(name, "player"), np.zeros(0, dtype=int)))
+
+    def by_alliance(self, tag):
+        if self.index is None: self.reindex()
+        return self.coords(self.index["alliance"].get(encode(tag, "alliance"), np.zeros(0, dtype=int)))
+
+    def with_status(self, flags, without=0):
+        """Slots with all of the status flags and none of without."""
+        if self.index is None: self.reindex()
+        status = self.index["status"]
+        found = ((status & flags) == flags) & ((status & without) == 0)
+        return self.coords(self.index["occupied"][found])
+
+    def inactive(self, long=False):
+        """Inactive players that aren't in vacation mode or banned (so they can be attacked)."""
+        return self.with_status(LONGINACTIVE if long else INACTIVE, without=VACATION | BANNED)
+
+class GalaxyScanner:
+
+    def __init__(self, game, store, workers=4):
+        self.game = game # OGamer, its session takes care of the rate limit
+        self.store = store
+        self.workers = workers
+
+    def fetch_system(self, galaxy, system):
+        """Download one system and parse it."""
+        url = self.game.page_url("galaxyContent") + "&ajax=1"
+        form = {"galaxy": galaxy, "system": system}
+        logins = self.game.logins
+        content = self.game.request("POST", "galaxyContent", data=form, url=url)
+        if not content.lstrip().startswith(b"{"): # not json, we got thrown out to the login page
+            self.game.relogin(logins, "galaxyContent")
+            content = self.game.request("POST", "galaxyContent", data=form, url=url)
+        return parse_system(content, self.game.parser)
+
+    def scan(self, max_age=None, galaxies=None, on_system=None, flush_every=50):
+        """Read every system not scanned in the last max_age seconds (or never).
+        If it gets interrupted, call it again with the same max_age to carry on.
+        on_system(galaxy, system, rows, changed) is called for each system.
+        Returns how many systems changed."""
+        todo = deque(self.store.pending(max_age, galaxies))
+        changed = done = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+            try:
+                while todo or running:
+                    # keep only a few requests waiting, so stopping doesn't leave thousands queued
+                    while todo and len(running) < self.workers * 2:
+                        galaxy, system = todo.popleft()
+                        running[pool.submit(self.fetch_system, galaxy, system)] = (galaxy, system)
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        galaxy, system = running.pop(future)
+                        rows = future.result()
+                        is_new = self.store.update(galaxy, system, rows)
+                        changed += is_new
+                        done += 1
+                        if on_system is not None: on_system(galaxy, system, rows, is_new)
+                        if done % flush_every == 0: self.store.flush()
+            finally:
+                for future in running: future.cancel()
+                self.store.flush()
+
+        return changed
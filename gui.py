@@ -1,15 +1,59 @@
 #!/usr/bin/env python3
 import sys
-import math
 import time
 import getpass
+import queue
 import curses
+import threading
 from collections import OrderedDict
 
 from ogamy import OGamer
+from ogamy import tools
+from ogamy.cache import PageCache
+
+# what each station shows, so it can be fetched before it's drawn
+station_grabs = {"overview": ["planet_info"],
+                 "mines": ["mines", "storage"],
+                 "buildings": ["buildings"],
+                 "technologies": ["technologies"],
+                 "shipyard": ["ships"],
+                 "defenses": ["defenses"],
+                 "fleet": []}
+# the same for every planet, so they're kept when changing planets
+shared_grabs = ["technologies", "points"]
+# always on screen, in the header
+header_grabs = ["resources", "storage"]
+
+# how long (in seconds) something fetched is shown before fetching it again
+grab_ttl = {"resources": 30,
+            "planet_info": 600,
+            "mines": 300,
+            "storage": 300,
+            "buildings": 300,
+            "technologies": 300,
+            "ships": 120,
+            "defenses": 120,
+            "points": 300}
+
+class Panel:
+    """A curses window for one part of the screen. It's drawn to with screen coordinates, and
+    whatever doesn't fit in it is cut off."""
+
+    def __init__(self, y, x, height, width):
+        self.y, self.x = y, x
+        self.height, self.width = max(height, 1), max(width, 1)
+        self.window = curses.newwin(self.height, self.width, y, x)
+
+    def addstr(self, y, x, text, attr=0):
+        y, x = y - self.y, int(x) - self.x
+        if not 0 <= y < self.height or x >= self.width: return
+        if x < 0: text, x = text[-x:], 0
+        # curses complains about writing the last character of a window
+        text = text[:self.width - x - (y == self.height - 1)]
+        if text: self.window.addstr(y, x, text, attr)
 
 class Viewer:
-    def __init__(self, game, screen):
+    def __init__(self, game, screen, cache_entries=128):
         self.screen = screen
         self.game = game
         self.planets = list(self.game.planet_ids.keys())
@@ -25,34 +69,173 @@ class Viewer:
         self.menu_len = dict(zip(self.stations, [4, 8, 8, 16, 14, 9, 1]))
 
         self.cursor = [0, 0]
-        self.station_info = self.game.fetch_planet_info(planet=self.planet)
 
-        self.cache = {"planets": list(self.game.planet_ids.keys())}
-
-    def grab_cache(self, grab):
-        """Return cached version of requested if it exists. If not make cached entry."""
-        if grab in self.cache.keys(): return self.cache[grab]
-        else: # fetch from internet and save in cache
-            function = getattr(self.game, "fetch_{}".format(grab)) # get the function object
-            if grab == "technologies": # the techs function does not need the planet argument
-                fetched = function()
+        # each part of the screen is its own window, and only the ones that changed are drawn again
+        self.draw_panel = OrderedDict([("header", self.draw_header),
+                                       ("left", self.draw_stations),
+                                       ("middle", self.draw_middle),
+                                       ("right", self.draw_planets),
+                                       ("bottom", self.draw_bottom)])
+        self.layout()
+        self.dirty = set(self.draw_panel)
+
+        # what was fetched, by (grab, planet). planet is None for the shared grabs.
+        # a few entries for every planet, so going back to a planet doesn't fetch it again
+        self.cache = PageCache(ttl=grab_ttl, max_entries=cache_entries)
+        self.shown_age = None # in the header, to update it every second
+
+        # the network is only used from the worker thread, so the screen never waits for it.
+        # draw functions ask for what they need and draw a placeholder until it arrives
+        self.jobs = queue.Queue() # (generation, grab, planet) for the worker
+        self.results = queue.Queue() # (grab, planet, fetched, error) back from the worker
+        self.pending = set() # (grab, planet) asked for and not back yet
+        self.generation = 0 # goes up when changing planet, older jobs aren't worth doing anymore
+        self.error = None
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def layout(self):
+        """Make the windows for the current screen size (and planet names)."""
+        maxy, maxx = self.screen.getmaxyx()
+        left = max(map(len, self.stations)) + 2
+        right = max(map(len, self.planets)) + 2
+        self.panels = {"header": Panel(0, 0, 2, maxx),
+                       "left": Panel(4, 0, maxy - 5, left),
+                       "middle": Panel(2, left, maxy - 3, maxx - left - right),
+                       "right": Panel(4, maxx - right, maxy - 5, right),
+                       "bottom": Panel(maxy - 1, 0, 1, maxx)}
+
+    def mark(self, *panels):
+        """These panels need to be drawn again on the next update."""
+        self.dirty.update(panels)
+
+    def update(self):
+        """Draw the dirty panels and send it all to the terminal at once."""
+        for name, draw in self.draw_panel.items():
+            if name not in self.dirty: continue
+            panel = self.panels[name]
+            panel.window.erase() # unlike clear() this doesn't repaint the whole terminal
+            draw()
+            panel.window.noutrefresh()
+        self.dirty.clear()
+        curses.doupdate()
+
+    def cache_key(self, grab, planet):
+        return None if grab in shared_grabs else planet
+
+    def grab_cache(self, grab, planet=None):
+        """Return cached version of requested if it exists. If not ask the worker for it and
+        return None, the screen is drawn again when it arrives."""
+        planet = self.planet if planet is None else planet
+        fetched = self.cache.get(grab, self.cache_key(grab, planet))
+        if fetched is None: self.ask(grab, planet)
+        return fetched
+
+    def ask(self, grab, planet):
+        """Have the worker fetch something, if it wasn't asked for already."""
+        key = (grab, self.cache_key(grab, planet))
+        if key in self.pending: return
+        self.pending.add(key)
+        self.jobs.put((self.generation, grab, planet))
+
+    def fetch(self, grab, planet):
+        """Get something from the game. Only called from the worker thread."""
+        if grab == "planet_ids": return list(self.game.fetch_planet_ids().keys())
+        function = getattr(self.game, "fetch_{}".format(grab)) # get the function object
+        if grab in shared_grabs: # these functions do not need the planet argument
+            return function()
+        return function(planet=planet) # get what we want
+
+    def work(self):
+        """Worker thread: fetch whatever is asked for, skipping what became useless."""
+        while True:
+            job = self.jobs.get()
+            if job is None: return # viewer closed
+            generation, grab, planet = job
+            # the planet was changed after this was asked for (someone going through planets fast)
+            if generation != self.generation and planet != self.planet and grab not in shared_grabs:
+                self.results.put((grab, planet, None, None)) # skipped
+                continue
+            try: self.results.put((grab, planet, self.fetch(grab, planet), None))
+            except Exception as error: self.results.put((grab, planet, None, error))
+
+    def poll(self):
+        """Put whatever the worker finished in the cache, and redraw if anything arrived."""
+        while True:
+            try: grab, planet, fetched, error = self.results.get_nowait()
+            except queue.Empty: break
+            key = self.cache_key(grab, planet)
+            self.pending.discard((grab, key))
+            if error is not None:
+                self.error = "{}: {}".format(grab, error)
+                self.mark("bottom")
+            elif fetched is None: continue # the worker skipped it
+            elif grab == "planet_ids":
+                if fetched != self.planets:
+                    self.planets = fetched
+                    self.layout() # the sidebar could need to be wider
+                    self.mark(*self.draw_panel)
             else:
-                fetched = function(planet=self.planet) # get what we want
-
-            self.cache[grab] = fetched # save in cache
-            return fetched
+                self.cache.put(grab, key, fetched)
+                # prefetched things for other planets don't change the screen
+                if key is not None and planet != self.planet: continue
+                if grab in header_grabs: self.mark("header")
+                if grab in station_grabs[self.station]: self.mark("header", "middle") # header has the age
+                if grab == "points": self.mark("bottom")
+        if self.dirty: self.update()
+
+    def prefetch(self):
+        """When nothing else is being fetched, fetch what is next to the cursor: the other
+        stations of this planet, then the planets next to this one. One thing at a time, so
+        if a key is pressed the worker is never busy for long."""
+        if self.pending: return
+        if self.cursor[0] == 0: station = self.cursor[1]
+        else: station = self.stations.index(self.station)
+        if self.cursor[0] == 2: here = self.cursor[1]
+        else: here = self.planets.index(self.planet) if self.planet in self.planets else 0
+        near = lambda items, i: sorted(range(len(items)), key=lambda j: abs(j - i))
+
+        wanted = [(grab, self.planet) for i in near(self.stations, station)
+                  for grab in station_grabs[self.stations[i]]]
+        wanted += [("points", None)]
+        for i in near(self.planets, here)[1:]:
+            wanted += [(grab, self.planets[i]) for grab in header_grabs + station_grabs[self.station]]
+
+        for grab, planet in wanted:
+            planet = self.planet if planet is None else planet
+            if self.cache.age(grab, self.cache_key(grab, planet)) is None:
+                return self.ask(grab, planet)
+
+    def data_age(self):
+        """Seconds since the oldest thing on the screen was fetched, None if something is missing."""
+        ages = [self.cache.age(grab, self.cache_key(grab, self.planet))
+                for grab in header_grabs + station_grabs[self.station]]
+        if None in ages: return None
+        return int(max(ages))
 
     def dot_number(self, n):
         s = str(n)[::-1]
         chunks = [s[i:i + 3] for i in range(0, len(s), 3)]
         return ".".join(chunks)[::-1]
 
+    def draw_loading(self, panel, y):
+        """Placeholder for something the worker is still fetching."""
+        text = "loading..."
+        x = (self.screen.getmaxyx()[1] - len(text)) // 2
+        self.panels[panel].addstr(y, x, text, curses.A_DIM)
+
     def draw_header(self):
         """The header contains the planets name and resources."""
         # created padded string with name on the middle and add to screen
         planet_string = "{} - {}".format(self.planet, self.station.capitalize())
-        planet_x = (self.screen.getmaxyx()[1] - len(planet_string)) // 2
-        self.screen.addstr(0, planet_x, planet_string, curses.A_BOLD)
+        maxx = self.screen.getmaxyx()[1]
+        planet_x = (maxx - len(planet_string)) // 2
+        self.panels["header"].addstr(0, planet_x, planet_string, curses.A_BOLD)
+
+        # how old what we're showing is
+        self.shown_age = self.data_age()
+        age = "" if self.shown_age is None else "{}s ago".format(self.shown_age)
+        self.panels["header"].addstr(0, maxx - 12, age.rjust(11), curses.A_DIM)
 
         # create string with resources, and colors if storage is full for them
         self.draw_pretty_res()
@@ -61,11 +244,12 @@ class Viewer:
         """Show current planet's resources to the screen.
         Show resources in red if storage is full for that resource."""
         storage_level = self.grab_cache("storage")
+        res = self.grab_cache("resources")
+        if storage_level is None or res is None: return self.draw_loading("header", 1)
+
         storage = {}
         for mine, lvl in storage_level.items(): # replace level with max capacity
-            storage[mine] = 5000 * int(2.5 * math.e ** (20 * lvl / 33)) # formula for storage per level
-
-        res = self.grab_cache("resources")
+            storage[mine] = int(tools.storage_capacity(lvl)) # formula for storage per level
 
         # calculate number of spaces between resource, for prettiness
         maxx = self.screen.getmaxyx()[1] # horizontal size of screen
@@ -76,13 +260,13 @@ class Viewer:
 
         x = 0
         for mine, stored in res.items():
-            self.screen.addstr(1, x, "{}: ".format(mine.capitalize()))
+            self.panels["header"].addstr(1, x, "{}: ".format(mine.capitalize()))
             x += len(mine) + 2 # move cursor forward
 
             if mine != "energy" and stored >= storage[mine]: pair_num = 2 # red text on black
             elif mine == "energy" and res["energy"] < 0: pair_num = 2
             else: pair_num = 0 # normal white text on black
-            self.screen.addstr(1, x, self.dot_number(stored), curses.color_pair(pair_num))
+            self.panels["header"].addstr(1, x, self.dot_number(stored), curses.color_pair(pair_num))
 
             x += len(str(stored)) + spaces # move forward and add spaces
 
@@ -91,33 +275,37 @@ class Viewer:
         maxy, maxx = self.screen.getmaxyx()
 
         # get the info from the game object
-        info = tuple(map(self.dot_number, self.game.fetch_points().values()))
+        points = self.grab_cache("points")
+        if points is None: info = ("...", "...")
+        else: info = tuple(map(self.dot_number, points.values()))
         info_str = "Points: {} | Rank: {}".format(info[1], info[0])
+        if self.error is not None: info_str = "error fetching {}".format(self.error)
 
         # calculate starting x for centering
         start_x = (maxx - len(info_str)) // 2
-        self.screen.addstr(maxy - 1, start_x, info_str)
+        self.panels["bottom"].addstr(maxy - 1, start_x, info_str)
 
-    def draw_planets(self):
-        """Draw the right sidebar with all the planets."""
+    def draw_planets(self, lines=None):
+        """Draw the right sidebar with all the planets. With lines, only those planets."""
         screen_size = self.screen.getmaxyx()[1]
-        # check if planets is a dict
-        if isinstance(self.planets, OrderedDict): planets = (self.planets.keys())
-        else: planets = self.planets
         for i, planet in enumerate(self.planets):
+            if lines is not None and i not in lines: continue
             x = screen_size - len(planet) - 1
             pair_num = 1 if self.cursor == [2, i] else 0 # reverse text if its the cursor
-            self.screen.addstr(i + 4, x, planet, curses.color_pair(pair_num))
+            self.panels["right"].addstr(i + 4, x, planet, curses.color_pair(pair_num))
 
-    def draw_stations(self):
-        """Draw the left sidebar with all the possible stations."""
+    def draw_stations(self, lines=None):
+        """Draw the left sidebar with all the possible stations. With lines, only those stations."""
         for i, station in enumerate(self.stations):
+            if lines is not None and i not in lines: continue
             pair_num = 1 if self.cursor == [0, i] else 0 # reverse text if its on the cursor
-            self.screen.addstr(i + 4, 1, station.capitalize(), curses.color_pair(pair_num))
+            self.panels["left"].addstr(i + 4, 1, station.capitalize(), curses.color_pair(pair_num))
 
-    def draw_station_info(self, info, bold_titles=True):
+    def draw_station_info(self, info, bold_titles=True, lines=None):
         """Generic function to draw the info for a given station.
-        Info is a list where titles correspond to list of key value pairs."""
+        Info is a list where titles correspond to list of key value pairs.
+        With lines, only those lines are drawn (to move the cursor)."""
+        panel = self.panels["middle"]
         longest_title = max(map(lambda i: len(i[0]), info))
         longest_option = max(map(lambda i: max(map(lambda j: len(j[0]) + 2 + len(str(j[1])), i[1])), info))
 
@@ -128,8 +316,7 @@ class Viewer:
         y = 4 # position on screen
         for block in info:
             title = block[0].capitalize()
-            if bold_titles: self.screen.addstr(y, title_x, title, curses.A_BOLD)
-            else: self.screen.addstr(y, title_x, title)
+            if lines is None: panel.addstr(y, title_x, title, curses.A_BOLD if bold_titles else 0)
 
             for pair in block[1]:
                 thing, value = tuple(pair)
@@ -137,66 +324,71 @@ class Viewer:
                 string = "{}: {}{}".format(thing.capitalize(), spaces, value)
 
                 pair_num = 1 if self.cursor == [1, line] else 0 # reverse color, it's the cursor's line
-                self.screen.addstr(y, block_x, string, curses.color_pair(pair_num))
+                if lines is None or line in lines: panel.addstr(y, block_x, string, curses.color_pair(pair_num))
 
                 line += 1
                 y += 1
 
             y += 1 # leave one line between blocks
 
-    def draw_overview(self):
+    # the draw functions of the stations get what station_grabs says they need, already fetched
+
+    def draw_overview(self, info, lines=None):
         """Show planet information like space left, tempurature."""
-        info = self.grab_cache("planet_info")
-        self.draw_station_info([["", list(info.items())]])
+        self.draw_station_info([["", list(info.items())]], lines=lines)
 
-    def draw_mines(self):
-        levels = self.grab_cache("mines")
-        storage = self.grab_cache("storage")
-        self.draw_station_info([["mines", levels.items()], ["storage", storage.items()]])
+    def draw_mines(self, levels, storage, lines=None):
+        self.draw_station_info([["mines", levels.items()], ["storage", storage.items()]], lines=lines)
 
-    def draw_buildings(self):
-        builds = self.grab_cache("buildings")
-        self.draw_station_info([["", list(builds.items())]])
+    def draw_buildings(self, builds, lines=None):
+        self.draw_station_info([["", list(builds.items())]], lines=lines)
 
-    def draw_technologies(self):
-        techs = self.grab_cache("technologies")
+    def draw_technologies(self, techs, lines=None):
         tech_list = list(techs.items())
         self.draw_station_info([["basic", tech_list[0:5]],
                                 ["drives", tech_list[5:8]],
                                 ["advanced", tech_list[8:12]],
-                                ["combat", tech_list[12:]]])
+                                ["combat", tech_list[12:]]], lines=lines)
 
-    def draw_shipyard(self):
-        ships = self.grab_cache("ships")
+    def draw_shipyard(self, ships, lines=None):
         ship_list = list(ships.items())
         self.draw_station_info([["combat", ship_list[0:9]],
-                                ["civil", ship_list[9:]]])
+                                ["civil", ship_list[9:]]], lines=lines)
 
-    def draw_defenses(self):
-        defense = self.grab_cache("defenses")
-        self.draw_station_info([["", list(defense.items())]])
+    def draw_defenses(self, defense, lines=None):
+        self.draw_station_info([["", list(defense.items())]], lines=lines)
 
-    def draw_fleet(self): pass
+    def draw_fleet(self, lines=None): pass
 
-    def draw_middle(self):
+    def draw_middle(self, lines=None):
         """Draw the middle station info."""
+        # ask for everything first, so it's all fetched in one go. and only once, what's in the
+        # cache now could be gone (too old) by the time the draw function would look again
+        found = [self.grab_cache(grab) for grab in station_grabs[self.station]]
+        if any(fetched is None for fetched in found):
+            if lines is None: self.draw_loading("middle", 4)
+            return
+
         func_name = "draw_{}".format(self.station)
         draw_function = getattr(self, func_name) # get the function object
-        draw_function() # call the function
+        draw_function(*found, lines=lines) # call the function
 
     def draw_all(self):
         """Draw all the parts of the screen."""
-        self.screen.clear()
-        self.draw_header()
-        self.draw_middle()
-        self.draw_stations() # left sidebar
-        self.draw_planets() # right sidebar
-        self.draw_bottom() # player rank/point info
-        self.screen.refresh()
+        self.mark(*self.draw_panel)
+        self.update()
+
+    def draw_cursor_line(self, cursor):
+        """Draw again only the line where the cursor is (or was)."""
+        column, line = cursor
+        name = ["left", "middle", "right"][column]
+        [self.draw_stations, self.draw_middle, self.draw_planets][column](lines=[line])
+        self.panels[name].window.noutrefresh()
 
     def move_cursor(self, x_diff, y_diff):
         """Move cursor and normalize it afterwards."""
         # not proud of this code. very ugly and hard to read. but it works so far, and i'm lazy
+        before = list(self.cursor)
         self.cursor[0] += x_diff
         self.cursor[1] += y_diff
         if self.cursor[0] < 0: self.cursor[0] = 0
@@ -209,57 +401,64 @@ class Viewer:
         elif self.cursor[0] == 2: # cursor on the right choosing planet
             if self.cursor[1] >= len(self.planets): self.cursor[1] = len(self.planets) - 1
 
-        # redraw stuff if needed
-        if x_diff == 0: # the cursor only moved up or down
-            if self.cursor[0] == 0: self.draw_stations() # redraw the left sidebar
-            elif self.cursor[0] == 1: self.draw_middle() # redraw the middle
-            elif self.cursor[0] == 2: self.draw_planets() # redraw the right sidebar
-        else: # the cursor also moved to the side
-            self.draw_middle() # draw the middle
-            if self.cursor[0] == 1: # cursor is in the middle
-                if x_diff == 1: self.draw_stations() # it came from the left
-                else: self.draw_planets() # it came from the right
-            elif self.cursor[0] == 2: self.draw_planets() # it went to the right
-            else: self.draw_stations() # it went to the left
-
-        #self.screen.addstr(22, 0, "{}, {}".format(self.cursor[0], self.cursor[1]))
-        self.screen.refresh()
+        # only the line the cursor left and the one it's on now change
+        if self.cursor == before: return
+        self.draw_cursor_line(before)
+        self.draw_cursor_line(self.cursor)
+        curses.doupdate()
 
     def change_station(self):
         self.station = self.stations[self.cursor[1]]
         # redraw stuff
-        self.draw_all()
+        self.mark("header", "middle")
+        self.update()
 
     def change_planet(self):
-        self.planet = self.cache["planets"][self.cursor[1]]
+        self.planet = self.planets[self.cursor[1]]
+        self.generation += 1 # what the worker still has for the old planet can be skipped
 
-        # re init the cache with the planet names
-        cache = {"planets": self.cache["planets"]}
-        # also keep the techs if they were already in cache. these dont depend on the planet
-        if "technologies" in self.cache.keys(): cache["technologies"] = self.cache["technologies"]
-        self.cache = cache # replace the cache
-
-        # redraw everything
-        self.draw_all()
+        # everything but the sidebars
+        self.mark("header", "middle", "bottom")
+        self.update()
 
     def refresh(self):
         """Refetch the info for the current station, planet list and resources and redraw the screen."""
-        self.cache["planets"] = list(self.game.fetch_planet_ids().keys())
-        self.cache["resources"] = self.game.fetch_resources(planet=self.planet)
-        self.draw_all() # redraw the station info
+        self.game.forget(self.planet) # so the game doesn't give us the pages it has cached
+        self.cache.invalidate(planet=self.planet)
+        self.error = None
+        self.ask("planet_ids", self.planet)
+        self.draw_all() # redraw the station info, resources get asked for again
 
     def run(self):
+        # otherwise the first getch would paint the (empty) whole screen window over the panels
+        self.screen.refresh()
         self.draw_all()
+        self.screen.timeout(100) # getch gives -1 after 100ms without keys, to check the worker
 
         self.done = False
         while not self.done:
+            self.poll()
             key = self.screen.getch() # wait for user input
+            if key == -1: # nothing pressed, use the time to fetch what might be needed next
+                self.prefetch()
+                if self.shown_age is not None and self.data_age() != self.shown_age:
+                    self.mark("header")
+                    self.update()
+                continue
+
             if key == ord("q"): # quit
                 self.done = True
+                self.jobs.put(None) # stop the worker
 
             elif key == ord("r"): # refresh everything that is in cache
                 self.refresh()
 
+            elif key == curses.KEY_RESIZE: # the windows have to be made again
+                self.layout()
+                self.screen.erase()
+                self.screen.noutrefresh()
+                self.draw_all()
+
             elif key == curses.KEY_ENTER or key == 10 or key == 13: # change planet or station
                 if self.cursor[0] == 0: self.change_station()
                 elif self.cursor[0] == 2: self.change_planet()
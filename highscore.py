@@ -0,0 +1,216 @@
+"""Reading the whole highscore, and keeping every reading to see who stopped playing.
+
+The points of every player go in numpy arrays of (players, snapshots), one per type of points
+(total, economy, ...), so comparing readings is done for the whole universe at once. Each
+crawl adds a column, players never seen before get a new row (NaN where they weren't seen).
+
+    players = HighscoreStore("players.npz")
+    crawler = HighscoreCrawler(game, workers=8)
+    crawler.crawl({"player": players, "alliance": HighscoreStore("alliances.npz")})
+    players.deltas("economy") # points made between every two readings
+    players.inactive_players(seconds=3 * 24 * 3600) # no points made for 3 days
+"""
+import os
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from ogamy import parsers
+
+categories = {"player": 1, "alliance": 2}
+types = {"total": 0,
+         "economy": 1,
+         "research": 2,
+         "military": 3,
+         "military_lost": 4,
+         "military_built": 5,
+         "military_destroyed": 6,
+         "honour": 7}
+
+page_numbers = re.compile(rb'data-page="(\d+)"')
+
+def parse_number(text):
+    return int(text.strip().replace(".", "") or 0)
+
+def parse_page(content, backend="html.parser"):
+    """The rows of a page of the highscore (id, name, rank and points arrays) and how many
+    pages there are."""
+    rows = parsers.make_soup(content, backend, only="ranks").find_all("tr")
+    found = OrderedDict([("ids", np.array([int(tr["id"].replace("position", "")) for tr in rows], dtype=np.int64)),
+                         ("names", np.zeros(len(rows), dtype="S20")),
+                         ("ranks", np.zeros(len(rows), dtype=np.int32)),
+                         ("points", np.zeros(len(rows)))])
+    for i, tr in enumerate(rows):
+        name = tr.find("span", {"class": "playername"}) or tr.find("td", {"class": "name"})
+        found["names"][i] = name.text.strip().encode()[:20]
+        found["ranks"][i] = int(tr.find("td", {"class": "position"}).text.strip())
+        found["points"][i] = parse_number(tr.find("td", {"class": "score"}).text)
+
+    # the page numbers are only in the pagebar, no need to parse the page again for them
+    pages = [int(n) for n in page_numbers.findall(content)]
+    return found, max(pages, default=1)
+
+class HighscoreStore:
+    """Points of every player (or alliance) at every reading. The arrays have room for more
+    rows and columns than used, so adding a reading doesn't copy everything every time."""
+
+    def __init__(self, path=None, kinds=None):
+        self.path = path
+        self.kinds = list(types) if kinds is None else list(kinds)
+        self.count, self.columns = 0, 0 # used rows and columns
+        if path and os.path.exists(path):
+            saved = np.load(path)
+            self._ids, self._names, self._times = saved["ids"], saved["names"], saved["times"]
+            self._points = OrderedDict((kind, saved[kind]) for kind in self.kinds)
+            self.count, self.columns = len(self._ids), len(self._times)
+        else:
+            self._ids, self._names, self._times = np.zeros(0, dtype=np.int64), np.zeros(0, dtype="S20"), np.zeros(0)
+            self._points = OrderedDict((kind, np.full((0, 0), np.nan)) for kind in self.kinds)
+        self.rows = {int(i): n for n, i in enumerate(self._ids)} # id -> row
+
+    def __len__(self): return self.count
+
+    @property
+    def ids(self): return self._ids[:self.count]
+
+    @property
+    def names(self): return self._names[:self.count]
+
+    @property
+    def times(self): return self._times[:self.columns]
+
+    def points(self, kind="total"):
+        """(players, snapshots) array of points, NaN where a player wasn't seen."""
+        return self._points[kind][:self.count, :self.columns]
+
+    def grow(self, rows, columns):
+        """Make room for at least rows players and columns snapshots, doubling what is short."""
+        old_rows, old_columns = self._points[self.kinds[0]].shape
+        if rows <= old_rows and columns <= old_columns: return
+        rows = old_rows if rows <= old_rows else max(rows, 2 * old_rows)
+        columns = old_columns if columns <= old_columns else max(columns, 2 * old_columns)
+        for kind, old in self._points.items():
+            new = np.full((rows, columns), np.nan)
+            new[:old_rows, :old_columns] = old
+            self._points[kind] = new
+        if rows > len(self._ids):
+            self._ids = np.concatenate([self._ids, np.zeros(rows - len(self._ids), dtype=np.int64)])
+            self._names = np.concatenate([self._names, np.zeros(rows - len(self._names), dtype="S20")])
+        if columns > len(self._times): self._times = np.concatenate([self._times, np.zeros(columns - len(self._times))])
+
+    def snapshot(self, when=None):
+        """Start a new reading. Returns its column."""
+        self.grow(self.count, self.columns + 1)
+        self._times[self.columns] = time.time() if when is None else when
+        self.columns += 1
+        return self.columns - 1
+
+    def put(self, column, kind, ids, names, points):
+        """Rows of a highscore page into a reading."""
+        new = [(i, name) for i, name in zip(ids.tolist(), names) if i not in self.rows]
+        if new:
+            self.grow(self.count + len(new), self.columns)
+            for i, name in new:
+                self.rows[i] = self.count
+                self._ids[self.count] = i
+                self.count += 1
+        rows = np.array([self.rows[i] for i in ids.tolist()], dtype=np.int64)
+        self._names[rows] = names # players can change their name
+        self._points[kind][rows, column] = points
+
+    def save(self):
+        """Write the readings to path, without leaving half a file if it gets interrupted."""
+        temp = self.path + ".tmp.npz"
+        arrays = OrderedDict((kind, self.points(kind)) for kind in self.kinds)
+        np.savez(temp, ids=self.ids, names=self.names, times=self.times, **arrays)
+        os.replace(temp, self.path)
+
+    ########### comparing readings ##############
+
+    def deltas(self, kind="total", span=1):
+        """Points made between each reading and the one span readings before it, (players,
+        snapshots - span). NaN if the player is missing from either."""
+        points = self.points(kind)
+        return points[:, span:] - points[:, :-span]
+
+    def since(self, seconds):
+        """Column of the latest reading at least seconds older than the last one, None if the
+        readings don't go back that far."""
+        old = np.nonzero(self.times <= self.times[-1] - seconds)[0] if self.columns else []
+        return int(old[-1]) if len(old) else None
+
+    def inactive(self, seconds=7 * 24 * 3600, kinds=("total",), tolerance=0):
+        """Which players made no more than tolerance points of any of kinds between any two
+        readings in the last seconds. False for everyone if the readings don't go back that far
+        (or that's less than two readings), and for players not in the first and last of them."""
+        first = self.since(seconds)
+        if first is None or first >= self.columns - 1: return np.zeros(self.count, dtype=bool)
+        found = np.ones(self.count, dtype=bool)
+        for kind in kinds:
+            points = self.points(kind)[:, first:]
+            grew = (np.diff(points, axis=1) > tolerance).any(axis=1) # NaN compares as False
+            grew |= points[:, -1] - points[:, 0] > tolerance # across readings they were missing from
+            found &= ~grew & ~np.isnan(points[:, 0]) & ~np.isnan(points[:, -1])
+        return found
+
+    def inactive_players(self, seconds=7 * 24 * 3600, kinds=("total",), tolerance=0):
+        """inactive, as an OrderedDict of id -> name."""
+        found = self.inactive(seconds, kinds, tolerance)
+        return OrderedDict(zip(self.ids[found].tolist(), (name.decode(errors="ignore") for name in self.names[found])))
+
+    def last_growth(self, kind="total", tolerance=0):
+        """When each player last made more than tolerance points (the time of the reading that
+        showed it), 0 if never seen doing it."""
+        grew = np.diff(self.points(kind), axis=1) > tolerance
+        if not grew.shape[1]: return np.zeros(self.count)
+        last = grew.shape[1] - np.argmax(grew[:, ::-1], axis=1) # column of the reading after the growth
+        return np.where(grew.any(axis=1), self.times[last], 0)
+
+    def history(self, player_id):
+        """Every reading of one player, kind -> points per snapshot."""
+        row = self.rows[player_id]
+        return OrderedDict((kind, self.points(kind)[row]) for kind in self.kinds)
+
+class HighscoreCrawler:
+
+    def __init__(self, game, workers=8):
+        self.game = game # OGamer, its session takes care of the rate limit
+        self.workers = workers
+
+    def fetch_page(self, category, kind, site):
+        """One page of 100 rows of the highscore."""
+        url = self.game.page_url("highscoreContent") + "&category={}&type={}&site={}".format(
+            categories[category], types[kind], site)
+        logins = self.game.logins
+        content = self.game.request("GET", "highscoreContent", url=url)
+        if parsers.logged_out(content):
+            self.game.relogin(logins, "highscoreContent")
+            content = self.game.request("GET", "highscoreContent", url=url)
+        return parse_page(content, self.game.parser)
+
+    def crawl(self, stores, when=None):
+        """Read every page of every kind of points of the categories in stores (category ->
+        HighscoreStore) into a new reading of each store. The first pages tell how many there
+        are, then all the others are read at the same time. Returns how many pages were read."""
+        columns = {category: store.snapshot(when) for category, store in stores.items()}
+        read = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            running = {pool.submit(self.fetch_page, category, kind, 1): (category, kind, 1)
+                       for category, store in stores.items() for kind in store.kinds}
+            while running:
+                future = next(as_completed(running))
+                category, kind, site = running.pop(future)
+                rows, pages = future.result()
+                stores[category].put(columns[category], kind, rows["ids"], rows["names"], rows["points"])
+                read += 1
+                if site == 1: # now we know how many there are
+                    for other in range(2, pages + 1):
+                        running[pool.submit(self.fetch_page, category, kind, other)] = (category, kind, other)
+
+        for store in stores.values():
+            if store.path: store.save()
+        return read
@@ -0,0 +1,150 @@
+"""Seeing where the time goes while OGamer works: the network, parsing, or logging in again.
+
+OGamer calls its hooks around every request, parse and extraction. The default Hooks do nothing,
+a Recorder keeps latency histograms per page and counts logins and tokens:
+
+    recorder = Recorder()
+    game = OGamer("Capella", "user", "password", hooks=recorder)
+    game.fetch_empire()
+    recorder.write_prometheus("ogamy.prom") # for node_exporter's textfile collector
+    recorder.write_trace("trace.json") # open in chrome://tracing or ui.perfetto.dev
+"""
+import os
+import json
+import time
+import threading
+from collections import deque, OrderedDict
+
+# upper bounds (in seconds) of the histogram buckets, the last one catches everything
+buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+class Hooks:
+    """Does nothing. Subclass it and override what you need.
+    start is a time.perf_counter() value and seconds how long the stage took."""
+
+    def on_request(self, page, planet, method):
+        """Just before a request is sent."""
+
+    def on_response(self, page, planet, method, start, seconds, size):
+        """The answer of a request arrived, size is in bytes."""
+
+    def on_parse(self, page, only, start, seconds):
+        """A page was turned into soup (only is the part of it, see parsers.strainers)."""
+
+    def on_extract(self, what, start, seconds):
+        """Something (resources, levels, ...) was read out of a soup."""
+
+    def on_relogin(self, page):
+        """We got logged out and logged in again. page is where we noticed."""
+
+    def on_token(self, page):
+        """A page was downloaded only to get a token."""
+
+class Histogram:
+    """Counts of values per bucket, like a prometheus histogram."""
+    __slots__ = ["counts", "total", "count"]
+
+    def __init__(self):
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value):
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        """Counts of values <= each bucket bound, how prometheus wants them."""
+        found, total = [], 0
+        for count in self.counts:
+            total += count
+            found.append(total)
+        return found
+
+class Recorder(Hooks):
+    """Keeps latency histograms per stage and page, counters, and the last max_events events."""
+
+    def __init__(self, max_events=10000):
+        self.lock = threading.Lock() # fetch_empire calls the hooks from many threads
+        self.histograms = OrderedDict() # (stage, page) -> Histogram
+        self.counters = OrderedDict() # (name, page) -> count
+        self.events = deque(maxlen=max_events) # (name, stage, start, seconds, thread)
+        self.started = time.perf_counter()
+
+    def observe(self, stage, page, start, seconds):
+        with self.lock:
+            histogram = self.histograms.get((stage, page))
+            if histogram is None: histogram = self.histograms[(stage, page)] = Histogram()
+            histogram.add(seconds)
+            self.events.append((page, stage, start, seconds, threading.get_ident()))
+
+    def count(self, name, page, amount=1):
+        with self.lock:
+            self.counters[(name, page)] = self.counters.get((name, page), 0) + amount
+
+    def on_response(self, page, planet, method, start, seconds, size):
+        self.observe("request", page, start, seconds)
+        self.count("requests", page)
+        self.count("bytes", page, size)
+
+    def on_parse(self, page, only, start, seconds):
+        self.observe("parse", page, start, seconds)
+
+    def on_extract(self, what, start, seconds):
+        self.observe("extract", what, start, seconds)
+
+    def on_relogin(self, page):
+        self.count("relogins", page)
+
+    def on_token(self, page):
+        self.count("tokens", page)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.events.clear()
+
+    ########### exporting ##############
+
+    def prometheus(self):
+        """Everything in the prometheus text format."""
+        lines = ["# TYPE ogamy_seconds histogram"]
+        with self.lock:
+            for (stage, page), histogram in self.histograms.items():
+                labels = 'stage="{}",page="{}"'.format(stage, page)
+                for bound, count in zip(buckets, histogram.cumulative()):
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append('ogamy_seconds_bucket{{{},le="{}"}} {}'.format(labels, le, count))
+                lines.append("ogamy_seconds_sum{{{}}} {}".format(labels, histogram.total))
+                lines.append("ogamy_seconds_count{{{}}} {}".format(labels, histogram.count))
+
+            names = []
+            for name, _ in self.counters:
+                if name not in names: names.append(name)
+            for name in names:
+                lines.append("# TYPE ogamy_{}_total counter".format(name))
+                for (counter, page), value in self.counters.items():
+                    if counter == name: lines.append('ogamy_{}_total{{page="{}"}} {}'.format(name, page, value))
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # written next to it and moved, so a collector never reads half a file
+        with open(path + ".tmp", "w") as f: f.write(self.prometheus())
+        os.replace(path + ".tmp", path)
+
+    def trace(self):
+        """The events in the chrome trace event format (times in microseconds)."""
+        with self.lock:
+            events = [{"name": str(page), "cat": stage, "ph": "X", "pid": 1, "tid": thread,
+                       "ts": (start - self.started) * 1e6, "dur": seconds * 1e6}
+                      for page, stage, start, seconds, thread in self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path):
+        with open(path, "w") as f: json.dump(self.trace(), f)
@@ -0,0 +1,231 @@
+"""Running many accounts from one machine.
+
+Accounts are split between worker processes, and each process keeps its accounts logged in and
+works on a few of them at the same time with threads. Requests to the same universe share one
+rate limit, across every process. Jobs are method names of OGamer (or functions taking the
+OGamer as first argument) and results come back as soon as each account is done:
+
+    with Orchestrator(load_accounts("accounts.json")) as orchestrator:
+        for account, empire in orchestrator.submit("fetch_empire"):
+            print(account, empire["points"])
+        orchestrator.run("build_mine", "metal", accounts=["en/Capella/bob"])
+
+The accounts file is a json list of {"uni", "username", "password"} objects, with an optional
+"country" (United Kingdom if missing) and "name" (country/uni/username if missing).
+"""
+import os
+import json
+import time
+import zlib
+import queue
+import pickle
+import itertools
+import threading
+import traceback
+import multiprocessing
+from collections import deque, OrderedDict
+
+from ogamy.api import OGamer
+from ogamy.persist import SessionStore
+from ogamy.transport import TokenBucket, Transport
+
+class JobError(Exception):
+    """A job failed on one account. Has the account and the traceback from the worker."""
+
+    def __init__(self, account, details):
+        super().__init__(account, details) # both in args, so it can be pickled back from the worker
+        self.account = account
+        self.details = details
+
+    def __str__(self): return "{}: {}".format(self.account, self.details)
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket that works across processes, the tokens live in shared memory.
+    Has to be made before the processes using it start."""
+
+    def __init__(self, rate=2.0, burst=5, context=multiprocessing):
+        self.rate = rate
+        self.burst = burst
+        self.state = context.Array("d", [burst, time.monotonic()]) # tokens, last refill
+
+    def acquire(self, tokens=1):
+        """Take tokens from the bucket, waiting until there are enough."""
+        with self.state.get_lock():
+            now = time.monotonic() # the same clock for every process
+            available = min(self.burst, self.state[0] + (now - self.state[1]) * self.rate)
+            self.state[0] = available - tokens # can go negative, see TokenBucket
+            self.state[1] = now
+            wait = -self.state[0] / self.rate if self.state[0] < 0 else 0
+
+        if wait > 0: time.sleep(wait)
+
+def account_name(config):
+    return config.get("name") or "{}/{}/{}".format(config.get("country", "United Kingdom"),
+                                                   config["uni"], config["username"])
+
+def server_name(config):
+    """Accounts in the same universe share a rate limit."""
+    return "{}/{}".format(config.get("country", "United Kingdom"), config["uni"])
+
+def load_accounts(path):
+    """The account configs from a json file."""
+    with open(os.path.expanduser(path)) as f: return json.load(f, object_pairs_hook=OrderedDict)
+
+########### inside the worker processes ##############
+
+class Worker:
+    """The accounts of one process. Jobs wait in a queue per account and the threads take them
+    in turns, so an account with a lot of work doesn't hold up the others. An account only
+    runs one job at a time."""
+
+    def __init__(self, accounts, limiters, threads=8, store_path=None):
+        self.configs = OrderedDict((account_name(config), config) for config in accounts)
+        self.limiters = limiters
+        self.threads = threads
+        self.store = None if store_path is None else SessionStore(store_path)
+        self.games = {} # account -> OGamer, made when the account gets its first job
+
+        self.waiting = OrderedDict((name, deque()) for name in self.configs) # in turn order
+        self.busy = set()
+        self.stopping = False
+        self.changed = threading.Condition()
+
+    def game(self, name):
+        if name not in self.games:
+            config = self.configs[name]
+            session = Transport(limiter=self.limiters[server_name(config)])
+            self.games[name] = OGamer(config["uni"], config["username"], config["password"],
+                                      config.get("country", "United Kingdom"), session=session,
+                                      store=self.store)
+        return self.games[name]
+
+    def next_job(self):
+        """The first waiting job of the next account in turn that isn't busy. None to stop."""
+        with self.changed:
+            while True:
+                for name, jobs in self.waiting.items():
+                    if jobs and name not in self.busy:
+                        self.waiting.move_to_end(name) # its turn is over
+                        self.busy.add(name)
+                        return jobs.popleft()
+                if self.stopping and not any(self.waiting.values()): return None
+                self.changed.wait()
+
+    def run_job(self, job_id, name, job, args, kwargs):
+        try:
+            game = self.game(name)
+            result = job(game, *args, **kwargs) if callable(job) else getattr(game, job)(*args, **kwargs)
+            pickle.dumps(result) # a result that can't be sent back would get lost in the queue
+            return (job_id, name, result)
+        except (Exception, SystemExit): # OGamer.crash exits
+            return (job_id, name, JobError(name, traceback.format_exc()))
+
+    def loop(self, results):
+        while True:
+            job = self.next_job()
+            if job is None: return
+            results.put(self.run_job(*job))
+            with self.changed:
+                self.busy.discard(job[1])
+                self.changed.notify_all()
+
+    def run(self, inbox, results):
+        threads = [threading.Thread(target=self.loop, args=(results,), daemon=True)
+                   for _ in range(self.threads)]
+        for thread in threads: thread.start()
+
+        while True:
+            job = inbox.get()
+            with self.changed:
+                if job is None: self.stopping = True
+                else: self.waiting[job[1]].append(job)
+                self.changed.notify_all()
+            if job is None: break
+
+        for thread in threads: thread.join()
+
+def work(accounts, limiters, threads, store_path, inbox, results, initializer, initargs):
+    """Main function of the worker processes."""
+    if initializer is not None: initializer(*initargs)
+    Worker(accounts, limiters, threads, store_path).run(inbox, results)
+
+########### in the main process ##############
+
+class Orchestrator:
+
+    def __init__(self, accounts, processes=None, threads=8, rate=2.0, burst=5, store_dir=None,
+                 initializer=None, initargs=(), context=None):
+        """accounts is a list of configs (see load_accounts). Each of the processes works on
+        threads accounts at the same time. rate and burst are the limit per universe. With
+        store_dir every process keeps its logins there (see persist.py), so starting again
+        doesn't log in every account. initializer(*initargs) is called in every process."""
+        context = context or multiprocessing.get_context()
+        self.configs = OrderedDict((account_name(config), config) for config in accounts)
+        processes = max(1, min(processes or os.cpu_count() or 1, len(self.configs)))
+
+        limiters = {server: SharedTokenBucket(rate, burst, context)
+                    for server in set(map(server_name, self.configs.values()))}
+
+        # an account always goes to the same process, so its saved login is found again
+        self.owner = {name: zlib.crc32(name.encode()) % processes for name in self.configs}
+        groups = [[config for name, config in self.configs.items() if self.owner[name] == i]
+                  for i in range(processes)]
+
+        self.results = context.Queue()
+        self.inboxes, self.processes = [], []
+        for i, group in enumerate(groups):
+            inbox = context.Queue()
+            store_path = None if store_dir is None else os.path.join(store_dir, "worker-{}.json".format(i))
+            process = context.Process(target=work, daemon=True,
+                                      args=(group, limiters, threads, store_path, inbox, self.results,
+                                            initializer, initargs))
+            process.start()
+            self.inboxes.append(inbox)
+            self.processes.append(process)
+
+        # results of every job arrive in one queue, a thread hands them to whoever is waiting
+        self.jobs = itertools.count()
+        self.streams = {} # job id -> queue.Queue of (account, result)
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def collect(self):
+        while True:
+            found = self.results.get()
+            if found is None: return
+            job_id, name, result = found
+            stream = self.streams.get(job_id)
+            if stream is not None: stream.put((name, result)) # gone if nobody wants the rest
+
+    def submit(self, job, *args, accounts=None, **kwargs):
+        """Run job on accounts (all of them if None). job is the name of an OGamer method or a
+        function taking the OGamer first (it has to be picklable, so defined in a module).
+        Yields (account, result) as each account finishes, result is a JobError if it failed."""
+        names = list(self.configs) if accounts is None else list(accounts)
+        for name in names:
+            if name not in self.configs: raise KeyError("Unknown account {}".format(name))
+
+        job_id = next(self.jobs)
+        stream = self.streams[job_id] = queue.Queue()
+        for name in names: self.inboxes[self.owner[name]].put((job_id, name, job, args, kwargs))
+        return self.stream(job_id, stream, len(names))
+
+    def stream(self, job_id, stream, count):
+        try:
+            for _ in range(count): yield stream.get()
+        finally: del self.streams[job_id]
+
+    def run(self, job, *args, accounts=None, **kwargs):
+        """Like submit, but waits for every account. Returns an OrderedDict of account -> result."""
+        return OrderedDict(self.submit(job, *args, accounts=accounts, **kwargs))
+
+    def close(self):
+        """Finish the jobs already given, then stop the processes."""
+        for inbox in self.inboxes: inbox.put(None)
+        for process in self.processes: process.join()
+        self.results.put(None)
+        self.collector.join()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *args): self.close()
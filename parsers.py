@@ -0,0 +1,149 @@
+import re
+import html
+from collections import OrderedDict
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# parser backends that can be given to OGamer. lxml is a lot faster but it's an extra dependency
+backends = ["html.parser", "lxml"]
+
+# the part of the page each extractor needs. only these tags (and what's inside them) get parsed
+strainers = {
+    "resources": SoupStrainer("span", id=re.compile("^resources_")),
+    "planets": SoupStrainer("div", id=re.compile("^planet-")),
+    "levels": SoupStrainer("a", id=re.compile("details")),
+    "points": SoupStrainer("tr", {"class": "myrank"}),
+    "form": SoupStrainer("form"),
+    "inputs": SoupStrainer("input"),
+    "servers": SoupStrainer("select", id="serverLogin"),
+    "countries": SoupStrainer("ul", id="mmoList1"),
+    "ranks": SoupStrainer("tr", id=re.compile("^position")),
+}
+
+# faster than parsing the page just to check if we're still logged in
+player_meta = re.compile(rb'<meta[^>]*name="ogame-player-name"[^>]*>')
+token_error = re.compile(rb'<div id="fadeBox" class="[^"]*failed')
+planet_meta = re.compile(rb'<meta[^>]*name="ogame-planet-id"[^>]*>')
+meta_content = re.compile(rb'content="([^"]*)"')
+
+def make_soup(content, backend="html.parser", only=None):
+    """Parse a page. If only is given, just the part of the page in strainers[only] is parsed."""
+    strainer = None if only is None else strainers[only]
+    return BeautifulSoup(content, backend, parse_only=strainer)
+
+def player_name(content):
+    """Name of the logged in player, straight from the raw page. None if we're not logged in."""
+    meta = player_meta.search(content)
+    if meta is None: return None
+    found = meta_content.search(meta.group(0))
+    if found is None: return None
+    return html.unescape(found.group(1).decode())
+
+def planet_id(content):
+    """Id of the planet a raw page is about (the selected one if it was asked for without a
+    planet). None if the page doesn't say, like the ajax ones."""
+    meta = planet_meta.search(content)
+    found = None if meta is None else meta_content.search(meta.group(0))
+    if found is None or not found.group(1).isdigit(): return None
+    return int(found.group(1))
+
+def token_rejected(content):
+    """If the answer to a form says the token was no good (so nothing happened)."""
+    return token_error.search(content) is not None
+
+def logged_out(content):
+    """The ajax pages (messages, highscoreContent) don't have the player in them, but when the
+    session is gone the lobby comes back instead."""
+    return b'id="loginForm"' in content
+
+########### extractors ##############
+# these take the soup of a page and pull the useful stuff out of it
+
+def resources(soup):
+    """Build a dictonary of resources."""
+    resources = [] # list of key/value pairs for ordered dict
+    for res in ["metal", "crystal", "deuterium", "energy"]:
+        found = soup.find("span", {"id": "resources_{}".format(res)})
+        value = int(found.string.strip().replace(".", ""))
+        resources.append((res, value))
+
+    return OrderedDict(resources)
+
+def planet_ids(soup):
+    """Builds a dict with the names of the planets and their ids."""
+    planet_list = [] # for creating the planet dict afterwards
+    name_tags = soup.find_all("span", {"class": "planet-name"})
+    for name in name_tags:
+        id_tag = name.parent.parent
+        planet_id = int(str(id_tag["id"]).replace("planet-", ""))
+
+        planet_list.append((name.string, planet_id))
+
+    return OrderedDict(planet_list)
+
+def planet_info(soup, planet_id):
+    """Tempurature, position and fields of the planet with this id."""
+    planet = soup.find("div", {"id": "planet-{}".format(planet_id)})
+    info = planet.find("a")["title"]
+    info = [x.split(">")[-1] for x in info.split("<")] # separate text from the tags
+    info = [x for x in info if x != ""] # remove empty strings
+
+    return OrderedDict(zip(["position", "diameter", "slots", "temperature"],
+               [info[0].split()[-1], info[1].split()[0], info[1].split()[-1], info[2]]))
+
+def levels(soup, code_dict):
+    """Level of everything in code_dict that shows up on the page."""
+    rev_codes = {v: k for k, v in code_dict.items()} # reverse the dict
+    dict_items = [] # for creating OrderedDict at the end
+
+    found = soup.find_all("a") # get all the a tags of the page
+    for thing in found:
+        try: code = int(thing["ref"])
+        except KeyError: continue # we only care about the link tags with a level
+        if code not in rev_codes: continue # discard other levels that might be on the page
+        try: # need this to not catch some stuff i don't fully understand
+            if "details" not in thing["id"]: continue
+        except KeyError: continue
+
+        level_text = thing.find("span", {"class": "level"}).text.strip()
+        level = int(level_text.split()[-1])
+        dict_items.append((rev_codes[code], level))
+
+    return OrderedDict(dict_items)
+
+def points(soup):
+    """Point and general position of the player in the rankings."""
+    # find correct line in rankings table
+    line = soup.find("tr", {"class": "myrank"})
+
+    rank = int(line.find("td", {"class": "position"}).contents[0].strip())
+    points = int(line.find("td", {"class": "score"}).contents[0].strip().replace(".", ""))
+
+    return OrderedDict([("ranking", rank), ("points", points)])
+
+def token(soup, in_post=True):
+    """The token needed to send a form."""
+    if in_post: soup = soup.find("form", {"method": "POST"})
+    return soup.find("input", {"name": "token"})["value"]
+
+def hidden(soup):
+    """All the hidden fields as a dictionary."""
+    hidden = soup.find_all("input", {"type": "hidden"})
+    return {field["name"]: field.get("value", "") for field in hidden if field.has_attr("name")}
+
+def servers(soup):
+    """Map of universe names to their server."""
+    found = soup.find("select", {"id": "serverLogin"})
+    return {sv.string.strip(): sv["value"] for sv in found.find_all("option")}
+
+def countries(soup):
+    """Map of country names to their code."""
+    code_list = soup.find("ul", {"id": "mmoList1"})
+    countries = {}
+    for tag in code_list.find_all("li"):
+        link = tag.find("a")["href"]
+        name = tag.string.strip() # name of the country
+        code = link.split(".")[0].replace("//", "")
+        countries[name] = code # save to the dict
+
+    return countries
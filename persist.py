@@ -0,0 +1,52 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# how long (in seconds) each kind of saved thing is trusted
+default_ttl = {"countries": 7 * 24 * 3600, # the country and universe lists hardly ever change
+               "servers": 24 * 3600,
+               "cookies": 12 * 3600, # if the server drops the session earlier we just log in again
+               "planet_ids": 24 * 3600}
+
+class SessionStore:
+    """Json file with what OGamer needs to start without talking to the server:
+    the country codes, the universe servers, the login cookies and the planet ids."""
+
+    def __init__(self, path="~/.ogamy.json", ttl=None):
+        self.path = os.path.expanduser(path)
+        self.ttl = dict(default_ttl)
+        if ttl is not None: self.ttl.update(ttl)
+        self.lock = threading.Lock()
+        self.data = self.read()
+
+    def read(self):
+        try:
+            with open(self.path) as f: return json.load(f, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError): return {} # missing or broken file, start over
+
+    def write(self):
+        # write somewhere else first and then swap, so a crash never leaves half a file.
+        # there are cookies in here so nobody else gets to read it
+        tmp = self.path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f: json.dump(self.data, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def get(self, section, key):
+        """The saved value or None if there is none or it expired."""
+        with self.lock:
+            entry = self.data.get(section, {}).get(key)
+        if entry is None: return None
+        if time.time() - entry["time"] > self.ttl.get(section, 0): return None
+        return entry["value"]
+
+    def put(self, section, key, value):
+        with self.lock:
+            self.data.setdefault(section, OrderedDict())[key] = {"time": time.time(), "value": value}
+            self.write()
+
+    def forget(self, section, key):
+        with self.lock:
+            if self.data.get(section, {}).pop(key, None) is not None: self.write()
@@ -0,0 +1,207 @@
+"""Plan which mines, storages and factories to upgrade next, and in what order.
+
+Takes a planet from OGamer.fetch_empire() (or the same keys filled with the fetch functions)
+and searches build orders with a beam search: at each step every plan is extended with every
+possible upgrade, and only the best ones (by what the planet will have at the end of the
+horizon) are kept. Upgrades are built one after the other, waiting for resources if needed.
+
+It's a heuristic, not branch and bound: a plan that only pays off after a few steps that look
+worse can be dropped before it gets there, so what comes back is a good plan and not always the
+best one. A wider beam keeps more plans, and takes longer.
+
+    empire = game.fetch_empire()
+    plan(empire["planets"]["Homeworld"], empire["technologies"], horizon=7 * 24 * 3600)
+    plan_empire(empire) # every planet, in parallel
+"""
+import heapq
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from ogamy import tools
+
+# what can be upgraded, and where its level is in the planet snapshot
+actions = ["metal", "crystal", "deuterium", "solar", "metal_sto", "crystal_sto", "deuterium_sto",
+           "robot", "nanite"]
+mines = ["metal", "crystal", "deuterium"]
+max_level = 60
+
+class Node:
+    """One plan: the levels after it's done, when it's done and what's left in storage then."""
+    __slots__ = ["levels", "time", "stock", "parent", "action", "start", "score"]
+
+    def __init__(self, levels, time, stock, parent=None, action=None, start=0):
+        self.levels = levels
+        self.time = time
+        self.stock = stock
+        self.parent = parent
+        self.action = action # index in actions of the last upgrade
+        self.start = start # when the last upgrade was started
+        self.score = 0
+
+    def steps(self):
+        """The upgrades of the plan, first one first."""
+        node, steps = self, []
+        while node.parent is not None:
+            steps.append(node)
+            node = node.parent
+        return steps[::-1]
+
+class Planner:
+
+    def __init__(self, planet, technologies=None, horizon=7 * 24 * 3600, uni_speed=1, weights=(1, 1, 1)):
+        technologies = technologies or {}
+        mines_lvl, storage_lvl = planet["mines"], planet["storage"]
+        buildings = planet.get("buildings", {})
+
+        self.horizon = horizon # seconds
+        self.weights = weights # how much metal, crystal and deuterium are worth to us
+        self.uni_speed = uni_speed
+        max_temp = tools.temperature(planet["planet_info"]["temperature"])[1] if "planet_info" in planet else 0
+        plasma = technologies.get("plasma", 0)
+        energy_tech = technologies.get("energy", 0)
+        self.computer = technologies.get("computer", 0) # nanite factory needs it at 10
+
+        # things that don't change during the plan
+        satellites = planet.get("ships", {}).get("satellite", 0)
+        fusion = mines_lvl.get("fusion", 0)
+        self.fixed_energy = float(tools.fusion_energy(fusion, energy_tech)
+                                  + satellites * tools.satellite_energy(max_temp))
+        self.fusion_burn = float(tools.fusion_deuterium(fusion)) * uni_speed / 3600
+
+        # everything per level in plain lists, they're a lot faster to index than arrays one by one
+        levels = range(max_level + 1)
+        self.made = [[float(p) * uni_speed / 3600 for p in tools.production(mine, levels, max_temp, 1, plasma)]
+                     for mine in mines] # per second
+        self.base = [tools.base_production[mine] * uni_speed / 3600 for mine in mines]
+        self.use = [[float(x) for x in tools.energy_use(levels, 0, 0) - tools.energy_use(0, 0, 0)],
+                    [float(x) for x in tools.energy_use(0, levels, 0) - tools.energy_use(0, 0, 0)],
+                    [float(x) for x in tools.energy_use(0, 0, levels) - tools.energy_use(0, 0, 0)]]
+        self.solar = [float(x) for x in tools.solar_energy(levels)]
+        self.capacity = [float(x) for x in tools.storage_capacity(levels)]
+        self.cost = [[tuple(float(x) for x in row[:3]) for row in tools.table(action, max_level)]
+                     for action in actions]
+
+        start = tuple([mines_lvl.get("metal", 0), mines_lvl.get("crystal", 0),
+                       mines_lvl.get("deuterium", 0), mines_lvl.get("solar", 0),
+                       storage_lvl.get("metal", 0), storage_lvl.get("crystal", 0),
+                       storage_lvl.get("deuterium", 0),
+                       buildings.get("robot", 0), buildings.get("nanite", 0)])
+        res = planet["resources"]
+        self.root = Node(start, 0.0, (float(res["metal"]), float(res["crystal"]), float(res["deuterium"])))
+        self.root.score = self.value(self.root)
+
+    def rates(self, levels):
+        """Resources made per second with these levels, after the energy shortage (if any)."""
+        needed = self.use[0][levels[0]] + self.use[1][levels[1]] + self.use[2][levels[2]]
+        produced = self.solar[levels[3]] + self.fixed_energy
+        factor = 1.0 if needed <= produced else produced / needed
+        return (self.base[0] + self.made[0][levels[0]] * factor,
+                self.base[1] + self.made[1][levels[1]] * factor,
+                self.base[2] + self.made[2][levels[2]] * factor - self.fusion_burn)
+
+    def caps(self, levels):
+        return (self.capacity[levels[4]], self.capacity[levels[5]], self.capacity[levels[6]])
+
+    def advance(self, stock, rates, caps, seconds):
+        """What's in storage after some seconds. Mines stop when the storage is full, and the
+        fusion reactor can burn the deuterium down to nothing (but not below)."""
+        return tuple(max(s + r * seconds, 0.0) if r < 0 else s if s >= c else min(c, s + r * seconds)
+                     for s, r, c in zip(stock, rates, caps))
+
+    def value(self, node):
+        """What the planet will have at the end of the horizon if nothing else gets built."""
+        left = self.horizon - node.time
+        stock = self.advance(node.stock, self.rates(node.levels), self.caps(node.levels), left)
+        return sum(w * s for w, s in zip(self.weights, stock))
+
+    def build_time(self, cost, levels):
+        time = (cost[0] + cost[1]) / (2500 * (1 + levels[7]) * 2 ** levels[8] * self.uni_speed)
+        return max(time * 2 / 7 * 3600, 1)
+
+    def expand(self, node):
+        """Every plan that is node plus one more upgrade finished before the horizon."""
+        levels = node.levels
+        rates = self.rates(levels)
+        caps = self.caps(levels)
+        children = []
+
+        for i, action in enumerate(actions):
+            if levels[i] >= max_level: continue
+            if action == "nanite" and (levels[7] < 10 or self.computer < 10): continue # robotics and computer 10
+            cost = self.cost[i][levels[i] + 1]
+
+            # how long until there is enough of everything
+            wait = 0.0
+            for need, have, rate, cap in zip(cost, node.stock, rates, caps):
+                if need <= have: continue
+                if need > cap or rate <= 0: break # it will never fit / never be made
+                wait = max(wait, (need - have) / rate)
+            else:
+                start = node.time + wait
+                finish = start + self.build_time(cost, levels)
+                if finish > self.horizon: continue
+
+                stock = self.advance(node.stock, rates, caps, wait)
+                stock = tuple(s - c for s, c in zip(stock, cost))
+                stock = self.advance(stock, rates, caps, finish - start) # old levels while building
+
+                new_levels = levels[:i] + (levels[i] + 1,) + levels[i + 1:]
+                child = Node(new_levels, finish, stock, node, i, start)
+                child.score = self.value(child)
+                children.append(child)
+
+        return children
+
+    def search(self, steps=100, beam=24):
+        """The best plan found with at most steps upgrades, keeping only the beam best plans of
+        each step (see the top of the file)."""
+        frontier = [self.root]
+        best = self.root
+        for _ in range(steps):
+            # plans with the same levels in the end only differ in the order, keep the best one
+            children = {}
+            for node in frontier:
+                for child in self.expand(node):
+                    seen = children.get(child.levels)
+                    if seen is None or child.score > seen.score: children[child.levels] = child
+            if not children: break
+
+            frontier = heapq.nlargest(beam, children.values(), key=lambda node: node.score)
+            if frontier[0].score > best.score: best = frontier[0]
+
+        return best
+
+def plan(planet, technologies=None, horizon=7 * 24 * 3600, steps=100, beam=24, uni_speed=1, weights=(1, 1, 1)):
+    """Best build order for one planet (as good as the beam search finds, see search). Returns
+    the upgrades in order (with when they start and finish, in seconds from now) and the
+    resources expected at the end of the horizon."""
+    planner = Planner(planet, technologies, horizon, uni_speed, weights)
+    best = planner.search(steps, beam)
+
+    upgrades = []
+    for node in best.steps():
+        action = actions[node.action]
+        upgrades.append(OrderedDict([("build", action), ("level", node.levels[node.action]),
+                                     ("start", node.start), ("finish", node.time)]))
+
+    final = planner.advance(best.stock, planner.rates(best.levels), planner.caps(best.levels),
+                            horizon - best.time)
+    return OrderedDict([("upgrades", upgrades),
+                        ("resources", OrderedDict(zip(mines, final))),
+                        ("value", best.score),
+                        ("value_without_building", planner.root.score)])
+
+def _plan(args):
+    """plan with one argument, for the process pool."""
+    planet, kwargs = args
+    return plan(planet, **kwargs)
+
+def plan_empire(empire, workers=None, **kwargs):
+    """Plan every planet of OGamer.fetch_empire() at the same time, one process per planet
+    (up to workers). Same keyword arguments as plan."""
+    kwargs.setdefault("technologies", empire.get("technologies"))
+    names = list(empire["planets"].keys())
+    jobs = [(empire["planets"][name], kwargs) for name in names]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return OrderedDict(zip(names, pool.map(_plan, jobs)))
@@ -0,0 +1,97 @@
+"""Keep what the fetch functions return in a sqlite database, to see how things change over time.
+
+Only values that changed since the last snapshot are written, so saving the same account every
+few minutes costs almost nothing.
+
+    store = SnapshotStore("ogame.db")
+    store.record_empire("capella/bob", game.fetch_empire())
+    store.history("metal", page="mines", planet="Homeworld") # [(time, account, planet, page, level), ...]
+"""
+import time
+import sqlite3
+from collections import OrderedDict
+
+schema = """
+CREATE TABLE IF NOT EXISTS current (
+    account TEXT, planet TEXT, page TEXT, key TEXT, value, time REAL,
+    PRIMARY KEY (account, planet, page, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history (
+    account TEXT, planet TEXT, page TEXT, key TEXT, value, time REAL
+);
+CREATE INDEX IF NOT EXISTS history_key ON history (key, page, account, planet, time);
+"""
+
+# what fetch_empire gives for each planet, and for the whole account
+planet_pages = ["resources", "planet_info", "mines", "storage", "buildings", "ships", "defenses"]
+account_pages = ["technologies", "points"]
+
+class SnapshotStore:
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        # readers (dashboards) don't block the writer, and we don't wait for the disk on every commit
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(schema)
+
+        # latest value of everything, to know what changed without asking the database
+        self.current = {}
+        for account, planet, page, key, value in self.db.execute(
+                "SELECT account, planet, page, key, value FROM current"):
+            self.current.setdefault((account, planet, page), {})[key] = value
+
+    def close(self):
+        self.db.close()
+
+    def changes(self, account, planet, page, values, when):
+        """Rows of values that are different from what we have."""
+        known = self.current.get((account, planet, page), {})
+        return [(account, planet, page, key, value, when) for key, value in values.items()
+                if key not in known or known[key] != value]
+
+    def save_many(self, snapshots, when=None):
+        """Save a list of (account, planet, page, values) in one transaction. planet is "" for
+        things that are the same on every planet. Returns how many values changed."""
+        when = time.time() if when is None else when
+        rows = []
+        for account, planet, page, values in snapshots:
+            rows += self.changes(account, planet, page, values, when)
+        if not rows: return 0
+
+        with self.db: # one transaction for everything
+            self.db.executemany("INSERT INTO history VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.executemany("INSERT OR REPLACE INTO current VALUES (?, ?, ?, ?, ?, ?)", rows)
+        # only after it's safely in the database
+        for account, planet, page, key, value, _ in rows:
+            self.current.setdefault((account, planet, page), {})[key] = value
+        return len(rows)
+
+    def save(self, account, planet, page, values, when=None):
+        """Save what one fetch function returned."""
+        return self.save_many([(account, planet, page, values)], when)
+
+    def record_empire(self, account, empire, when=None):
+        """Save everything from OGamer.fetch_empire()."""
+        snapshots = [(account, "", page, empire[page]) for page in account_pages]
+        for planet, pages in empire["planets"].items():
+            snapshots += [(account, planet, page, pages[page]) for page in planet_pages]
+        return self.save_many(snapshots, when)
+
+    def latest(self, account, planet, page):
+        """The newest values of a page."""
+        return OrderedDict(self.current.get((account, planet, page), {}))
+
+    def history(self, key, page=None, account=None, planet=None, since=None):
+        """Every time key changed, as a list of (time, account, planet, page, value), oldest first."""
+        query = "SELECT time, account, planet, page, value FROM history WHERE key = ?"
+        args = [key]
+        for column, value in [("page", page), ("account", account), ("planet", planet)]:
+            if value is None: continue
+            query += " AND {} = ?".format(column)
+            args.append(value)
+        if since is not None:
+            query += " AND time >= ?"
+            args.append(since)
+
+        return self.db.execute(query + " ORDER BY time", args).fetchall()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""A local stand-in for the OGame servers that serves the saved pages in fixtures/.
+
+Good for trying things out (and timing them) without touching a real account.
+Point a client at it with point(), for example:
+
+    server = StandIn()
+    url = server.run_in_thread()
+    point(OGamer, url)
+    game = OGamer("Capella", server.username, server.password)
+"""
+import os
+import re
+import sys
+import uuid
+import asyncio
+import threading
+
+from aiohttp import web
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+token_field = re.compile(rb'(name="token" value=")[^"]*(")')
+player_field = re.compile(rb'(<meta name="ogame-player-name" content=")[^"]*(")')
+body_tag = re.compile(rb'<body[^>]*>')
+# what the server puts at the top of the page when a form had a bad token
+token_error = b'<div id="fadeBox" class="fadeBox failed"><span>Invalid token</span></div>'
+planet_field = re.compile(rb'(<meta name="ogame-planet-id" content=")[^"]*(")')
+
+def point(client, url):
+    """Make a client class (or object) talk to the stand-in running at url."""
+    client.lobby_url = url + "/lobby/{}"
+    client.game_url = url + "/{}/game/index.php"
+
+class StandIn:
+
+    def __init__(self, directory=fixtures, username="Commander Bob", password="hunter2", delay=0.0):
+        self.directory = directory
+        self.username = username
+        self.password = password
+        self.delay = delay # seconds to wait before answering, like a real round trip
+
+        self.sessions = set() # cookies of logged in clients
+        self.selected = {} # cookie -> planet id picked with cp, like the server remembers it
+        self.tokens = set() # tokens that haven't been used yet
+        self.requests = 0
+        self.rejected = 0 # posts with a bad token
+        self.posted = [] # (page, planet id, type) of the posts that went through, in order
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.per_page = {} # page -> number of requests
+        self.failures = [] # (status, headers) to answer the next game requests with, to try retries
+        self.pages = {} # page name -> raw fixture, loaded when first needed
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/lobby/{country}", self.lobby)
+        app.router.add_post("/lobby/{country}/main/login", self.login)
+        app.router.add_route("*", "/{server}/game/index.php", self.game)
+        return app
+
+    def load(self, page):
+        if page not in self.pages:
+            # ajax pages (like galaxyContent) are saved as .json
+            for extension in [".html", ".json"]:
+                path = os.path.join(self.directory, page + extension)
+                if not os.path.exists(path): continue
+                with open(path, "rb") as f: self.pages[page] = f.read()
+                break
+            else: return None
+        return self.pages[page]
+
+    def render(self, content, logged_in=True, planet=None):
+        """Put in the player name, the selected planet and fresh tokens, like the server does."""
+        name = self.username.encode() if logged_in else b""
+        content = player_field.sub(lambda m: m.group(1) + name + m.group(2), content)
+        if planet is not None: content = planet_field.sub(lambda m: m.group(1) + planet.encode() + m.group(2), content)
+        def new_token(match):
+            token = uuid.uuid4().hex
+            self.tokens.add(token)
+            return match.group(1) + token.encode() + match.group(2)
+        return token_field.sub(new_token, content)
+
+    def count(self, request, page):
+        self.per_page[page] = self.per_page.get(page, 0) + 1
+        self.bytes_received += request.content_length or 0
+
+    def stats(self):
+        """Counters of everything the clients asked for so far."""
+        return {"requests": self.requests, "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received, "rejected": self.rejected,
+                "per_page": dict(self.per_page)}
+
+    async def respond(self, content, **kwargs):
+        self.requests += 1
+        if self.delay: await asyncio.sleep(self.delay)
+        self.bytes_sent += len(content)
+        content_type = "application/json" if content.startswith(b"{") else "text/html"
+        return web.Response(body=content, content_type=content_type, **kwargs)
+
+    async def lobby(self, request):
+        self.count(request, "lobby")
+        return await self.respond(self.load("lobby"))
+
+    async def login(self, request):
+        self.count(request, "login")
+        form = await request.post()
+        if form.get("login") != self.username or form.get("pass") != self.password:
+            return await self.respond(self.load("lobby"))
+
+        session = uuid.uuid4().hex
+        self.sessions.add(session)
+        response = await self.respond(self.render(self.load("overview")))
+        response.set_cookie("PHPSESSID", session)
+        return response
+
+    async def game(self, request):
+        page = request.query.get("page", "overview")
+        self.count(request, page)
+        if self.failures: # overloaded, or someone asked us to pretend
+            status, headers = self.failures.pop(0)
+            self.requests += 1
+            return web.Response(status=status, headers=headers)
+        session = request.cookies.get("PHPSESSID")
+        logged_in = session in self.sessions
+        if logged_in and "cp" in request.query: self.selected[session] = request.query["cp"]
+        planet = request.query.get("cp", self.selected.get(session)) # the one this request is about
+
+        if page == "logout":
+            self.sessions.discard(request.cookies.get("PHPSESSID"))
+            return await self.respond(self.load("lobby"))
+
+        rejected = False
+        if request.method == "POST":
+            form = await request.post()
+            # a used or made up token means the action doesn't go through
+            if "token" in form:
+                if form["token"] in self.tokens: self.tokens.discard(form["token"])
+                else:
+                    self.rejected += 1
+                    rejected = True
+            if logged_in and not rejected: self.posted.append((page, planet, form.get("type")))
+
+        if page == "messages" and "messageId" in request.query: page = "messageDetail" # one whole report
+        content = self.load(page)
+        if content is None: raise web.HTTPNotFound()
+        if not logged_in: content = self.load("lobby") # like the real thing, you get thrown out
+        content = self.render(content, logged_in, planet)
+        if rejected and logged_in: content = body_tag.sub(lambda m: m.group(0) + token_error, content, count=1)
+        return await self.respond(content)
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving on the running loop. Returns the runner and the base url."""
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        port = runner.addresses[0][1]
+        return runner, "http://{}:{}".format(host, port)
+
+    def run_in_thread(self, host="127.0.0.1", port=0):
+        """Serve from a background thread, for the synchronous OGamer. Returns the base url."""
+        started = threading.Event()
+        found = {}
+
+        def serve():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            found["runner"], found["url"] = loop.run_until_complete(self.start(host, port))
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=serve, daemon=True).start()
+        started.wait()
+        return found["url"]
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    web.run_app(StandIn().app(), host="127.0.0.1", port=port)
+
+if __name__ == "__main__": main()
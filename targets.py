@@ -0,0 +1,132 @@
+"""Finding the closest targets to each planet, from what the galaxy scanner saved.
+
+The occupied slots of every galaxy are kept sorted by system, so a query only looks at the
+systems a fleet can reach in the time given. Scanned systems can be put in as they arrive:
+
+    index = TargetIndex(store)
+    scanner.scan(on_system=index.on_system)
+    index.nearest((1, 101, 8), n=20, max_seconds=3600, speed=flight.fleet_speed({"lcargo": 1}, techs))
+    index.nearest_all({name: coords for name, coords in planets.items()}, n=20)
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from ogamy import flight
+from ogamy.galaxy import INACTIVE, VACATION, BANNED
+
+# what is kept of each occupied slot
+fields = ["system", "position", "flat", "status", "player_id", "moon", "debris"]
+
+class TargetIndex:
+
+    def __init__(self, store, donut_galaxy=True, donut_system=True):
+        self.store = store
+        self.galaxies, self.systems, self.positions = store.slots.shape
+        self.donut_galaxy = donut_galaxy
+        self.donut_system = donut_system
+        self.buckets = [self.bucket(galaxy) for galaxy in range(1, self.galaxies + 1)]
+
+    def rows(self, galaxy, systems=slice(None)):
+        """The occupied slots of some systems of a galaxy, as a dict of arrays."""
+        slots = np.asarray(self.store.slots[galaxy - 1, systems])
+        first = 0 if systems.start is None else systems.start
+        system, position = np.nonzero(slots["planet_id"])
+        found = slots[system, position]
+        return {"system": (system + first + 1).astype(np.int32),
+                "position": (position + 1).astype(np.int32),
+                "flat": np.ravel_multi_index((np.full(len(system), galaxy - 1), system + first, position),
+                                             self.store.slots.shape),
+                "status": found["status"],
+                "player_id": found["player_id"],
+                "moon": found["moon"],
+                "debris": found["debris_metal"].astype(np.int64) + found["debris_crystal"]}
+
+    def bucket(self, galaxy):
+        return self.rows(galaxy) # nonzero gives them sorted by system already
+
+    def update(self, galaxy, system):
+        """Put in what the store has now for one system, without rebuilding the rest."""
+        bucket = self.buckets[galaxy - 1]
+        lo, hi = np.searchsorted(bucket["system"], [system, system + 1])
+        new = self.rows(galaxy, slice(system - 1, system))
+        self.buckets[galaxy - 1] = {field: np.concatenate([bucket[field][:lo], new[field], bucket[field][hi:]])
+                                    for field in fields}
+
+    def on_system(self, galaxy, system, rows, changed):
+        """For GalaxyScanner.scan(on_system=...)."""
+        if changed: self.update(galaxy, system)
+
+    def reach(self, seconds, speed, percent=10, uni_speed=1):
+        """The longest distance a fleet with this speed can fly in seconds."""
+        flying = max(seconds * uni_speed - 10, 0)
+        return (flying * percent / 10 / 3500)**2 * speed / 10
+
+    def windows(self, start, max_distance):
+        """(galaxy, first system, last system) ranges that can be within max_distance of start."""
+        galaxy, system = start[0], start[1]
+        if max_distance is None or max_distance >= 20000:
+            # other galaxies too, every system of the ones close enough
+            far = self.galaxies if max_distance is None else int(max_distance // 20000)
+            found = []
+            for g in range(1, self.galaxies + 1):
+                apart = abs(g - galaxy)
+                if self.donut_galaxy: apart = min(apart, self.galaxies - apart)
+                if apart <= far: found.append((g, 1, self.systems))
+            return found
+        if max_distance < 2700 + 95: return [(galaxy, system, system)]
+
+        k = int((max_distance - 2700) // 95)
+        lo, hi = system - k, system + k
+        if lo >= 1 and hi <= self.systems or 2 * k + 1 >= self.systems or not self.donut_system:
+            return [(galaxy, max(lo, 1), min(hi, self.systems))]
+        if lo < 1: return [(galaxy, 1, hi), (galaxy, lo + self.systems, self.systems)] # wraps around
+        return [(galaxy, lo, self.systems), (galaxy, 1, hi - self.systems)]
+
+    def candidates(self, start, max_distance):
+        """Rows (and their galaxy) of the systems that could be close enough."""
+        parts = []
+        for galaxy, first, last in self.windows(start, max_distance):
+            bucket = self.buckets[galaxy - 1]
+            lo, hi = np.searchsorted(bucket["system"], [first, last + 1])
+            part = {field: bucket[field][lo:hi] for field in fields}
+            part["galaxy"] = np.full(hi - lo, galaxy, dtype=np.int32)
+            parts.append(part)
+        if not parts: return {field: np.zeros(0, dtype=int) for field in fields + ["galaxy"]}
+        return {field: np.concatenate([part[field] for part in parts]) for field in parts[0]}
+
+    def nearest(self, start, n=10, max_seconds=None, speed=None, percent=10, uni_speed=1,
+                flags=INACTIVE, without=VACATION | BANNED, exclude_players=(), min_debris=0, where=None):
+        """The n slots closest to start (galaxy, system, position) that have all of the status
+        flags and none of without (see galaxy.py), aren't from exclude_players and have at least
+        min_debris. where can be a function of the candidate rows (a dict of arrays) giving a
+        mask of the ones to keep. With max_seconds (and the fleet speed, see
+        flight.fleet_speed) only what can be reached in that time is given.
+        Returns coords (k, 3), distance, duration (if speed was given) and the slots."""
+        if max_seconds is not None and speed is None: raise ValueError("max_seconds needs the fleet speed")
+        max_distance = None if max_seconds is None else self.reach(max_seconds, speed, percent, uni_speed)
+        rows = self.candidates(start, max_distance)
+
+        coords = np.stack([rows["galaxy"], rows["system"], rows["position"]], axis=1)
+        dist = flight.distance([start], coords, self.galaxies, self.systems,
+                               self.donut_galaxy, self.donut_system)[0] if len(coords) else np.zeros(0)
+
+        keep = ((rows["status"] & flags) == flags) & ((rows["status"] & without) == 0)
+        keep &= rows["debris"] >= min_debris
+        if len(exclude_players): keep &= ~np.isin(rows["player_id"], list(exclude_players))
+        if max_distance is not None: keep &= dist <= max_distance
+        if where is not None: keep &= where(rows)
+        found = np.nonzero(keep)[0]
+
+        # only the n closest get sorted
+        if len(found) > n: found = found[np.argpartition(dist[found], n)[:n]]
+        found = found[np.argsort(dist[found], kind="stable")]
+
+        result = OrderedDict([("coords", coords[found]), ("distance", dist[found])])
+        if speed is not None: result["duration"] = flight.duration(dist[found], speed, percent, uni_speed)
+        result["slots"] = self.store.slots.reshape(-1)[rows["flat"][found]]
+        return result
+
+    def nearest_all(self, starts, n=10, **kwargs):
+        """nearest for every planet, starts maps planet names to coordinates."""
+        return OrderedDict((name, self.nearest(start, n, **kwargs)) for name, start in starts.items())
@@ -0,0 +1,37 @@
+"""Shared setup of the tests. They talk to the stand-in server (see standin.py), so they don't
+need an account or the internet:
+
+    python -m pytest
+"""
+import os
+import sys
+import importlib.util
+
+import pytest
+
+try: import ogamy
+except ImportError: # the checkout doesn't have to be in a folder called ogamy
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    spec = importlib.util.spec_from_file_location("ogamy", os.path.join(root, "__init__.py"),
+                                                  submodule_search_locations=[root])
+    ogamy = sys.modules["ogamy"] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ogamy)
+
+from ogamy.api import OGamer
+from ogamy.standin import StandIn, point
+
+@pytest.fixture(scope="session")
+def standin():
+    server = StandIn()
+    server.url = server.run_in_thread()
+    point(OGamer, server.url)
+    return server
+
+@pytest.fixture
+def game(standin):
+    """A logged in OGamer with nothing cached."""
+    return OGamer("Capella", standin.username, standin.password)
+
+def requests_for(standin, page):
+    """How many times page was asked for so far."""
+    return standin.per_page.get(page, 0)
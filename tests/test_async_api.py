@@ -0,0 +1,58 @@
+import time
+import asyncio
+
+from ogamy.async_api import AsyncOGamer
+from ogamy.standin import StandIn, point
+
+def run(standin, work):
+    """Log in an AsyncOGamer on the stand-in and run work(game) with it."""
+    point(AsyncOGamer, standin.url)
+    async def main():
+        async with await AsyncOGamer.create("Capella", standin.username, standin.password) as game:
+            return await work(game)
+    return asyncio.run(main())
+
+def test_forget_keeps_other_planets(standin):
+    async def work(game):
+        await game.fetch_resources("Homeworld")
+        await game.fetch_resources("Colony")
+        game.forget("Colony")
+        return [game.cache.get("overview", game.planet_ids[name]) for name in ["Homeworld", "Colony"]]
+    homeworld, colony = run(standin, work)
+    assert homeworld is not None and colony is None
+
+def test_page_without_planet_is_kept_under_its_planet(standin):
+    async def work(game):
+        await game.fetch_resources()
+        return list(game.cache.entries)
+    assert all(planet is not None for _, planet in run(standin, work))
+
+def test_fetches_run_at_the_same_time():
+    slow = StandIn(delay=0.3)
+    slow.url = slow.run_in_thread()
+    async def work(game):
+        start = time.perf_counter()
+        await asyncio.gather(*(game.get_soup(page, name, cache=False)
+                               for page in ["resources", "station", "shipyard"] for name in game.planet_ids))
+        return time.perf_counter() - start
+    assert run(slow, work) < 3 * slow.delay # one after the other would be 6 of them
+
+def test_build_with_refused_token_is_sent_again(standin):
+    async def work(game):
+        await game.build_mine("metal", "Homeworld") # leaves the answer's token for the next one
+        standin.tokens.clear() # and now that one is too old
+        before, rejected = len(standin.posted), standin.rejected
+        await game.build_mine("crystal", "Homeworld")
+        return standin.posted[before:], standin.rejected - rejected
+    posted, rejected = run(standin, work)
+    assert rejected == 1 and [page for page, _, _ in posted] == ["resources"]
+
+def test_build_after_being_logged_out_logs_in_again(standin):
+    async def work(game):
+        await game.build_mine("metal", "Homeworld")
+        await game.logout()
+        before, logins = len(standin.posted), game.logins
+        await game.build_mine("crystal", "Homeworld")
+        return standin.posted[before:], game.logins - logins
+    posted, logins = run(standin, work)
+    assert logins == 1 and [page for page, _, _ in posted] == ["resources"]
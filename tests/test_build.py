@@ -0,0 +1,28 @@
+from ogamy import codes
+
+def test_build_many_keeps_the_order_of_each_planet(game, standin):
+    orders = [("mine", "metal", "Colony"),
+              ("station", "robot", "Colony"),
+              ("mine", "crystal", "Homeworld"),
+              ("mine", "crystal", "Colony"),
+              ("research", "energy", "Homeworld")]
+    before, rejected = len(standin.posted), standin.rejected
+    answers = game.build_many(orders)
+
+    colony, homeworld = str(game.planet_ids["Colony"]), str(game.planet_ids["Homeworld"])
+    assert standin.posted[before:] == [("resources", colony, str(codes.mines["metal"])),
+                                       ("station", colony, str(codes.buildings["robot"])),
+                                       ("resources", colony, str(codes.mines["crystal"])),
+                                       ("resources", homeworld, str(codes.mines["crystal"])),
+                                       ("research", homeworld, str(codes.techs["energy"]))]
+    assert standin.rejected == rejected
+    assert len(answers) == len(orders) and all(answers)
+
+def test_rejected_token_is_tried_again(game, standin):
+    planet = game.planet_ids["Homeworld"]
+    game.tokens[("resources", planet)] = "used already"
+    before, rejected = len(standin.posted), standin.rejected
+    game.send_build_post("resources", "Homeworld", codes.mines["metal"])
+
+    assert standin.rejected == rejected + 1
+    assert standin.posted[before:] == [("resources", str(planet), str(codes.mines["metal"]))]
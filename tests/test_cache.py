@@ -0,0 +1,51 @@
+from ogamy.cache import PageCache
+
+from conftest import requests_for
+
+def test_invalidate_planet_keeps_the_others():
+    cache = PageCache()
+    cache.put("resources", 1, b"one")
+    cache.put("resources", 2, b"two")
+    cache.put("research", None, b"none")
+    cache.invalidate(planet=1)
+    assert cache.get("resources", 1) is None
+    assert cache.get("resources", 2) == b"two"
+    assert cache.get("research", None) == b"none"
+
+def test_invalidate_none_is_a_planet():
+    cache = PageCache()
+    cache.put("resources", 1, b"one")
+    cache.put("resources", None, b"none")
+    cache.invalidate(planet=None)
+    assert cache.get("resources", None) is None
+    assert cache.get("resources", 1) == b"one"
+
+def test_forget_keeps_other_planets(game):
+    game.fetch_resources("Homeworld")
+    game.fetch_resources("Colony")
+    game.forget("Colony")
+    assert game.cache.get("overview", game.planet_ids["Homeworld"]) is not None
+    assert game.cache.get("overview", game.planet_ids["Colony"]) is None
+
+def test_forget_without_planet_drops_the_selected_one(game):
+    game.fetch_resources("Homeworld")
+    game.fetch_resources("Colony") # the server now has the colony selected
+    game.forget(None)
+    assert game.cache.get("overview", game.planet_ids["Homeworld"]) is not None
+    assert game.cache.get("overview", game.planet_ids["Colony"]) is None
+
+def test_page_without_planet_is_the_selected_one(game, standin):
+    game.fetch_resources("Colony")
+    before = requests_for(standin, "overview")
+    assert game.fetch_resources() == game.fetch_resources("Colony")
+    assert requests_for(standin, "overview") == before # both from the cache
+
+    game.get_soup("overview", "Homeworld", cache=False)
+    assert game.current_planet == game.planet_ids["Homeworld"]
+    assert game.cache.get("overview", None) is None # never kept under None
+
+def test_lobby_is_not_cached_when_logging_in_again_fails(game, standin):
+    game.password = "wrong" # logging in again won't work
+    standin.sessions.discard(game.session.cookies.get("PHPSESSID"))
+    game.get_soup("resources", "Colony")
+    assert game.cache.get("resources", game.planet_ids["Colony"]) is None
@@ -0,0 +1,30 @@
+import numpy as np
+
+from ogamy import combat
+
+def test_outcome():
+    nothing, one = combat.counts({}), combat.counts({"lfighter": 1})
+    attack_left = np.array([one, nothing, nothing, one])
+    defend_left = np.array([nothing, one, nothing, one])
+    assert combat.outcome(attack_left, defend_left).tolist() == ["attacker", "defender", "draw", "draw"]
+
+def test_same_fleets_win_as_often():
+    result = combat.simulate({"lfighter": 1}, {"lfighter": 1}, trials=4000, seed=1)
+    both_dead = (result["attackers_left"].sum(axis=1) == 0) & (result["defenders_left"].sum(axis=1) == 0)
+    assert (result["winner"][both_dead] == "draw").all()
+
+    odds = combat.summary(result)
+    assert abs(odds["attacker_wins"] - odds["defender_wins"]) < 0.05
+
+def test_stronger_side_wins():
+    odds = combat.summary(combat.simulate({"battleship": 20}, {"rocket": 10}, trials=50, seed=1))
+    assert odds["attacker_wins"] == 1
+
+def test_every_wave_can_make_a_unit_explode():
+    rng = np.random.default_rng(1)
+    side = combat.Side(combat.counts({"lfighter": 20000})) # hull 400, shield 10
+    everyone = np.arange(len(side))
+    side.take(everyone, np.full(len(side), 150.0), rng) # hull at 65%, 35% explode
+    side.take(everyone, np.full(len(side), 150.0), rng) # hull at 27.5%, 72.5% of the rest explode
+    # rolling once for all the damage would only be 72.5%
+    assert abs(np.mean(side.hull == 0) - (0.35 + 0.65 * 0.725)) < 0.02
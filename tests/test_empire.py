@@ -0,0 +1,12 @@
+def test_every_page_is_downloaded_once(game, standin):
+    game.cache.invalidate()
+    planet_pages = ["overview", "resources", "station", "shipyard", "defense"]
+    before = dict(standin.stats()["per_page"])
+    empire = game.fetch_empire()
+    after = standin.stats()["per_page"]
+
+    downloaded = {page: after.get(page, 0) - before.get(page, 0) for page in after}
+    planets = len(game.planet_ids)
+    assert planets > 1 and list(empire["planets"]) == list(game.planet_ids)
+    assert {page: n for page, n in downloaded.items() if n} == dict(
+        [("highscore", 1), ("research", 1)] + [(page, planets) for page in planet_pages])
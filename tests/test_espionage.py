@@ -0,0 +1,34 @@
+import time
+
+import numpy as np
+
+from ogamy import flight
+from ogamy.espionage import ReportReader, ReportStore
+from ogamy.galaxy import LONGINACTIVE
+
+from conftest import requests_for
+
+def test_reports_are_only_read_once(game, standin, tmp_path):
+    store = ReportStore(str(tmp_path / "reports.npy"))
+    reader = ReportReader(game, store, workers=2)
+    assert reader.read() == 10
+    assert store.get(9004)["details"] and len(ReportStore(store.path)) == 10 # saved
+
+    before = requests_for(standin, "messages")
+    assert reader.read() == 0
+    assert requests_for(standin, "messages") == before + 1 # the first page, no details
+
+def test_rank_filters(game, tmp_path):
+    store = ReportStore()
+    ReportReader(game, store, workers=2).read(details=False)
+    speed = flight.fleet_speed({"lcargo": 1}, {})
+    ids = lambda **kwargs: set(store.rank((2, 100, 8), speed, n=20, **kwargs)["reports"]["id"].tolist())
+
+    assert ids() == {9001, 9002, 9003, 9007, 9009, 9010} # nothing seen on the planet
+    assert ids(max_defense=None) == ids() | {9004, 9006} # a defence, but no fleet
+    assert ids(flags=LONGINACTIVE) == {9001, 9002, 9007}
+    newest = np.sort(store.reports["time"])[-3]
+    assert ids(max_age=time.time() - newest + 60) == {9001, 9002, 9003} # spied an hour apart
+
+    ranked = store.rank((2, 100, 8), speed, n=3)
+    assert len(ranked["coords"]) == 3 and (np.diff(ranked["per_second"]) <= 0).all()
@@ -0,0 +1,23 @@
+from ogamy.extrapolate import Tracker
+
+def test_planets_by_id_name_or_selected(game, standin):
+    tracker = Tracker(game)
+    colony = game.planet_ids["Colony"]
+    assert tracker.resources(colony) == tracker.resources("Colony")
+    assert list(tracker.models) == ["Colony"]
+
+    game.get_soup("overview", "Colony", cache=False) # now it's the selected one
+    tracker.resources()
+    assert list(tracker.models) == ["Colony"] and tracker.fetches == 1
+
+    tracker.forget(colony)
+    assert not tracker.models
+
+def test_selected_planet_is_modelled_with_its_own_levels(game):
+    tracker = Tracker(game)
+    game.get_soup("overview", "Colony", cache=False) # the server has the colony selected
+    game.current_planet = None # but we don't know it
+    tracker.resources()
+    colony = game.fetch_planet_info("Colony")
+    assert list(tracker.models) == ["Colony"]
+    assert tracker.levels["Colony"][1]["planet_info"] == colony
@@ -0,0 +1,34 @@
+from ogamy.fleet import FleetOrder, dispatch
+from ogamy.instrument import Hooks
+
+from conftest import requests_for
+
+def test_orders_without_planet_leave_from_the_selected_one(game, standin):
+    game.get_soup("overview", "Homeworld", cache=False)
+    orders = [FleetOrder({"lcargo": 1}, (1, 105, 7), "transport"),
+              FleetOrder({"lcargo": 1}, (2, 250, 12), "transport", planet="Colony"),
+              FleetOrder({"lcargo": 1}, (1, 110, 3), "transport")]
+    before, rejected = len(standin.posted), standin.rejected
+    answers = dispatch(game, orders, workers=2)
+
+    sent = sorted(planet for page, planet, _ in standin.posted[before:] if page == "movement")
+    homeworld, colony = str(game.planet_ids["Homeworld"]), str(game.planet_ids["Colony"])
+    assert sent == sorted([homeworld, colony, homeworld])
+    assert all(answers) and standin.rejected == rejected
+    assert orders[0].planet is None # the caller's orders aren't changed
+
+def test_refused_token_starts_again_from_fleet1(game, standin):
+    class SpoilToken(Hooks): # the token of the first movement post is gone when it arrives
+        spoiled = False
+        def on_request(self, page, planet, method):
+            if page == "movement" and not self.spoiled:
+                self.spoiled = True
+                standin.tokens.clear()
+    game.hooks = SpoilToken()
+    before, rejected, fleet1 = len(standin.posted), standin.rejected, requests_for(standin, "fleet1")
+    answer = game.send_fleet({"lcargo": 1}, {}, (1, 105, 7), "transport", planet="Homeworld")
+
+    assert answer is not None and b"Invalid token" not in answer
+    assert standin.rejected == rejected + 1
+    assert requests_for(standin, "fleet1") == fleet1 + 2
+    assert [page for page, _, _ in standin.posted[before:]].count("movement") == 1
@@ -0,0 +1,35 @@
+import numpy as np
+
+from ogamy import flight
+
+def test_distance():
+    starts = [(1, 1, 1)]
+    dests = [(1, 1, 1), (1, 1, 4), (1, 3, 1), (1, 499, 1), (2, 1, 1), (9, 1, 1)]
+    assert flight.distance(starts, dests).tolist() == [[5, 1015, 2890, 2795, 20000, 20000]]
+    # without the donut the far ends are far
+    far = flight.distance(starts, dests, donut_galaxy=False, donut_system=False)
+    assert far[0, 3] == 2700 + 95 * 498 and far[0, 5] == 20000 * 8
+
+def test_drives():
+    assert flight.drive("scargo") == (5000, 10)
+    assert flight.drive("scargo", {"combustion": 10, "impulse": 5}) == (20000, 20) # impulse from level 5
+    assert flight.fleet_speed({"lcargo": 1, "recycler": 1}, {"combustion": 2}) == 2400
+
+def test_duration_and_fuel():
+    dist = flight.distance([(1, 1, 1)], [(1, 1, 2)])[0, 0] # 1005
+    seconds = flight.duration(dist, 5000, 10)
+    assert seconds == 4972 # 3500 * sqrt(1005 * 10 / 5000) + 10
+    assert flight.duration(dist, 5000, 5) == 9934
+    assert flight.duration(dist, 5000, 10, uni_speed=2) == 2486
+    assert flight.fuel({"scargo": 1}, {}, dist, seconds) == 2
+    assert flight.fuel({"scargo": 10}, {}, dist, seconds) == 12
+
+def test_journey_shapes():
+    starts = [(1, 101, 8), (2, 250, 12)]
+    dests = np.array([(1, 105, 7), (3, 1, 1), (1, 101, 9)])
+    found = flight.journey({"lcargo": 5}, {}, starts, dests)
+    assert found["distance"].shape == (2, 3)
+    assert found["duration"].shape == found["fuel"].shape == (2, 3, 10)
+    # slower is longer and cheaper
+    assert (np.diff(found["duration"], axis=2) < 0).all()
+    assert (np.diff(found["fuel"], axis=2) >= 0).all()
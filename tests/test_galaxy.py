@@ -0,0 +1,29 @@
+import os
+
+from ogamy import galaxy
+from ogamy.galaxy import GalaxyScanner, GalaxyStore
+from ogamy.standin import fixtures
+
+from conftest import requests_for
+
+def test_scan_and_rescan(game, standin, tmp_path):
+    store = GalaxyStore(str(tmp_path), galaxies=1, systems=3)
+    scanner = GalaxyScanner(game, store, workers=2)
+    assert scanner.scan() == 3
+    assert store.pending() == []
+
+    before = requests_for(standin, "galaxyContent")
+    assert scanner.scan(max_age=0) == 0 # everything read again, nothing different
+    assert requests_for(standin, "galaxyContent") == before + 3
+
+    assert store.by_player("Sleepy").tolist() == [[1, 1, 5], [1, 2, 5], [1, 3, 5]]
+    assert store.by_alliance("TOP").tolist() == [[1, s, 14] for s in [1, 2, 3]]
+    assert GalaxyStore(str(tmp_path), galaxies=1, systems=3).pending() == [] # it's on disk
+
+def test_long_names_are_found(tmp_path):
+    name = "Der schläfrige Großadmiral" # more than 20 bytes, and cut in the middle of the ß
+    with open(os.path.join(fixtures, "galaxyContent.json"), "rb") as f:
+        content = f.read().replace(b"Sleepy", name.encode())
+    store = GalaxyStore(str(tmp_path), galaxies=1, systems=1)
+    store.update(1, 1, galaxy.parse_system(content))
+    assert store.by_player(name).tolist() == [[1, 1, 5]]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from ogamy.highscore import HighscoreStore
+
+def store(readings):
+    """A store with a reading per (time, {id: points}), for the total points only."""
+    found = HighscoreStore(kinds=["total"])
+    for when, points in readings:
+        column = found.snapshot(when)
+        ids = np.array(list(points), dtype=np.int64)
+        names = np.array(["player{}".format(i).encode() for i in ids], dtype="S20")
+        found.put(column, "total", ids, names, np.array(list(points.values()), dtype=float))
+    return found
+
+day = 24 * 3600
+
+def test_one_reading_is_not_enough():
+    one = store([(0, {1: 100, 2: 200})])
+    assert not one.inactive(seconds=0).any()
+    assert not store([(0, {1: 100}), (day, {1: 100})]).inactive(seconds=0).any() # only the last one
+
+def test_deltas_inactive_and_last_growth():
+    readings = store([(0, {1: 100, 2: 200, 3: 300}),
+                      (day, {1: 150, 2: 200, 3: 300}),
+                      (2 * day, {1: 150, 2: 200, 4: 50}), # 3 missing, 4 is new
+                      (3 * day, {1: 150, 2: 200, 3: 300, 4: 80})])
+    deltas = readings.deltas("total")
+    assert deltas.shape == (4, 3)
+    assert deltas[0].tolist() == [50, 0, 0]
+    assert np.isnan(deltas[2, 1]) and np.isnan(deltas[3, 0])
+
+    assert readings.inactive(seconds=2 * day).tolist() == [True, True, True, False]
+    assert readings.inactive(seconds=3 * day).tolist() == [False, True, True, False]
+    assert list(readings.inactive_players(seconds=3 * day)) == [2, 3]
+    assert not readings.inactive(seconds=4 * day).any() # the readings don't go back that far
+
+    assert readings.last_growth().tolist() == [day, 0, 0, 3 * day]
@@ -0,0 +1,42 @@
+import json
+import time
+
+from ogamy.instrument import Histogram, Recorder, buckets
+
+def test_histogram_buckets():
+    histogram = Histogram()
+    for value in [0.0005, 0.001, 0.003, 0.2, 100]: histogram.add(value)
+    counts = dict(zip(buckets, histogram.counts))
+    assert counts[0.001] == 2 and counts[0.005] == 1 and counts[0.25] == 1 and counts[float("inf")] == 1
+    assert histogram.cumulative()[-1] == histogram.count == 5
+    assert histogram.total == 0.0005 + 0.001 + 0.003 + 0.2 + 100
+
+def test_prometheus_text():
+    recorder = Recorder()
+    recorder.on_response("overview", None, "GET", time.perf_counter(), 0.02, 1500)
+    recorder.on_relogin("overview")
+    text = recorder.prometheus().splitlines()
+    assert 'ogamy_seconds_bucket{stage="request",page="overview",le="0.01"} 0' in text
+    assert 'ogamy_seconds_bucket{stage="request",page="overview",le="0.025"} 1' in text
+    assert 'ogamy_seconds_bucket{stage="request",page="overview",le="+Inf"} 1' in text
+    assert 'ogamy_seconds_count{stage="request",page="overview"} 1' in text
+    assert 'ogamy_bytes_total{page="overview"} 1500' in text
+    assert "# TYPE ogamy_relogins_total counter" in text
+
+def test_chrome_trace(tmp_path):
+    recorder = Recorder()
+    start = time.perf_counter()
+    recorder.on_parse("resources", "levels", start, 0.004)
+    path = str(tmp_path / "trace.json")
+    recorder.write_trace(path)
+    with open(path) as f: event, = json.load(f)["traceEvents"]
+    assert event["name"] == "resources" and event["cat"] == "parse" and event["ph"] == "X"
+    assert abs(event["dur"] - 4000) < 1e-6 and event["ts"] >= 0
+
+def test_tokens_only_count_pages_downloaded_for_them(game):
+    game.hooks = recorder = Recorder()
+    game.send_fleet({"lcargo": 1}, {}, (1, 105, 7), "transport", planet="Homeworld")
+    assert not any(name == "tokens" for name, _ in recorder.counters) # fleet3 was needed anyway
+    game.tokens.clear()
+    game.build_mine("metal", "Homeworld")
+    assert recorder.counters[("tokens", "resources")] == 1
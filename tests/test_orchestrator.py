@@ -0,0 +1,31 @@
+import time
+import threading
+
+from ogamy.api import OGamer
+from ogamy.orchestrator import Orchestrator
+from ogamy.standin import point
+
+def nap(game, seconds):
+    time.sleep(seconds)
+    return seconds
+
+def accounts(standin, n):
+    return [{"uni": "Capella", "username": standin.username, "password": standin.password,
+             "name": "account{}".format(i)} for i in range(n)]
+
+def test_abandoned_results_dont_stop_the_next_job(standin):
+    # one thread, so the second account finishes after the first result was taken
+    with Orchestrator(accounts(standin, 2), processes=1, threads=1,
+                      initializer=point, initargs=(OGamer, standin.url)) as orchestrator:
+        results = orchestrator.submit(nap, 0.3)
+        assert next(results)[1] == 0.3
+        results.close() # not interested in the other account anymore
+        time.sleep(0.5) # its result arrives with nobody waiting for it
+
+        found = {}
+        worker = threading.Thread(target=lambda: found.update(orchestrator.run("fetch_points")), daemon=True)
+        worker.start()
+        worker.join(10)
+        assert sorted(found) == ["account0", "account1"]
+        assert all(isinstance(points, dict) for points in found.values())
+        assert not orchestrator.streams
@@ -0,0 +1,37 @@
+import os
+import stat
+
+from ogamy.api import OGamer
+from ogamy.persist import SessionStore
+
+from conftest import requests_for
+
+def test_warm_start_needs_no_requests(standin, tmp_path):
+    path = str(tmp_path / "session.json")
+    first = OGamer("Capella", standin.username, standin.password, store=SessionStore(path))
+
+    before = standin.stats()["requests"]
+    game = OGamer("Capella", standin.username, standin.password, store=SessionStore(path))
+    assert standin.stats()["requests"] == before # no login, no planets
+    assert game.planet_ids == first.planet_ids
+
+    logins = requests_for(standin, "login")
+    game.fetch_resources("Colony") # and the saved login still works
+    assert requests_for(standin, "login") == logins and game.logins == 0
+
+def test_every_section_expires_on_its_own(standin, tmp_path):
+    path = str(tmp_path / "session.json")
+    OGamer("Capella", standin.username, standin.password, store=SessionStore(path))
+
+    store = SessionStore(path, ttl={"cookies": -1}) # the login is too old, the planets aren't
+    assert store.get("planet_ids", "en/s103/" + standin.username) is not None
+    before = {page: requests_for(standin, page) for page in ["login", "overview"]}
+    game = OGamer("Capella", standin.username, standin.password, store=store)
+    assert game.logins == 1 and requests_for(standin, "login") == before["login"] + 1
+    assert requests_for(standin, "overview") == before["overview"]
+
+def test_only_we_can_read_the_file(tmp_path):
+    path = str(tmp_path / "session.json")
+    SessionStore(path).put("cookies", "someone", [{"name": "PHPSESSID", "value": "secret"}])
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert SessionStore(path).get("cookies", "someone")[0]["value"] == "secret"
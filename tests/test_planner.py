@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from ogamy.planner import Planner, actions, plan
+
+def planet(mines=None, storage=None, buildings=None, resources=(10 ** 9, 10 ** 9, 10 ** 9)):
+    return {"mines": mines or {}, "storage": storage or {}, "buildings": buildings or {},
+            "resources": dict(zip(["metal", "crystal", "deuterium"], resources))}
+
+def builds(planner):
+    return [actions[child.action] for child in planner.expand(planner.root)]
+
+def test_nanite_needs_computer_technology():
+    robots = planet(buildings={"robot": 10}, storage={"metal": 30, "crystal": 30, "deuterium": 30})
+    assert "nanite" not in builds(Planner(robots, {"computer": 9}, horizon=10 ** 9))
+    assert "nanite" in builds(Planner(robots, {"computer": 10}, horizon=10 ** 9))
+    assert "nanite" not in builds(Planner(planet(buildings={"robot": 9}), {"computer": 10}, horizon=10 ** 9))
+
+def test_fusion_never_burns_below_zero():
+    planner = Planner(planet(mines={"fusion": 20}, resources=(0, 0, 100)), horizon=3600)
+    rates = planner.rates(planner.root.levels)
+    assert rates[2] < 0
+    stock = planner.advance(planner.root.stock, rates, planner.caps(planner.root.levels), 10 ** 6)
+    assert stock[2] == 0
+    assert planner.value(planner.root) >= 0
+
+def exhaustive(planner):
+    """The best plan of all, trying every order of every upgrade. Only for tiny cases."""
+    best, todo = planner.root, [planner.root]
+    while todo:
+        node = todo.pop()
+        if node.score > best.score: best = node
+        todo.extend(planner.expand(node))
+    return best
+
+def test_beam_finds_the_best_plan_on_a_small_case():
+    small = planet(mines={"metal": 1, "crystal": 2, "deuterium": 2, "solar": 2}, resources=(500, 3000, 3000))
+    planner = Planner(small, horizon=8 * 3600)
+    best = exhaustive(planner)
+    found = planner.search()
+    assert len(best.steps()) > 1 # something worth comparing
+    assert found.score == pytest.approx(best.score)
+    assert [node.action for node in found.steps()] == [node.action for node in best.steps()]
+
+def test_hundred_steps_in_under_a_second():
+    home = planet(mines={"metal": 15, "crystal": 12, "deuterium": 10, "solar": 16},
+                  storage={"metal": 5, "crystal": 4, "deuterium": 3}, buildings={"robot": 6},
+                  resources=(50000, 30000, 10000))
+    start = time.perf_counter()
+    found = plan(home, horizon=3 * 365 * 24 * 3600, steps=100)
+    assert time.perf_counter() - start < 1
+    assert len(found["upgrades"]) > 50 and found["value"] > found["value_without_building"]
@@ -0,0 +1,27 @@
+import copy
+
+from ogamy.snapshots import SnapshotStore
+
+def rows(store):
+    return store.db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+def test_only_changes_are_written(game, tmp_path):
+    path = str(tmp_path / "ogame.db")
+    empire = game.fetch_empire()
+    store = SnapshotStore(path)
+    first = store.record_empire("bob", empire, when=1)
+    assert first > 0 and rows(store) == first
+
+    assert store.record_empire("bob", empire, when=2) == 0 # nothing changed
+    assert rows(store) == first
+
+    changed = copy.deepcopy(empire)
+    changed["planets"]["Homeworld"]["resources"]["metal"] += 100
+    assert store.record_empire("bob", changed, when=3) == 1
+    assert [row[0] for row in store.history("metal", "resources", "bob", "Homeworld")] == [1, 3]
+    assert store.latest("bob", "Homeworld", "resources")["metal"] == changed["planets"]["Homeworld"]["resources"]["metal"]
+    store.close()
+
+    again = SnapshotStore(path) # knows what was saved before
+    assert again.record_empire("bob", changed, when=4) == 0
+    again.close()
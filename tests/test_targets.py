@@ -0,0 +1,51 @@
+import numpy as np
+
+from ogamy import flight
+from ogamy.galaxy import GalaxyStore, INACTIVE, VACATION, slot_dtype
+from ogamy.targets import TargetIndex
+
+def universe(path, occupied):
+    """A store of 4 galaxies of 20 systems with inactive planets at occupied (galaxy, system,
+    position), or (galaxy, system, position, status)."""
+    store = GalaxyStore(path, galaxies=4, systems=20)
+    systems = {}
+    for slot in occupied:
+        galaxy, system, position = slot[:3]
+        rows = systems.setdefault((galaxy, system), np.zeros(15, dtype=slot_dtype))
+        rows[position - 1]["planet_id"] = len(systems) * 100 + position
+        rows[position - 1]["status"] = slot[3] if len(slot) > 3 else INACTIVE
+    for (galaxy, system), rows in systems.items(): store.update(galaxy, system, rows)
+    return store
+
+def test_systems_wrap_around(tmp_path):
+    store = universe(str(tmp_path), [(1, 20, 8), (1, 5, 8), (1, 3, 8, VACATION | INACTIVE)])
+    found = TargetIndex(store).nearest((1, 1, 8), n=2)
+    assert found["coords"].tolist() == [[1, 20, 8], [1, 5, 8]] # 20 is next to 1, 3 is on vacation
+    assert found["distance"].tolist() == [2700 + 95, 2700 + 95 * 4]
+
+    flat = TargetIndex(store, donut_system=False).nearest((1, 1, 8), n=2)
+    assert flat["coords"].tolist() == [[1, 5, 8], [1, 20, 8]]
+
+def test_windows(tmp_path):
+    index = TargetIndex(universe(str(tmp_path), []))
+    assert index.windows((1, 2, 1), 2700 + 95 * 3) == [(1, 1, 5), (1, 19, 20)]
+    assert index.windows((1, 19, 1), 2700 + 95 * 3) == [(1, 16, 20), (1, 1, 2)]
+    assert index.windows((1, 10, 1), 2700 + 95 * 3) == [(1, 7, 13)]
+    assert index.windows((1, 10, 1), 1000) == [(1, 10, 10)] # same system only
+    assert [g for g, _, _ in index.windows((1, 10, 1), 20000)] == [1, 2, 4] # galaxy 4 is next to 1
+
+def test_only_what_can_be_reached(tmp_path):
+    store = universe(str(tmp_path), [(1, 20, 8), (1, 4, 8), (1, 12, 8), (2, 1, 8)])
+    index = TargetIndex(store)
+    speed = flight.fleet_speed({"lcargo": 1}, {})
+    seconds = float(flight.duration(2700 + 95 * 3, speed, 10)) + 1 # 3 systems away, not 4
+    found = index.nearest((1, 1, 8), n=10, max_seconds=seconds, speed=speed)
+    assert sorted(found["coords"].tolist()) == [[1, 4, 8], [1, 20, 8]]
+    assert (found["duration"] <= seconds + 1e-6).all()
+
+    # systems put in as the scanner reads them are found too
+    rows = np.zeros(15, dtype=slot_dtype)
+    rows[0]["planet_id"], rows[0]["status"] = 1, INACTIVE
+    index.on_system(1, 2, rows, store.update(1, 2, rows))
+    found = index.nearest((1, 1, 8), n=10, max_seconds=seconds, speed=speed)
+    assert [1, 2, 1] in found["coords"].tolist()
@@ -0,0 +1,50 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from ogamy import tools
+
+# the scalar formulas from before tools was vectorized, kept here as they were so the array
+# versions can't drift from them without a test noticing
+
+def scalar_cost(building, level):
+    if building in ["metal", "deuterium", "solar", "fusion"]: exp = 1.5
+    elif building == "crystal": exp = 1.6
+    elif building == "astro": exp = 1.75
+    else: exp = 2
+    args = tools.base_cost[building]
+    return dict(zip(["metal", "crystal", "deuterium", "energy"],
+                    [arg * exp ** (level - 1) for arg in args] + [0] * (5 - len(args))))
+
+def scalar_needed_solar(metal, crystal, deut):
+    metal_ene = ((10 * metal * 1.1**metal) // 1) + 1 # metal consumption
+    crystal_ene = ((10 * crystal * 1.1**crystal) // 1) + 1 # crystal consumption
+    deut_ene = ((20 * deut * 1.1**deut) // 1) + 1 # deut consumption
+    total_ene = metal_ene + crystal_ene + deut_ene
+
+    solar_lvl = 1
+    while int(20 * solar_lvl * 1.1**solar_lvl) < total_ene: solar_lvl += 1
+    return solar_lvl
+
+levels = np.arange(1, 41)
+
+@pytest.mark.parametrize("building", sorted(tools.base_cost))
+def test_costs_match_the_scalar_formula(building):
+    found = tools.costs(building, levels)
+    for res in tools.resources:
+        assert found[res] == pytest.approx([scalar_cost(building, level)[res] for level in levels])
+    assert tools.table(building, 40)[1:] == pytest.approx(np.array([found[res] for res in tools.resources]).T)
+
+@pytest.mark.parametrize("building", ["metal", "crystal", "astro", "robot", "graviton"])
+def test_cumulative_cost_is_the_sum_of_the_levels(building):
+    starts, ends = np.meshgrid(np.arange(0, 20), np.arange(0, 30), indexing="ij")
+    found = tools.cumulative_cost(building, starts, ends)
+    for start, end in zip(starts.ravel(), ends.ravel()):
+        for res in tools.resources:
+            expected = sum(scalar_cost(building, level)[res] for level in range(start + 1, end + 1))
+            assert found[res][start, end] == pytest.approx(expected)
+
+def test_needed_solar_matches_the_scalar_loop():
+    for metal, crystal, deut in itertools.product(range(0, 40, 3), repeat=3):
+        assert tools.needed_solar(metal, crystal, deut) == scalar_needed_solar(metal, crystal, deut)
@@ -0,0 +1,44 @@
+import time
+
+from ogamy.transport import TokenBucket, Transport
+
+from conftest import requests_for
+
+def url(standin, page="overview"):
+    return standin.url + "/s103/game/index.php?page=" + page
+
+def test_get_is_retried_until_it_works(standin):
+    standin.failures = [(503, {}), (500, {})]
+    before = requests_for(standin, "overview")
+    response = Transport(backoff=0.01).request("GET", url(standin))
+    assert response.status_code == 200
+    assert requests_for(standin, "overview") == before + 3
+
+def test_gives_up_after_the_retries(standin):
+    standin.failures = [(502, {})] * 3
+    before = requests_for(standin, "overview")
+    response = Transport(retries=2, backoff=0.01).request("GET", url(standin))
+    assert response.status_code == 502
+    assert requests_for(standin, "overview") == before + 3
+
+def test_post_is_only_retried_after_429(standin):
+    standin.failures = [(500, {})]
+    before = requests_for(standin, "resources")
+    assert Transport(backoff=0.01).request("POST", url(standin, "resources"), data={}).status_code == 500
+    assert requests_for(standin, "resources") == before + 1 # it could have been built
+
+    standin.failures = [(429, {})] # never processed, safe to send again
+    assert Transport(backoff=0.01).request("POST", url(standin, "resources"), data={}).status_code == 200
+    assert requests_for(standin, "resources") == before + 3
+
+def test_retry_after_is_waited_for(standin):
+    standin.failures = [(429, {"Retry-After": "0.5"})]
+    start = time.monotonic()
+    assert Transport(backoff=0.01).request("GET", url(standin)).status_code == 200
+    assert time.monotonic() - start >= 0.5
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    start = time.monotonic()
+    for _ in range(5): bucket.acquire()
+    assert time.monotonic() - start >= 0.3 - 0.01 # the burst is free, then 10 per second
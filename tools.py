@@ -1,11 +1,15 @@
 import math
+import functools
+from collections import OrderedDict
+
+import numpy as np
 
 
 base_cost = {
     # mines and stuff
     "metal": (60, 15), "crystal": (48, 24), "deuterium": (225, 75), "solar": (75, 30),
     "solar": (75, 30), "fusion": (900, 360, 180),
-    "metal_sto": (1000), "crystal_sto": (1000, 500), "deuterium_sto": (1000, 1000),
+    "metal_sto": (1000,), "crystal_sto": (1000, 500), "deuterium_sto": (1000, 1000),
     # station buildings
     "robot": (400, 120, 200), "shipyard": (400, 200, 100), "lab": (200, 400, 200),
     "depot": (20000, 40000), "silo": (20000, 20000, 1000), "nanite": (10**6, 500000, 10**5),
@@ -22,20 +26,97 @@ base_cost = {
     # defenses
 }
 
+resources = ["metal", "crystal", "deuterium", "energy"]
+
+def _growth(building):
+    if building in ["metal", "deuterium", "solar", "fusion"]: return 1.5
+    elif building == "crystal": return 1.6
+    elif building == "astro": return 1.75
+    else: return 2
+
+# how much the cost is multiplied by for each level
+growth = {building: _growth(building) for building in base_cost}
+# base costs as [metal, crystal, deuterium, energy], with the missing ones as 0
+base_array = {building: np.array(list(base) + [0] * (4 - len(base)), dtype=float)
+              for building, base in base_cost.items()}
+
 def can_build(res, cost):
     return all(res[key] >= value for key, value in cost.items() if value > 0)
 
 def needed_solar(metal, crystal, deut):
     """Needed solar to power mines."""
+    return int(solve_level(solar_energy, energy_use(metal, crystal, deut), low=1))
+
+########### production ##############
+
+base_production = {"metal": 30, "crystal": 15, "deuterium": 0} # what a planet makes with no mines
+# extra production for each level of plasma technology
+plasma_bonus = {"metal": 0.01, "crystal": 0.0066, "deuterium": 0.0033}
+
+def production(mine, level, max_temp=0, uni_speed=1, plasma=0):
+    """Resources made per hour by a mine at full energy, without the base production.
+    Deuterium depends on the (max) temperature of the planet, colder is better."""
+    level = np.asarray(level)
+    if mine == "metal": made = 30 * level * 1.1**level
+    elif mine == "crystal": made = 20 * level * 1.1**level
+    elif mine == "deuterium": made = 10 * level * 1.1**level * (1.44 - 0.004 * max_temp)
+    return (made * (1 + plasma_bonus[mine] * plasma) * uni_speed) // 1
+
+def storage_capacity(level):
+    """How much of a resource fits in the storage with this level."""
+    level = np.asarray(level)
+    return 5000 * (2.5 * np.e ** (20 * level / 33) // 1) # formula for storage per level
+
+def temperature(text):
+    """Min and max temperature from the planet info text, like '-17°C to 23°C'."""
+    numbers = [int(x.replace("°C", "")) for x in text.split() if x.replace("°C", "").lstrip("-").isdigit()]
+    return numbers[0], numbers[-1]
+
+########### energy ##############
+# all of these work with numbers or numpy arrays of levels
+
+def energy_use(metal, crystal, deut):
+    """Energy the mines need to work at full speed."""
+    metal, crystal, deut = np.asarray(metal), np.asarray(crystal), np.asarray(deut)
     metal_ene = ((10 * metal * 1.1**metal) // 1) + 1 # metal consumption
     crystal_ene = ((10 * crystal * 1.1**crystal) // 1) + 1 # crystal consumption
     deut_ene = ((20 * deut * 1.1**deut) // 1) + 1 # deut consumption
-    total_ene = metal_ene + crystal_ene + deut_ene
+    return metal_ene + crystal_ene + deut_ene
+
+def solar_energy(level):
+    """Energy made by the solar plant."""
+    level = np.asarray(level)
+    return (20 * level * 1.1**level) // 1
+
+def fusion_energy(level, energy_tech=0):
+    """Energy made by the fusion reactor. Better energy technology makes it produce more."""
+    level = np.asarray(level)
+    return (30 * level * (1.05 + 0.01 * np.asarray(energy_tech))**level) // 1
+
+def fusion_deuterium(level):
+    """Deuterium burned by the fusion reactor every hour."""
+    level = np.asarray(level)
+    return (10 * level * 1.1**level) // 1
+
+def satellite_energy(max_temp):
+    """Energy made by one solar satellite, depends on the (max) temperature of the planet."""
+    return np.maximum((np.asarray(max_temp) + 140) // 6, 1)
 
-    solar_lvl = 1
-    while int(20 * solar_lvl * 1.1**solar_lvl) < total_ene: solar_lvl += 1
+def solve_level(produce, needed, low=0, max_level=100):
+    """Smallest level (not below low) where produce(level) >= needed, found by bisection.
+    produce has to go up with the level and take arrays, and needed can be an array.
+    If not even max_level is enough the answer is max_level + 1."""
+    needed = np.asarray(needed, dtype=float)
+    # produce(lo) is never enough and produce(hi) always is, the answer is in (lo, hi]
+    lo = np.full(needed.shape, low - 1)
+    hi = np.full(needed.shape, max_level + 1)
+    while np.any(hi - lo > 1):
+        mid = (lo + hi) // 2
+        enough = produce(mid) >= needed
+        hi = np.where(enough, mid, hi)
+        lo = np.where(enough, lo, mid)
 
-    return solar_lvl
+    return hi
 
 def build_time(building, level, storage=False, redesigned=True, robots=0, nanites=0, uni_speed=1):
     """Time (in seconds) it takes to build something."""
@@ -48,17 +129,79 @@ def build_time(building, level, storage=False, redesigned=True, robots=0, nanite
 
 def cost(building, level, is_storage=False):
     """Calculate how much building/researching a certain level costs."""
-    def _cost(*args):
-        if building in ["metal", "deuterium", "solar", "fusion"]: exp = 1.5
-        elif building == "crystal": exp = 1.6
-        elif building == "astro": exp = 1.75
-        else: exp = 2
+    if is_storage: building += "_sto"
+    exp = growth[building]
+    args = base_cost[building]
+
+    return dict(zip(resources, [arg * exp ** (level - 1) for arg in args] + [0] * (5 - len(args))))
+
+########### array versions ##############
+# these take numpy arrays (or lists) of levels and work out all of them at once
+
+def _params(buildings, is_storage=False):
+    """Base costs (n, 4) and growth (n,) for a list of buildings."""
+    names = [b + "_sto" if is_storage else b for b in buildings]
+    return (np.array([base_array[name] for name in names]),
+            np.array([growth[name] for name in names]))
+
+def costs(buildings, levels, is_storage=False):
+    """Like cost, but levels can be an array. With a list of buildings every array gets an
+    extra first axis, one row per building."""
+    single = isinstance(buildings, str)
+    if single: buildings = [buildings]
+    levels = np.asarray(levels, dtype=float)
+
+    base, exp = _params(buildings, is_storage)
+    # add axes so each building gets multiplied by every level
+    shape = (len(buildings),) + (1,) * levels.ndim
+    factor = exp.reshape(shape) ** (levels - 1)
+
+    result = OrderedDict()
+    for i, res in enumerate(resources):
+        values = base[:, i].reshape(shape) * factor
+        result[res] = values[0] if single else values
+    return result
 
-        return dict(zip(["metal", "crystal", "deuterium", "energy"],
-                        [arg * exp ** (level - 1) for arg in args] + [0] * (5 - len(args))))
+def build_times(buildings, levels, storage=False, redesigned=True, robots=0, nanites=0, uni_speed=1):
+    """Like build_time, with arrays of levels (and robots/nanites can be arrays too)."""
+    _cost = costs(buildings, levels, is_storage=storage)
+    res = _cost["metal"] + _cost["crystal"]
+    time = res / (2500 * (1 + np.asarray(robots)) * (2.0 ** np.asarray(nanites)) * uni_speed)
+    if redesigned: time *= 2 / 7
 
+    return np.maximum(time * 3600, 1)
+
+def cumulative_cost(building, start, end, is_storage=False):
+    """Total cost of going from level start to level end (building start + 1, ..., end).
+    start and end can be arrays."""
     if is_storage: building += "_sto"
-    return _cost(*base_cost[building])
+    exp = growth[building]
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    # sum of a geometric series: base * (exp^start + ... + exp^(end - 1))
+    factor = np.where(end > start, (exp ** end - exp ** start) / (exp - 1), 0)
+
+    return OrderedDict((res, base_array[building][i] * factor) for i, res in enumerate(resources))
+
+@functools.lru_cache(maxsize=None)
+def table(building, max_level=60):
+    """Cost of every level up to max_level as a (max_level + 1, 4) array, so table(b)[level]
+    gives [metal, crystal, deuterium, energy]. Row 0 is all zeros. Don't change it, it's cached."""
+    levels = np.arange(max_level + 1, dtype=float)
+    values = base_array[building] * growth[building] ** (levels[:, None] - 1)
+    values[0] = 0
+    values.setflags(write=False)
+    return values
+
+@functools.lru_cache(maxsize=None)
+def cumulative_table(building, max_level=60):
+    """cumulative_table(b)[level] is the total cost of building levels 1 to level."""
+    values = np.cumsum(table(building, max_level), axis=0)
+    values.setflags(write=False)
+    return values
+
+def all_tables(max_level=60):
+    """Cost tables of everything in base_cost."""
+    return {building: table(building, max_level) for building in base_cost}
 
 def research_time(tech, level, lab=0):
     """Time to research a tech. If you have 'intergalactic research network'
@@ -0,0 +1,80 @@
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# answers that mean "try again later" instead of "you did something wrong"
+retry_statuses = {429, 500, 502, 503, 504}
+# requests that can be sent twice without doing something twice
+idempotent = {"GET", "HEAD", "OPTIONS"}
+
+class TokenBucket:
+    """Rate limiter: rate requests per second on average, with bursts of up to burst requests.
+    The same bucket can be given to many sessions (and used from many threads) to limit them together."""
+
+    def __init__(self, rate=2.0, burst=5):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take tokens from the bucket, waiting until there are enough."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # take them now even if it goes negative, so whoever comes next waits behind us
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0: time.sleep(wait)
+
+class Transport(requests.Session):
+    """requests session with a rate limit, connection pools, timeouts and retries with backoff."""
+
+    def __init__(self, limiter=None, timeout=(5, 30), retries=3, backoff=0.5, max_backoff=30,
+                 pool_size=10):
+        super().__init__()
+        self.limiter = limiter # a TokenBucket, can be shared with other sessions
+        self.timeout = timeout # (connect, read) in seconds, used when a request doesn't give one
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # the connections are kept alive and reused, one pool per host
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def delay(self, attempt, response=None):
+        """How long to wait before trying again. Random so many clients don't all retry at once."""
+        if response is not None and "Retry-After" in response.headers:
+            try: return min(float(response.headers["Retry-After"]), self.max_backoff)
+            except ValueError: pass # it can also be a date, just use the normal backoff then
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        can_repeat = method.upper() in idempotent
+
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None: self.limiter.acquire()
+            last_try = attempt == self.retries
+
+            try: response = super().request(method, url, **kwargs)
+            except requests.exceptions.ConnectTimeout: # never reached the server, safe to send again
+                if last_try: raise
+                response = None
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_try or not can_repeat: raise
+                response = None
+            else:
+                # a 429 was never processed, so even a POST can be sent again
+                if response.status_code not in retry_statuses or last_try: return response
+                if not can_repeat and response.status_code != 429: return response
+
+            time.sleep(self.delay(attempt, response))